@@ -0,0 +1,175 @@
+# Archivo: almacen.py
+# Historial de corridas en disco, en formato columnar (Arrow IPC).
+#
+# Cada corrida se guarda en su propia carpeta:
+#   soluciones.arrow   entradas del portafolio (esquema de 18 columnas)
+#   matrices.arrow     VPN y matrices (soluciones × años) de flujo, captura, área,
+#                      costo y monitoreo; cada matriz es una columna de listas de
+#                      tamaño fijo (una fila por solución)
+#   grilla.arrow       (opcional) VPN por solución en cada celda tasa × precio
+#   metadatos.json     parámetros globales, fecha, etiqueta y totales
+#
+# Los archivos Arrow se leen con memory map: las matrices cargadas son vistas de
+# solo lectura sobre el archivo (sin copiar ni recalcular), así que abrir o
+# comparar corridas pasadas es inmediato aunque el portafolio sea grande.
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from modelo import ParametrosModelo, expandir_gastos_adicionales
+
+DIRECTORIO_PREDETERMINADO = os.environ.get("SNC_ALMACEN", "corridas")
+MATRICES = ["flujo", "captura", "area", "costo", "monitoreo"]  # mismo orden que las salidas del modelo
+
+
+#Def de Corrida cargada del almacén (matrices de solo lectura sobre el archivo)
+@dataclass
+class CorridaGuardada:
+    id_corrida: str
+    metadatos: dict
+    parametros: ParametrosModelo
+    soluciones: pd.DataFrame
+    salidas: tuple  # (vpn, flujo, captura, area, costo, monitoreo, gastos), como calcular_vpn_lote
+    grilla: tuple = None  # (rango_tasas_pct, rango_precios, grilla_vpn, matriz_vpn)
+
+    def resumen(self):
+        """VPN, carbono y costo por solución, a partir de las matrices guardadas."""
+        vpn, _, captura, _, costo, _, _ = self.salidas
+        return pd.DataFrame({
+            "Solución": self.soluciones["Solución"].to_numpy(),
+            "Carbono Total (tCO2e)": captura.sum(axis=1),
+            "Costo Total (USD)": costo.sum(axis=1),
+            "VPN (USD)": vpn
+        })
+
+
+#Def de Funcion auxiliar: matriz (filas × columnas) como columna de listas de tamaño fijo
+def _columna_matriz(matriz):
+    matriz = np.ascontiguousarray(matriz, dtype=np.float64)
+    return pa.FixedSizeListArray.from_arrays(pa.array(matriz.ravel()), matriz.shape[1])
+
+
+#Def de Funcion auxiliar: columna de listas de tamaño fijo -> matriz (vista sin copia)
+def _matriz_columna(columna):
+    columna = columna.combine_chunks() if isinstance(columna, pa.ChunkedArray) else columna
+    valores = columna.flatten().to_numpy(zero_copy_only=True)
+    return valores.reshape(len(columna), columna.type.list_size)
+
+
+def _escribir_arrow(ruta, tabla):
+    with ipc.new_file(ruta, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+
+def _leer_arrow(ruta):
+    return ipc.open_file(pa.memory_map(ruta, "r")).read_all()
+
+
+#Def de Clase: almacén de corridas en un directorio local
+class AlmacenResultados:
+    def __init__(self, directorio=DIRECTORIO_PREDETERMINADO):
+        self.directorio = directorio
+
+    def _ruta(self, id_corrida, archivo=""):
+        return os.path.join(self.directorio, id_corrida, archivo)
+
+    def guardar(self, df_soluciones, parametros, salidas, grilla=None, etiqueta=""):
+        """Guarda una corrida y devuelve su identificador (fecha + huella de entradas y parámetros)."""
+        vpn, flujo, captura, area, costo, monitoreo, _ = salidas
+        fecha = datetime.now()
+        huella = hashlib.sha256(
+            pd.util.hash_pandas_object(df_soluciones.astype(str), index=False).to_numpy().tobytes()
+            + json.dumps(parametros.como_dict(), sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:8]
+        id_corrida = f"{fecha:%Y%m%dT%H%M%S%f}-{huella}"
+        os.makedirs(self._ruta(id_corrida))
+
+        soluciones = df_soluciones.reset_index(drop=True)
+        for col in soluciones.columns:
+            if soluciones[col].dtype == object:
+                soluciones[col] = soluciones[col].astype("string")
+        _escribir_arrow(self._ruta(id_corrida, "soluciones.arrow"), pa.Table.from_pandas(soluciones, preserve_index=False))
+        _escribir_arrow(self._ruta(id_corrida, "matrices.arrow"), pa.table(
+            {"vpn": pa.array(np.asarray(vpn, dtype=np.float64))}
+            | {nombre: _columna_matriz(matriz) for nombre, matriz in zip(MATRICES, (flujo, captura, area, costo, monitoreo))}
+        ))
+        if grilla is not None and len(vpn):
+            rango_tasas, rango_precios, grilla_vpn, _ = grilla
+            tasas, precios = np.meshgrid(np.asarray(rango_tasas, dtype=float), np.asarray(rango_precios, dtype=float), indexing="ij")
+            _escribir_arrow(self._ruta(id_corrida, "grilla.arrow"), pa.table({
+                "Tasa (%)": tasas.ravel(),
+                "Precio (USD)": precios.ravel(),
+                "VPN por solución": _columna_matriz(np.asarray(grilla_vpn).reshape(tasas.size, len(vpn)))
+            }))
+
+        metadatos = {
+            "id": id_corrida,
+            "fecha": fecha.isoformat(timespec="seconds"),
+            "etiqueta": etiqueta,
+            "n_soluciones": len(df_soluciones),
+            "vpn_total": float(np.nansum(vpn)),
+            "carbono_total": float(np.asarray(captura).sum()),
+            "parametros": parametros.como_dict()
+        }
+        with open(self._ruta(id_corrida, "metadatos.json"), "w", encoding="utf-8") as f:
+            json.dump(metadatos, f, indent=2, ensure_ascii=False, default=str)
+        return id_corrida
+
+    def listar(self):
+        """Tabla de corridas guardadas, de la más reciente a la más antigua."""
+        filas = []
+        if os.path.isdir(self.directorio):
+            for id_corrida in os.listdir(self.directorio):
+                ruta = self._ruta(id_corrida, "metadatos.json")
+                if not os.path.isfile(ruta):
+                    continue
+                with open(ruta, encoding="utf-8") as f:
+                    metadatos = json.load(f)
+                parametros = metadatos["parametros"]
+                filas.append({
+                    "Corrida": id_corrida,
+                    "Fecha": metadatos["fecha"],
+                    "Etiqueta": metadatos["etiqueta"],
+                    "Soluciones": metadatos["n_soluciones"],
+                    "VPN Total (USD)": metadatos["vpn_total"],
+                    "Carbono Total (tCO2e)": metadatos["carbono_total"],
+                    "Precio Carbono (USD)": parametros["precio_carbono"],
+                    "Tasa Descuento (%)": parametros["tasa_descuento"] * 100,
+                    "Horizonte (años)": parametros["n_anios"]
+                })
+        columnas = ["Corrida", "Fecha", "Etiqueta", "Soluciones", "VPN Total (USD)", "Carbono Total (tCO2e)",
+                    "Precio Carbono (USD)", "Tasa Descuento (%)", "Horizonte (años)"]
+        return pd.DataFrame(filas, columns=columnas).sort_values("Corrida", ascending=False).reset_index(drop=True)
+
+    def cargar(self, id_corrida):
+        with open(self._ruta(id_corrida, "metadatos.json"), encoding="utf-8") as f:
+            metadatos = json.load(f)
+        parametros = ParametrosModelo(**metadatos["parametros"])
+        soluciones = _leer_arrow(self._ruta(id_corrida, "soluciones.arrow")).to_pandas()
+
+        matrices = _leer_arrow(self._ruta(id_corrida, "matrices.arrow"))
+        vpn = matrices.column("vpn").combine_chunks().to_numpy(zero_copy_only=True)
+        gastos = expandir_gastos_adicionales(parametros.gastos_adicionales_comunes, parametros.tasa_descuento, parametros.n_anios)
+        salidas = (vpn, *(_matriz_columna(matrices.column(nombre)) for nombre in MATRICES), gastos)
+
+        grilla = None
+        if os.path.isfile(self._ruta(id_corrida, "grilla.arrow")):
+            tabla = _leer_arrow(self._ruta(id_corrida, "grilla.arrow"))
+            tasas = tabla.column("Tasa (%)").to_numpy()
+            precios = tabla.column("Precio (USD)").to_numpy()
+            rango_tasas, rango_precios = np.unique(tasas), np.unique(precios)
+            grilla_vpn = _matriz_columna(tabla.column("VPN por solución")).reshape(len(rango_tasas), len(rango_precios), -1)
+            grilla = (rango_tasas, rango_precios, grilla_vpn, grilla_vpn.sum(axis=2))
+        return CorridaGuardada(id_corrida, metadatos, parametros, soluciones, salidas, grilla)
+
+    def eliminar(self, id_corrida):
+        shutil.rmtree(self._ruta(id_corrida))
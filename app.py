@@ -7,117 +7,31 @@ import numpy as np
 import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
-import io
-import uuid
-
-#Def de Funcion Simple para VPN
-def calcular_vpn_simple(flujo_anual, tasa):
-    return sum([
-        flujo_anual[i] / ((1 + tasa) ** (i + 1))
-        for i in range(len(flujo_anual))
-    ])
-
-#Def de Funcion para VPN
-def calcular_vpn_solucion(
-    sol,
-    tasa_descuento,
-    n_anios_default,
-    gastos_adicionales_comunes,
-    precio_carbono,
-    multiplicador_precio_carbono,
-    crecimiento_precio_carbono,
-    crecimiento_ingreso_encadenado
-):
-    dur = int(sol["Duración (años)"])
-    area_total = sol["Área (ha)"] * multiplicador_area
-    tipo_captura = sol.get("Tipo Captura", "constante")
-    tipo_sn = sol.get("Tipo SNC", "restauracion")
-    anos_area_escalonada = sol.get("Años Escalonamiento", 1)
-
-    if anos_area_escalonada == 1:
-        area_por_anio = np.full(dur, area_total)
-    else:
-        area_por_anio = np.concatenate([
-            np.linspace(area_total / anos_area_escalonada, area_total, anos_area_escalonada),
-            np.full(dur - anos_area_escalonada, area_total)
-        ])
-    area_por_anio = np.pad(area_por_anio, (0, n_anios_default - len(area_por_anio)), constant_values=area_total)
-
-    if tipo_captura == "lineal":
-        cap_ini = sol["Captura Inicial"]
-        cap_fin = sol["Captura Final"]
-        cap_ha = np.linspace(cap_ini, cap_fin, dur)
-    elif tipo_captura == "sigmoidal":
-        cap_max = sol["Captura Máxima"]
-        k = sol["Velocidad"]
-        x0 = sol["Punto Medio"]
-        x_vals = np.arange(dur)
-        cap_ha = cap_max / (1 + np.exp(-k * (x_vals - x0)))
-    else:
-        cap_ha = np.full(dur, sol["Captura por ha (tCO2e)"])
-    cap_ha = np.pad(cap_ha, (0, n_anios_default - len(cap_ha)), constant_values=0)
-
-    salv = 1 - sol["Salvaguardas (%)"] / 100
-
-    if tipo_sn == "degradacion":
-        perdida_pct = sol.get("% Pérdida Evitada", 0.0) / 100
-        area_efectiva = area_por_anio * perdida_pct
-    else:
-        area_efectiva = area_por_anio
-
-    captura_anual = cap_ha * area_efectiva * salv
-
-    costo_base = sol["Costo anual por ha (USD)"]
-    costo_anual = np.array([
-        costo_base * ((area_por_anio[i] / 100) ** -0.2) * area_por_anio[i]
-        for i in range(n_anios_default)
-    ])
-
-    capex = sol["CAPEX Total (USD)"]
-    ingreso_base = sol["Ingreso Encadenado (USD/año)"]
-
-    gastos_adicionales = np.zeros(n_anios_default)
-    for gasto in gastos_adicionales_comunes:
-        if "anio" in gasto:
-            if gasto["anio"] == -1:
-                gastos_adicionales[0] += gasto["monto"] / (1 + tasa_descuento)
-            elif 0 <= gasto["anio"] < n_anios_default:
-                gastos_adicionales[gasto["anio"]] += gasto["monto"]
-        elif "anio_cada" in gasto:
-            desde = gasto.get("desde", 0)
-            hasta = gasto.get("hasta", n_anios_default)
-            for anio in range(desde, min(hasta + 1, n_anios_default)):
-                if (anio - desde) % gasto["anio_cada"] == 0:
-                    gastos_adicionales[anio] += gasto["monto"]
-
-    monitoreo_en_campo = np.array([
-        9.2 * area_por_anio[i] if i < dur else 0 for i in range(n_anios_default)
-    ])
-
-    flujo_proyecto = np.zeros(n_anios_default)
-    flujo_proyecto[0] = -capex
-
-    precio_base = precio_carbono * multiplicador_precio_carbono
-
-    for anio in range(1, dur):
-        ingreso = (
-            captura_anual[anio] * precio_base * ((1 + crecimiento_precio_carbono) ** anio)
-            + ingreso_base * ((1 + crecimiento_ingreso_encadenado) ** anio)
-        )
-        costo_total = costo_anual[anio]
-        gasto_extra = gastos_adicionales[anio] + monitoreo_en_campo[anio]
-        flujo_neto = ingreso - costo_total - gasto_extra
-        if flujo_neto > 0:
-            flujo_neto *= (1 - 0.15)
-        flujo_proyecto[anio] = flujo_neto
-
-    tasa_desc = tasa_descuento * multiplicador_tasa_descuento
-    vpn = sum([
-        flujo_proyecto[i] / ((1 + tasa_desc) ** (i + 1))
-        for i in range(n_anios_default)
-    ])
-
-    return vpn, flujo_proyecto, captura_anual, area_por_anio, costo_anual, monitoreo_en_campo, gastos_adicionales
+from dataclasses import replace
+
+from almacen import AlmacenResultados
+from comparacion import comparar_escenarios
+from exportacion import libro_resultados_bytes
+from ingesta import huella_archivo, leer_portafolio_excel
+from instrumentacion import Instrumentacion, cerrar_pendientes, nuevo_perfil, resumen_perfil
+from montecarlo import ConfiguracionMonteCarlo, simular_montecarlo
+from optimizador import RestriccionesPortafolio, candidatos_desde_catalogo, frente_pareto, optimizar_portafolio
+from registros import Portafolio, TipoSNC
+from reporte_pdf import reporte_pdf_bytes
+from sensibilidad import VARIABLES_TORNADO, VARIACIONES_PREDETERMINADAS, calcular_tornado
+from modelo import (
+    GASTOS_ADICIONALES_COMUNES,
+    N_ANIOS_MAXIMO,
+    N_ANIOS_PREDETERMINADO,
+    EstadoIncremental,
+    ParametrosModelo,
+    calcular_vpn_grilla_incremental,
+    calcular_vpn_lote_incremental,
+    obtener_cache_resultados,
+    soluciones_predeterminadas,
+    tabla_resultados,
+    tablas_flujo_caja,
+)
 
 # --- CONFIGURAR PÁGINA ---
 st.set_page_config(
@@ -127,13 +41,22 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# --- INSTRUMENTACIÓN (opcional; se activa desde el panel de la barra lateral) ---
+# Lo que un rerun cortado (st.rerun() o una excepción) dejó abierto se cierra antes de empezar
+cerrar_pendientes(st.session_state)
+instrumentacion = Instrumentacion(activa=st.session_state.get("instrumentacion_activa", False))
+perfil_rerun = nuevo_perfil() if st.session_state.pop("perfilar_rerun", False) else None
+st.session_state["instrumentacion_en_curso"] = instrumentacion
+if perfil_rerun is not None:
+    st.session_state["perfil_en_curso"] = perfil_rerun
+instrumentacion.marcar("Configuración")
+
 # --- TÍTULO DE CONTROL ---
 st.title("🧪 Laboratorio de Pruebas")
 
 # --- INICIALIZAR VARIABLES ---
 resultados = []
 df_resultados = pd.DataFrame()
-flujo_total = np.zeros(30)
 
 # --- ESTILOS ---
 st.markdown("""
@@ -168,10 +91,25 @@ st.markdown("""
 # --- SESSION STATE ---
 if "soluciones" not in st.session_state:
     st.session_state["soluciones"] = []
+# Registro de libros cargados: huella SHA-256 del contenido -> datos de la carga.
+# Evita volver a parsear y agregar el mismo archivo en cada rerun de Streamlit.
+if "cargas" not in st.session_state:
+    st.session_state["cargas"] = {}
+if "version_cargador" not in st.session_state:
+    st.session_state["version_cargador"] = 0
+# Resultados por solución y totales del portafolio: al agregar o editar una solución
+# solo se evalúa esa fila; los totales se vuelven a sumar sobre las filas guardadas
+if "evaluacion" not in st.session_state:
+    st.session_state["evaluacion"] = EstadoIncremental()
+evaluacion = st.session_state.evaluacion
 
 # --- CONFIGURACIÓN GENERAL ---
 st.sidebar.header("Parámetros Generales del Proyecto")
-n_anios_default = 30
+n_anios_default = int(st.sidebar.number_input(
+    "Horizonte de evaluación (años)", min_value=1, max_value=N_ANIOS_MAXIMO, value=N_ANIOS_PREDETERMINADO, step=5,
+    help="Años de flujo evaluados para todas las soluciones (p. ej. 100 para escenarios de permanencia)"
+))
+flujo_total = np.zeros(n_anios_default)
 precio_carbono = st.sidebar.number_input("Precio del carbono (USD/ton CO2)", min_value=0.0, value=14.75, step=1.0)
 # NUEVO: crecimiento anual del precio del carbono
 crecimiento_precio_carbono = st.sidebar.slider(
@@ -199,123 +137,65 @@ multiplicador_area = st.sidebar.slider("Multiplicador de Área (%)", 50, 150, 10
 multiplicador_precio_carbono = st.sidebar.slider("Multiplicador Precio Carbono (%)", 50, 150, 100, 10) / 100
 multiplicador_tasa_descuento = st.sidebar.slider("Multiplicador Tasa Descuento (%)", 50, 150, 100, 10) / 100
 
+# Parámetros explícitos para el núcleo de cálculo (modelo.py)
+parametros = ParametrosModelo(
+    tasa_descuento=tasa_descuento,
+    precio_carbono=precio_carbono,
+    crecimiento_precio_carbono=crecimiento_precio_carbono,
+    crecimiento_ingreso_encadenado=crecimiento_ingreso_encadenado,
+    multiplicador_area=multiplicador_area,
+    multiplicador_precio_carbono=multiplicador_precio_carbono,
+    multiplicador_tasa_descuento=multiplicador_tasa_descuento,
+    n_anios=n_anios_default,
+    gastos_adicionales_comunes=GASTOS_ADICIONALES_COMUNES
+)
+
 # --- CARGA O FORMULARIO de SNC del Estudio ---
+instrumentacion.marcar("Ingesta / formulario")
 st.sidebar.header("Modelación de SNCs")
 
 if st.sidebar.button("Resetear Modelo"):
     st.session_state.soluciones = []
+    st.session_state.cargas = {}
+    st.session_state.version_cargador += 1
     st.rerun()
 
 opcion_fuente = st.sidebar.radio("Ingreso de soluciones", ("Subir archivo Excel", "Modelación Interactiva"))
 
 if opcion_fuente.strip().lower() == "subir archivo excel":
-    archivo = st.sidebar.file_uploader("Sube archivo .xlsx", type=["xlsx"])
-    if archivo:
+    archivos = st.sidebar.file_uploader(
+        "Sube archivo(s) .xlsx", type=["xlsx"], accept_multiple_files=True,
+        key=f"cargador_{st.session_state.version_cargador}"
+    )
+    for archivo in archivos or []:
+        huella = huella_archivo(archivo.getvalue())
+        if huella in st.session_state.cargas:
+            continue  # ya se procesó en un rerun anterior
         try:
-            df_soluciones = pd.read_excel(archivo)
-            columnas_esperadas = [
-                "Solución", "Área (ha)", "Costo anual por ha (USD)", "CAPEX Total (USD)",
-                "Duración (años)", "Salvaguardas (%)", "Ingreso Encadenado (USD/año)",
-                "Tipo Captura", "Tipo SNC", "% Pérdida Evitada",
-                "Captura por ha (tCO2e)", "Captura Inicial", "Captura Final",
-                "Captura Máxima", "Velocidad", "Punto Medio",
-                "Escalonada", "Años Escalonamiento"
-            ]
-
-            columnas_presentes = df_soluciones.columns.tolist()
-            faltantes = [col for col in columnas_esperadas if col not in columnas_presentes]
-
-            if faltantes:
-                st.error(f"⚠️ Faltan las siguientes columnas en el archivo: {faltantes}")
-                df_soluciones = pd.DataFrame()  # Vacía para evitar errores posteriores
-            else:
-                soluciones = []
-                for _, row in df_soluciones.iterrows():
-                    try:
-                        tipo_captura = row.get("Tipo Captura", "constante")
-                        tipo_sn = row.get("Tipo SNC", "restauracion")
-                        escalonada = bool(row.get("Escalonada", False))
-                        anios_escalonamiento = int(row.get("Años Escalonamiento", 1))
-
-                        nueva = {
-                            "Solución": str(row["Solución"]),
-                            "Área (ha)": float(row["Área (ha)"]),
-                            "Costo anual por ha (USD)": float(row["Costo anual por ha (USD)"]),
-                            "CAPEX Total (USD)": float(row["CAPEX Total (USD)"]),
-                            "Duración (años)": int(row["Duración (años)"]),
-                            "Salvaguardas (%)": float(row["Salvaguardas (%)"]),
-                            "Ingreso Encadenado (USD/año)": float(row["Ingreso Encadenado (USD/año)"]),
-                            "Tipo Captura": tipo_captura,
-                            "Tipo SNC": tipo_sn,
-                            "% Pérdida Evitada": float(row.get("% Pérdida Evitada", 0)),
-                            "Escalonada": escalonada,
-                            "Años Escalonamiento": anios_escalonamiento
-                        }
-
-                        if tipo_captura == "constante":
-                            nueva["Captura por ha (tCO2e)"] = float(row["Captura por ha (tCO2e)"])
-                        elif tipo_captura == "lineal":
-                            nueva["Captura Inicial"] = float(row["Captura Inicial"])
-                            nueva["Captura Final"] = float(row["Captura Final"])
-                        elif tipo_captura == "sigmoidal":
-                            nueva["Captura Máxima"] = float(row["Captura Máxima"])
-                            nueva["Velocidad"] = float(row["Velocidad"])
-                            nueva["Punto Medio"] = int(row["Punto Medio"])
-
-                        soluciones.append(nueva)
-                    except Exception as e:
-                        st.warning(f"❗ Error procesando una solución: {e}")
-
-                if soluciones:
-                    st.session_state.soluciones.extend(soluciones)
-                    st.success(f"✅ Se cargaron correctamente {len(soluciones)} solución(es) desde el archivo.")
-                else:
-                    st.warning("⚠️ No se encontraron soluciones válidas en el archivo.")
-
+            ingesta = leer_portafolio_excel(archivo)
         except Exception as e:
-            st.error(f"❌ Error al leer el archivo: {str(e)}")
+            st.error(f"❌ Error al leer el archivo {archivo.name}: {str(e)}")
+            continue
+
+        if ingesta.faltantes:
+            st.error(f"⚠️ Faltan las siguientes columnas en {archivo.name}: {ingesta.faltantes}")
+            continue
+        if ingesta.soluciones.empty:
+            st.warning(f"⚠️ No se encontraron soluciones válidas en {archivo.name}.")
+
+        # Una sola copia por libro, en arreglos tipados (st.session_state.soluciones queda para el formulario)
+        st.session_state.cargas[huella] = {
+            "archivo": archivo.name,
+            "portafolio": Portafolio.desde_dataframe(ingesta.soluciones),
+            "errores": ingesta.errores,
+            "gastos": ingesta.gastos
+        }
+        if not ingesta.soluciones.empty:
+            st.success(f"✅ Se cargaron correctamente {len(ingesta.soluciones)} solución(es) desde {archivo.name}.")
 
-#if opcion_fuente.strip().lower() == "subir archivo excel":
-#    archivo = st.sidebar.file_uploader("Sube archivo .xlsx", type=["xlsx"])
-    df_soluciones = pd.read_excel(archivo) if archivo else pd.DataFrame()
+    portafolio = Portafolio.concatenar(carga["portafolio"] for carga in st.session_state.cargas.values())
 
 else:
-    # Diccionario base de soluciones
-    soluciones_predeterminadas = {
-        "Pastos Marinos": {"captura": 7.5, "costo": 70, "duracion": 30, "capex": 500, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-        "Manglares": {"captura": 10, "costo": 90, "duracion": 30, "capex": 800, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-        "Bosque Seco Tropical": {"captura": 6, "costo": 55, "duracion": 25, "capex": 400, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-        "Corales": {"captura": 3, "costo": 100, "duracion": 20, "capex": 1500, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-        "Agroforestería con Cacao": {"captura": 5, "costo": 50, "duracion": 20, "capex": 300, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-        "Bosque de Galería": {"captura": 8, "costo": 65, "duracion": 30, "capex": 600, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-        "Turberas Andinas": {"captura": 5, "costo": 70, "duracion": 30, "capex": 750, "tipo_captura": "constante", "tipo_sn": "restauracion"},
-
-        "Restauración de Pastos Degradados": {
-            "tipo_captura": "lineal", "captura_inicial": 2.0, "captura_final": 6.0,
-            "costo": 40, "duracion": 30, "capex": 300, "tipo_sn": "restauracion"
-        },
-        "Reforestación Productiva Zonas ECP": {
-            "tipo_captura": "lineal", "captura_inicial": 1.5, "captura_final": 5.5,
-            "costo": 60, "duracion": 30, "capex": 350, "tipo_sn": "restauracion"
-        },
-        "Restauración de Manglares Caribe (Esp.)": {
-            "tipo_captura": "sigmoidal", "captura_max": 8.0, "velocidad": 0.3, "punto_medio": 15,
-            "costo": 80, "duracion": 30, "capex": 900, "tipo_sn": "restauracion"
-        },
-
-        "Manglar Degradación Evitada": {"captura": 8.0, "costo": 60, "duracion": 30, "capex": 400, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Manglar Degradación Evitada (2)": {"captura": 8.0, "costo": 60, "duracion": 30, "capex": 400, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Bosque Húmedo Degradación Evitada": {"captura": 7.0, "costo": 50, "duracion": 30, "capex": 350, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Bosque Húmedo Degradación Evitada (2)": {"captura": 7.0, "costo": 50, "duracion": 30, "capex": 350, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Páramo Degradación Evitada": {"captura": 5.5, "costo": 55, "duracion": 30, "capex": 370, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Páramo Degradación Evitada (2)": {"captura": 5.5, "costo": 55, "duracion": 30, "capex": 370, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Humedal Degradación Evitada": {"captura": 6.5, "costo": 60, "duracion": 30, "capex": 390, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Humedal Degradación Evitada (2)": {"captura": 6.5, "costo": 60, "duracion": 30, "capex": 390, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Humedal Degradación Evitada (3)": {"captura": 6.5, "costo": 60, "duracion": 30, "capex": 390, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Pastos Degradación Evitada": {"captura": 4.5, "costo": 40, "duracion": 30, "capex": 310, "tipo_captura": "constante", "tipo_sn": "degradacion"},
-        "Pastos Degradación Evitada (2)": {"captura": 4.5, "costo": 40, "duracion": 30, "capex": 310, "tipo_captura": "constante", "tipo_sn": "degradacion"}
-    }
-
     # Selector dinámico
     tipo_sol = st.sidebar.selectbox("Tipo de solución", list(soluciones_predeterminadas))
     base = soluciones_predeterminadas[tipo_sol]
@@ -324,11 +204,11 @@ else:
     with st.sidebar.form("form_solucion"):
         area = st.number_input("Área (ha)", 0.0, value=100.0)
         escalonada = st.checkbox("¿SNC escalonada en el tiempo?", value=False)
-        anios_escalonamiento = st.slider("Años para completar el 100% del área", 1, 30, 3) if escalonada else 1
+        anios_escalonamiento = st.slider("Años para completar el 100% del área", 1, max(n_anios_default, 2), min(3, n_anios_default)) if escalonada else 1
 
         costo = st.number_input("Costo anual USD/ha", 0.0, value=float(base["costo"]))
         capex = st.number_input("CAPEX Total (USD)", 0.0, value=float(base["capex"]))
-        duracion = st.number_input("Duración (años)", 1, 50, int(base["duracion"]))
+        duracion = st.number_input("Duración (años)", 1, n_anios_default, min(int(base["duracion"]), n_anios_default))
         salvaguarda = st.number_input("Salvaguardas %", 0.0, 100.0, 0.0)
         ingreso_extra = st.number_input("Ingreso Encadenamiento Productivo USD/año", 0.0, value=0.0)
 
@@ -343,7 +223,7 @@ else:
         elif tipo_captura == "sigmoidal":
             captura_max = st.number_input("Captura Máxima ha/año", 0.0, value=float(base["captura_max"]))
             velocidad = st.number_input("Velocidad de Captura", 0.01, 5.0, value=float(base["velocidad"]))
-            punto_medio = st.number_input("Año Punto Medio", 1, 50, int(base["punto_medio"]))
+            punto_medio = st.number_input("Año Punto Medio", 1, n_anios_default, min(int(base["punto_medio"]), n_anios_default))
 
         if tipo_sn == "degradacion":
             perdida_evitada = st.number_input("% Pérdida Evitada", 0.0, 100.0, 3.5)
@@ -380,7 +260,37 @@ else:
 
             st.session_state.soluciones.append(nueva)
 
-    df_soluciones = pd.DataFrame(st.session_state.soluciones)
+    # Soluciones de los libros cargados + las agregadas con el formulario
+    portafolios = [carga["portafolio"] for carga in st.session_state.cargas.values()]
+    if st.session_state.soluciones:
+        portafolios.append(Portafolio.desde_registros(st.session_state.soluciones))
+    portafolio = Portafolio.concatenar(portafolios)
+
+# --- Libros cargados (en los dos modos, porque ambos los incluyen en el portafolio):
+# cada uno se puede quitar junto con sus soluciones
+for huella, carga in list(st.session_state.cargas.items()):
+    col_nombre, col_quitar = st.sidebar.columns([4, 1])
+    col_nombre.caption(f"📄 {carga['archivo']} · {len(carga['portafolio'])} solución(es) · `{huella[:8]}`")
+    if col_quitar.button("✖", key=f"quitar_{huella}", help="Quitar este archivo y sus soluciones"):
+        del st.session_state.cargas[huella]
+        # Se reinicia el cargador para que el archivo quitado no vuelva a ingresar en el próximo rerun
+        st.session_state.version_cargador += 1
+        st.rerun()
+
+for carga in st.session_state.cargas.values():
+    if not carga["errores"].empty:
+        st.warning(f"❗ {len(carga['errores'])} fila(s) con errores de {carga['archivo']} no se cargaron.")
+        with st.expander(f"Ver reporte de errores de carga ({carga['archivo']})", expanded=False):
+            st.dataframe(carga["errores"], hide_index=True)
+
+# El motor recibe el Portafolio tipado; el DataFrame es solo para mostrar y exportar
+df_soluciones = portafolio.a_dataframe()
+
+# Cronograma de gastos comunes: el de la hoja "Gastos" del último libro que la trae
+cargas_con_gastos = [carga for carga in st.session_state.cargas.values() if carga.get("gastos") is not None]
+if cargas_con_gastos:
+    parametros = replace(parametros, gastos_adicionales_comunes=cargas_con_gastos[-1]["gastos"])
+    st.sidebar.caption(f"💸 Gastos comunes: hoja 'Gastos' de {cargas_con_gastos[-1]['archivo']}")
 
 # --- MOSTRAR TABLA DE ENTRADA ---
 st.subheader("Soluciones Climáticas Actuales")
@@ -390,252 +300,59 @@ else:
     st.info("Agrega soluciones para comenzar.")
 
 # --- CÁLCULO DE RESULTADOS ---
+instrumentacion.marcar("Resultados")
 st.subheader("Resultados de Modelación")
 
 if not df_soluciones.empty:
-    resultados = []
-    flujo_total = np.zeros(n_anios_default)
-    #st.write("Columnas actuales:", df_soluciones.columns.tolist())
-
-    for _, sol in df_soluciones.iterrows():
-        dur = int(sol["Duración (años)"])
-        area_total = sol["Área (ha)"] * multiplicador_area
-        tipo_captura = sol.get("Tipo Captura", "constante")
-        tipo_sn = sol.get("Tipo SNC", "restauracion")
-        anos_area_escalonada = sol.get("Años para 100% área", 1)
-
-        # --- Distribución escalonada del área
-        if anos_area_escalonada == 1:
-            area_por_anio = np.full(dur, area_total)
-        else:
-            area_por_anio = np.concatenate([
-                np.linspace(area_total / anos_area_escalonada, area_total, anos_area_escalonada),
-                np.full(dur - anos_area_escalonada, area_total)
-            ])
-        area_por_anio = np.pad(area_por_anio, (0, n_anios_default - len(area_por_anio)), constant_values=area_total)
-
-        # --- Cálculo de captura por ha según tipo
-        if tipo_captura == "lineal":
-            cap_ini = soluciones_predeterminadas[sol["Solución"]]["captura_inicial"]
-            cap_fin = soluciones_predeterminadas[sol["Solución"]]["captura_final"]
-            cap_ha = np.linspace(cap_ini, cap_fin, dur)
-        elif tipo_captura == "sigmoidal":
-            cap_max = soluciones_predeterminadas[sol["Solución"]]["captura_max"]
-            k = soluciones_predeterminadas[sol["Solución"]]["velocidad"]
-            x0 = soluciones_predeterminadas[sol["Solución"]]["punto_medio"]
-            x_vals = np.arange(dur)
-            cap_ha = cap_max / (1 + np.exp(-k * (x_vals - x0)))
-        else:  # constante
-            cap_ha_valor = sol["Captura por ha (tCO2e)"]
-            cap_ha = np.full(dur, cap_ha_valor)
-
-        cap_ha = np.pad(cap_ha, (0, n_anios_default - len(cap_ha)), constant_values=0)
-
-        # --- Salvaguarda como descuento de riesgo
-        salv = 1 - sol["Salvaguardas (%)"] / 100
-
-        # --- Validar pérdida evitada con protección de formato
-        perdida_raw = sol.get("% Pérdida Evitada", sol.get("Pérdida Evitada (%)", 0.0))
-        perdida_str = str(perdida_raw).replace(",", ".")  # Por si viene como "3,88"
-        try:
-            perdida_pct = float(perdida_str) / 100
-        except ValueError:
-            perdida_pct = 0.0
+    mas_largas = portafolio.nombre[portafolio.duracion > n_anios_default]
+    if len(mas_largas):
+        st.warning(
+            f"{len(mas_largas)} solución(es) duran más que el horizonte de {n_anios_default} años; "
+            f"solo se evalúan los primeros {n_anios_default} años: " + ", ".join(mas_largas[:10])
+        )
 
-        #st.write(f"🧪 Valor crudo de pérdida evitada: {perdida_raw}")
-        #st.write(f"🧪 Interpretado como proporción: {perdida_pct:.4f} ({perdida_pct*100:.2f}%)")
+    # Evaluación vectorizada de todo el portafolio (soluciones × años)
+    salidas_lote, totales_lote = calcular_vpn_lote_incremental(portafolio, parametros, evaluacion)
+    vpn_lote, flujo_lote, captura_lote, area_lote, costo_lote, monitoreo_lote, gastos_adicionales = salidas_lote
+    flujo_total = totales_lote[1]
+
+    # === Gráfico: Captura acumulada de carbono por solución + total (una vez por portafolio) ===
+    st.markdown("### 📈 Captura Acumulada de Carbono por Solución y Total")
+
+    captura_acumulada = np.cumsum(captura_lote, axis=1)
+    nombres_graf = np.append(portafolio.nombre.astype(str), "Total Portafolio")
+    df_graf = pd.DataFrame({
+        "Año": np.tile(np.arange(1, n_anios_default + 1), len(nombres_graf)),
+        "Solución": np.repeat(nombres_graf, n_anios_default),
+        "Captura Acumulada": np.vstack([captura_acumulada, np.cumsum(totales_lote[2])]).ravel()
+    })
+
+    # Graficar
+    fig_acum = px.line(
+        df_graf,
+        x="Año",
+        y="Captura Acumulada",
+        color="Solución",
+        title="📈 Captura de Carbono Acumulada por Solución y Total",
+        labels={"Captura Acumulada": "Toneladas CO₂e"}
+    )
+    fig_acum.update_layout(
+        xaxis_title="Año del Proyecto",
+        yaxis_title="Carbono Acumulado (tCO₂e)",
+        plot_bgcolor="white",
+        margin=dict(t=50, b=40),
+        legend_title="Solución"
+    )
+    st.plotly_chart(fig_acum, use_container_width=True, key="plot_acumulada")
 
-        # --- Cálculo de captura anual según tipo de SNC
-        if tipo_sn == "degradacion":
-            area_evitable_por_anio = area_por_anio * perdida_pct
-
-            # IMPRESIONES DE DEPURACIÓN CLAVE
-            #st.markdown("#### 🔍 Verificación de Cálculo de Degradación Evitada")
-            #st.write(f"Área total declarada: {area_total}")
-            #st.write(f"Pérdida evitada (proporción): {perdida_pct}")
-            #st.write(f"Área evitable primer año: {area_evitable_por_anio[0]}")
-            #st.write(f"Captura por ha primer año: {cap_ha[0]}")
-            #st.write(f"Salvaguarda aplicada (1 - {sol['Salvaguardas (%)']}%): {salv}")
-            #st.write(f"Captura estimada año 1: {area_evitable_por_anio[0] * cap_ha[0] * salv}")
-
-            captura_anual = area_evitable_por_anio * cap_ha * salv
-        else:
-            captura_anual = area_por_anio * cap_ha * salv
-
-        captura_total = sum(captura_anual)
-
-        # === DEPURACIÓN TEMPORAL ===
-        #st.markdown(f"### 🧪 Solución: {sol['Solución']}")
-        #st.write("Área por año:", area_por_anio.tolist())
-        #st.write("Captura por ha:", cap_ha.tolist())
-        #st.write("Captura anual:", captura_anual.tolist())
-        #st.write("Captura total estimada (tCO₂e):", captura_total)
-        # === Gráfico: Captura acumulada de carbono por solución + total ===
-        st.markdown("### 📈 Captura Acumulada de Carbono por Solución y Total")
-
-        data_acumulada = []
-
-        for _, sol in df_soluciones.iterrows():
-            nombre = sol["Solución"]
-            dur = int(sol["Duración (años)"])
-            area_total = sol["Área (ha)"] * multiplicador_area
-            tipo = sol.get("Tipo Captura", "constante")
-            tipo_sn = sol.get("Tipo SNC", "restauracion")
-            anos_area_escalonada = sol.get("Años para 100% área", 1)
-            salvaguarda = 1 - sol.get("Salvaguardas (%)", 0.0) / 100
-            perdida_pct = sol.get("% Pérdida Evitada", sol.get("Pérdida Evitada (%)", 0.0)) / 100
-
-            # Área escalonada
-            if anos_area_escalonada == 1:
-                area_por_anio = np.full(dur, area_total)
-            else:
-                area_por_anio = np.concatenate([
-                    np.linspace(area_total / anos_area_escalonada, area_total, anos_area_escalonada),
-                    np.full(dur - anos_area_escalonada, area_total)
-                ])
-            area_por_anio = np.pad(area_por_anio, (0, n_anios_default - len(area_por_anio)), constant_values=area_total)
-
-            # Captura por ha según tipo
-            if tipo == "lineal":
-                cap_ini = sol.get("Captura Inicial", 0.0)
-                cap_fin = sol.get("Captura Final", 0.0)
-                captura_ha = np.linspace(cap_ini, cap_fin, dur)
-            elif tipo == "sigmoidal":
-                cap_max = sol.get("Captura Máxima", 0.0)
-                k = sol.get("Velocidad", 1.0)
-                x0 = sol.get("Punto Medio", dur // 2)
-                x_vals = np.arange(dur)
-                captura_ha = cap_max / (1 + np.exp(-k * (x_vals - x0)))
-            else:
-                cap_ha_val = sol.get("Captura por ha (tCO2e)", 0.0)
-                captura_ha = np.full(dur, cap_ha_val)
-
-            captura_ha = np.pad(captura_ha, (0, n_anios_default - len(captura_ha)), constant_values=0)
-
-            acumulado = 0
-            for anio in range(n_anios_default):
-                if tipo_sn == "degradacion":
-                    area_efectiva = area_por_anio[anio] * perdida_pct
-                else:
-                    area_efectiva = area_por_anio[anio]
-
-                captura_anual = captura_ha[anio] * area_efectiva * salvaguarda
-                acumulado += captura_anual
-
-                data_acumulada.append({
-                    "Año": anio + 1,
-                    "Solución": nombre,
-                    "Captura Acumulada": acumulado
-                })
-
-        # Convertir a DataFrame
-        df_acumulada = pd.DataFrame(data_acumulada)
-
-        # Agregar total
-        if not df_acumulada.empty and "Año" in df_acumulada.columns:
-            df_total_acum = df_acumulada.groupby("Año")["Captura Acumulada"].sum().reset_index()
-            df_total_acum["Solución"] = "Total Portafolio"
-            df_graf = pd.concat([df_acumulada, df_total_acum], ignore_index=True)
-
-            # Graficar
-            fig_acum = px.line(
-                df_graf,
-                x="Año",
-                y="Captura Acumulada",
-                color="Solución",
-                title="📈 Captura de Carbono Acumulada por Solución y Total",
-                labels={"Captura Acumulada": "Toneladas CO₂e"}
-            )
-            fig_acum.update_layout(
-                xaxis_title="Año del Proyecto",
-                yaxis_title="Carbono Acumulado (tCO₂e)",
-                plot_bgcolor="white",
-                margin=dict(t=50, b=40),
-                legend_title="Solución"
-            )
-            st.plotly_chart(fig_acum, use_container_width=True, key=f"plot_acumulada_{uuid.uuid4()}")
-        else:
-            st.warning("⚠️ No hay datos suficientes para mostrar la captura acumulada. Agrega al menos una solución.")
-
-        # === Cálculo financiero ===
-        # Definir gastos adicionales comunes por solución
-        gastos_adicionales_comunes = [
-            {"descripcion": "Estudio base", "monto": 50000, "anio": -2},
-            {"descripcion": "Estudio base", "monto": 50000, "anio": -1},
-            {"descripcion": "Estudio base", "monto": 25000, "anio": 1},
-            {"descripcion": "Estudio base", "monto": 20000, "anio": 2},
-            {"descripcion": "Estudio base", "monto": 10000, "anio": 3},
-            {"descripcion": "Imprevistos", "monto": 3000, "anio_cada": 1, "desde": 0, "hasta": 15},
-            {"descripcion": "CostosTransaccion", "monto": 30000, "anio_cada": 3, "desde": 1, "hasta": 19},
-        ]
-        
-        resultados = []
-        flujo_total = np.zeros(n_anios_default)
-
-        for _, sol in df_soluciones.iterrows():
-            vpn, flujo_proyecto, captura_anual, area_por_anio, costo_anual, monitoreo_en_campo, gastos_adicionales = calcular_vpn_solucion(
-                sol,
-                tasa_descuento,
-                n_anios_default,
-                gastos_adicionales_comunes,
-                precio_carbono,
-                multiplicador_precio_carbono,
-                crecimiento_precio_carbono,
-                crecimiento_ingreso_encadenado
-            )
+    # === Cálculo financiero ===
+    # (las tablas año a año por solución se muestran bajo demanda en el Explorador de Soluciones)
+
+    # Crear dataframe final
+    df_resultados = tabla_resultados(portafolio, parametros, salidas_lote)
 
-            flujo_total += flujo_proyecto
-
-            captura_total = sum(captura_anual)
-            capex = sol["CAPEX Total (USD)"]
-            ingreso_base = sol["Ingreso Encadenado (USD/año)"]
-            precio_base = precio_carbono * multiplicador_precio_carbono
-
-            ingreso_carbono = sum([
-                captura_anual[i] * (precio_base * ((1 + crecimiento_precio_carbono) ** i))
-                for i in range(len(captura_anual))
-            ])
-            ingreso_encadenado = sum([
-                ingreso_base * ((1 + crecimiento_ingreso_encadenado) ** i)
-                for i in range(len(captura_anual))
-            ])
-            ingreso_total = ingreso_carbono + ingreso_encadenado
-
-            resultados.append({
-                "Solución": sol["Solución"],
-                "Área (ha)": sol["Área (ha)"] * multiplicador_area,
-                "Carbono Total (tCO2e)": captura_total,
-                "Costo Total (USD)": sum(costo_anual),
-                "CAPEX Total (USD)": capex,
-                "Ingreso Total (USD)": ingreso_total,
-                "VPN (USD)": vpn
-            })
-
-            df_tabla_financiera = pd.DataFrame({
-                "Año": np.arange(1, n_anios_default + 1),
-                "Área aplicada (ha)": np.round(area_por_anio, 2),
-                "Captura anual (tCO₂e)": np.round(captura_anual, 2),
-                "Ingreso carbono (USD)": [
-                    round(captura_anual[i] * precio_base * ((1 + crecimiento_precio_carbono) ** i), 2)
-                    if i < len(captura_anual) else 0 for i in range(n_anios_default)
-                ],
-                "Ingreso encadenado (USD)": [
-                    round(ingreso_base * ((1 + crecimiento_ingreso_encadenado) ** i), 2)
-                    if i < len(captura_anual) else 0 for i in range(n_anios_default)
-                ],
-                "OPEX ajustado (USD)": np.round(costo_anual, 2),
-                "Monitoreo campo (USD)": np.round(monitoreo_en_campo, 2),
-                "Gastos adicionales (USD)": np.round(gastos_adicionales, 2),
-                "Flujo neto (USD)": np.round(flujo_proyecto, 2)
-            })
-
-            st.subheader(f"🔍 Flujo de Caja Año a Año para: {sol['Solución']}")
-            st.dataframe(df_tabla_financiera)
-
-        # Crear dataframe final
-        df_resultados = pd.DataFrame(resultados)
-        
 # --- Flujo de Caja Acumulado ---
+instrumentacion.marcar("Flujo acumulado")
 anios = np.arange(1, n_anios_default + 1)
 flujo_caja_acumulado = np.cumsum(flujo_total)  # 👈 Esta línea es clave
 
@@ -668,57 +385,34 @@ st.dataframe(df_flujo)
 st.plotly_chart(fig_flujo, use_container_width=True)
 
 # --- Matriz Comparativa (RECONSTRUIDA y BLINDADA) ---
-matriz_comparativa = []
-
-for _, sol in df_soluciones.iterrows():
-    try:
-        vpn, flujo_proyecto, captura_anual, area_por_anio, costo_anual, monitoreo_en_campo, gastos_adicionales = calcular_vpn_solucion(
-            sol,
-            tasa_descuento,
-            n_anios_default,
-            gastos_adicionales_comunes,
-            precio_carbono,
-            multiplicador_precio_carbono,
-            crecimiento_precio_carbono,
-            crecimiento_ingreso_encadenado
-        )
+instrumentacion.marcar("Matriz comparativa")
+df_comparativa = None
 
-        area_total = sol["Área (ha)"] * multiplicador_area
-        carbono_total = sum(captura_anual)
-        costo_total = sum(costo_anual)
-
-        matriz_comparativa.append({
-            "Solución": sol["Solución"],
-            "Área (ha)": area_total,
-            "Carbono Total (tCO2e)": carbono_total,
-            "VPN (USD)": vpn,
-            "Costo Total (USD)": costo_total,
-            "Eficiencia CO₂e/ha": carbono_total / area_total if area_total > 0 else 0,
-            "Eficiencia VPN/ha": vpn / area_total if area_total > 0 else 0
-        })
-        # --- TRAZABILIDAD: mostrar datos clave para depurar diferencias de VPN ---
-        st.markdown(f"#### Trazabilidad: {sol['Solución']}")
-        st.code(f"""
-        Área total (ha): {area_total}
-        Carbono total (tCO2e): {carbono_total}
-        VPN (USD): {vpn}
-        Costo total (USD): {costo_total}
-        Tasa de descuento aplicada: {tasa_descuento}
-        Precio del carbono (USD/tCO2e): {precio_carbono}
-        Multiplicador precio carbono: {multiplicador_precio_carbono}
-        Crecimiento precio carbono: {crecimiento_precio_carbono}
-        Ingreso encadenado: {sol.get('Ingreso Encadenado (USD/año)', 0)}
-        Salvaguardas (%): {sol.get('Salvaguardas (%)', 0)}
-        % Pérdida evitada: {sol.get('% Pérdida Evitada', sol.get('Pérdida Evitada (%)', 0))}
-        """)
-    except Exception as e:
-        st.error(f"❌ Error al procesar la solución '{sol.get('Solución', 'N/A')}': {e}")
+if not df_soluciones.empty:
+    # Misma evaluación en lote de la sección de resultados (salidas_lote); columnas completas, sin recorrer filas
+    area_total = portafolio.area * multiplicador_area
+    carbono_total = captura_lote.sum(axis=1)
+    con_area = area_total > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eficiencia_carbono = np.where(con_area, carbono_total / area_total, 0.0)
+        eficiencia_vpn = np.where(con_area, vpn_lote / area_total, 0.0)
+    df_comparativa = pd.DataFrame({
+        "Solución": portafolio.nombre,
+        "Área (ha)": area_total,
+        "Carbono Total (tCO2e)": carbono_total,
+        "VPN (USD)": vpn_lote,
+        "Costo Total (USD)": costo_lote.sum(axis=1),
+        "Eficiencia CO₂e/ha": eficiencia_carbono,
+        "Eficiencia VPN/ha": eficiencia_vpn,
+        # Resueltos para todo el portafolio en tabla_resultados (bisección vectorizada)
+        "TIR (%)": df_resultados["TIR (%)"].to_numpy(),
+        "Precio de Equilibrio (USD/tCO2e)": df_resultados["Precio de Equilibrio (USD/tCO2e)"].to_numpy()
+    })
 
 # Validar si hubo resultados
-if not matriz_comparativa:
+if df_comparativa is None:
     st.warning("⚠️ No se pudo generar la matriz comparativa. Revisa los datos de entrada.")
 else:
-    df_comparativa = pd.DataFrame(matriz_comparativa)
     df_comparativa.iloc[:, 1:] = df_comparativa.iloc[:, 1:].round(2)
 
     # Validar columnas para estilos
@@ -735,99 +429,28 @@ else:
             .format({col: "{:,.2f}" for col in df_comparativa.columns if col != "Solución"})
     )
 
-st.markdown("## 📊 Heatmaps de Sensibilidad por Solución Individual")
-
-for _, sol in df_soluciones.iterrows():
-    nombre_solucion = sol['Solución']
-    st.markdown(f"### 🔹 {nombre_solucion}")
-
-    rango_precio = np.arange(5, 51, 5)
-    rango_descuento = np.arange(1, 22, 1)
-    matriz_vpn_individual = np.zeros((len(rango_descuento), len(rango_precio)))
-
-    for i, td in enumerate(rango_descuento):
-        for j, pc in enumerate(rango_precio):
-            tasa = td / 100
-            try:
-                vpn, _, _, _, _, _, _ = calcular_vpn_solucion(
-                    sol,
-                    tasa,
-                    n_anios_default,
-                    gastos_adicionales_comunes,
-                    pc,
-                    multiplicador_precio_carbono,
-                    crecimiento_precio_carbono,
-                    crecimiento_ingreso_encadenado
-                )
-                matriz_vpn_individual[i, j] = vpn
-            except Exception as e:
-                matriz_vpn_individual[i, j] = np.nan  # o 0 si prefieres
-
-    zmax_manual = 1000000  # ajustar a criterio
-
-    fig = go.Figure(
-        data=go.Heatmap(
-            z=matriz_vpn_individual,
-            x=rango_precio,
-            y=rango_descuento,
-            zmin=0,
-            zmax=zmax_manual,
-            colorscale='Viridis',
-            colorbar=dict(
-                title="VPN (USD)",
-                tickformat=",",
-                ticksuffix="",
-                exponentformat="none"
-            )
-        )
-    )
-
-    fig.update_layout(
-        title=f"🌡️ Sensibilidad del VPN – {nombre_solucion}",
-        xaxis_title="Precio del Carbono (USD/tCO₂e)",
-        yaxis_title="Tasa de Descuento (%)",
-        margin=dict(l=40, r=40, t=60, b=40)
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
-
-# --- Heatmap de Sensibilidad del VPN (USANDO FUNCIÓN CENTRAL UNIFICADA) ---
+# --- Grilla de sensibilidad: todas las celdas (tasa × precio) de todas las soluciones en una pasada
+instrumentacion.marcar("Heatmaps")
 rango_precio = np.arange(5, 51, 5)
 rango_descuento = np.arange(1, 22, 1)
+grilla_vpn = np.zeros((len(rango_descuento), len(rango_precio), len(portafolio)))
 matriz_vpn = np.zeros((len(rango_descuento), len(rango_precio)))
 
-for i, td in enumerate(rango_descuento):
-    for j, pc in enumerate(rango_precio):
-        tasa = td / 100
-        vpn_total = 0
-
-        for _, sol in df_soluciones.iterrows():
-            vpn, _, _, _, _, _, _ = calcular_vpn_solucion(
-                sol,
-                tasa,
-                n_anios_default,
-                gastos_adicionales_comunes,
-                pc,  # precio del carbono (variable del heatmap)
-                multiplicador_precio_carbono,
-                crecimiento_precio_carbono,
-                crecimiento_ingreso_encadenado
-            )
-            # Trazabilidad solo para el punto base (tasa = 12%, precio = 14.75)
-            if abs(tasa - 0.12) < 1e-6 and abs(pc - 14.75) < 1e-3:
-                st.markdown(f"#### 🧮 Heatmap VPN Individual – Solución: {sol['Solución']}")
-                st.code(f"""
-            VPN (USD): {vpn:,.2f}
-            Área total (ha): {sol["Área (ha)"] * multiplicador_area}
-            Captura por ha (tCO2e): {sol.get("Captura por ha (tCO2e)", "-")}
-            Ingreso encadenado (USD/año): {sol.get("Ingreso Encadenado (USD/año)", 0)}
-            Salvaguardas (%): {sol.get("Salvaguardas (%)", 0)}
-            Pérdida evitada (%): {sol.get("% Pérdida Evitada", sol.get("Pérdida Evitada (%)", 0))}
-            Tipo SNC: {sol.get("Tipo SNC", "-")}
-            Tipo Captura: {sol.get("Tipo Captura", "-")}
-                """)
-            vpn_total += vpn
+if not df_soluciones.empty:
+    try:
+        grilla_vpn, matriz_vpn = calcular_vpn_grilla_incremental(
+            portafolio,
+            parametros,
+            rango_descuento / 100,
+            rango_precio,
+            evaluacion
+        )
+    except Exception as e:
+        grilla_vpn[:] = np.nan
+        matriz_vpn[:] = np.nan
+        st.error(f"❌ Error al calcular la grilla de sensibilidad: {e}")
 
-        matriz_vpn[i, j] = vpn_total
+# --- Heatmap de Sensibilidad del VPN (suma de los heatmaps individuales, llevada como total incremental) ---
 
 # Gráfico
 # Crear heatmap base
@@ -849,19 +472,14 @@ fig_heat.add_trace(go.Heatmap(
 
 # 🔵 Agregar punto base (tasa = 12%, precio = 14.75 USD)
 # Recalcular VPN exacto para ese punto
-vpn_base_visual = 0
-for _, sol in df_soluciones.iterrows():
-    vpn, _, _, _, _, _, _ = calcular_vpn_solucion(
-        sol,
-        0.12,
-        n_anios_default,
-        gastos_adicionales_comunes,
-        14.75,
-        multiplicador_precio_carbono,
-        crecimiento_precio_carbono,
-        crecimiento_ingreso_encadenado
-    )
-    vpn_base_visual += vpn
+vpn_base_lote = np.zeros(0)
+if not df_soluciones.empty:
+    vpn_base_lote = calcular_vpn_lote_incremental(
+        portafolio,
+        replace(parametros, tasa_descuento=0.12, precio_carbono=14.75),
+        evaluacion
+    )[0][0]
+vpn_base_visual = vpn_base_lote.sum()
 
 
 # Layout general
@@ -876,26 +494,104 @@ st.plotly_chart(fig_heat, use_container_width=True)
 
 st.markdown("### 🧪 Verificación Manual del Caso Base (14.75 USD, 12%)")
 
-vpn_total_manual = 0
-
-for _, sol in df_soluciones.iterrows():
-    vpn, _, _, _, _, _, _ = calcular_vpn_solucion(
-        sol,
-        0.12,             # tasa de descuento
-        n_anios_default,
-        gastos_adicionales_comunes,
-        14.75,            # precio del carbono
-        multiplicador_precio_carbono,
-        crecimiento_precio_carbono,
-        crecimiento_ingreso_encadenado
+vpn_total_manual = vpn_base_lote.sum()  # caso base ya evaluado en lote (tasa 12%, precio 14.75)
+
+st.success(f"✅ VPN total acumulado para el caso base (14.75 USD, 12%): {vpn_total_manual:,.2f}")
+
+# --- Explorador de Soluciones: el detalle por solución se arma solo para la solución elegida ---
+instrumentacion.marcar("Explorador de soluciones")
+st.markdown("## 🔎 Explorador de Soluciones")
+
+if df_soluciones.empty:
+    st.info("Agrega soluciones para ver su detalle.")
+else:
+    tamano_pagina = 25
+    n_paginas = (len(df_soluciones) - 1) // tamano_pagina + 1
+    col_pagina, col_solucion = st.columns([1, 3])
+    pagina = col_pagina.number_input(f"Página (de {n_paginas})", 1, n_paginas, 1, key="explorador_pagina") if n_paginas > 1 else 1
+    posiciones_pagina = range((pagina - 1) * tamano_pagina, min(pagina * tamano_pagina, len(df_soluciones)))
+    k = col_solucion.selectbox(
+        "Solución",
+        posiciones_pagina,
+        format_func=lambda pos: f"{pos + 1}. {portafolio.nombre[pos]}",
+        key=f"explorador_solucion_{pagina}"
     )
+    sol = df_soluciones.iloc[k]  # solo para mostrar sus datos de entrada
+    nombre_solucion = portafolio.nombre[k]
+    area_total = portafolio.area[k] * multiplicador_area
+
+    # Flujo de caja año a año (solo la fila elegida)
+    salidas_solucion = tuple(salida[k:k + 1] for salida in salidas_lote[:6]) + (salidas_lote[6],)
+    for nombre, df_tabla_financiera in tablas_flujo_caja(portafolio.tomar(slice(k, k + 1)), parametros, salidas_solucion):
+        st.subheader(f"🔍 Flujo de Caja Año a Año para: {nombre}")
+        st.dataframe(df_tabla_financiera)
+
+    # --- TRAZABILIDAD: mostrar datos clave para depurar diferencias de VPN ---
+    st.markdown(f"#### Trazabilidad: {nombre_solucion}")
+    st.code(f"""
+    Área total (ha): {area_total}
+    Carbono total (tCO2e): {salidas_lote[2][k].sum()}
+    VPN (USD): {salidas_lote[0][k]}
+    Costo total (USD): {salidas_lote[4][k].sum()}
+    Tasa de descuento aplicada: {tasa_descuento}
+    Precio del carbono (USD/tCO2e): {precio_carbono}
+    Multiplicador precio carbono: {multiplicador_precio_carbono}
+    Crecimiento precio carbono: {crecimiento_precio_carbono}
+    Ingreso encadenado: {sol.get('Ingreso Encadenado (USD/año)', 0)}
+    Salvaguardas (%): {sol.get('Salvaguardas (%)', 0)}
+    % Pérdida evitada: {sol.get('% Pérdida Evitada', sol.get('Pérdida Evitada (%)', 0))}
+    """)
 
-    vpn_total_manual += vpn
+    # Heatmap de sensibilidad individual
+    zmax_manual = 1000000  # ajustar a criterio
 
-    st.markdown(f"#### 🔍 Solución: {sol['Solución']}")
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=grilla_vpn[:, :, k],
+            x=rango_precio,
+            y=rango_descuento,
+            zmin=0,
+            zmax=zmax_manual,
+            colorscale='Viridis',
+            colorbar=dict(
+                title="VPN (USD)",
+                tickformat=",",
+                ticksuffix="",
+                exponentformat="none"
+            )
+        )
+    )
+
+    fig.update_layout(
+        title=f"🌡️ Sensibilidad del VPN – {nombre_solucion}",
+        xaxis_title="Precio del Carbono (USD/tCO₂e)",
+        yaxis_title="Tasa de Descuento (%)",
+        margin=dict(l=40, r=40, t=60, b=40)
+    )
+
+    st.plotly_chart(fig, use_container_width=True, key="plot_heatmap_solucion")
+
+    # Trazabilidad solo para el punto base (tasa = 12%, precio = 14.75), si está en la grilla
+    for i, td in enumerate(rango_descuento):
+        for j, pc in enumerate(rango_precio):
+            if abs(td / 100 - 0.12) < 1e-6 and abs(pc - 14.75) < 1e-3:
+                st.markdown(f"#### 🧮 Heatmap VPN Individual – Solución: {nombre_solucion}")
+                st.code(f"""
+            VPN (USD): {grilla_vpn[i, j, k]:,.2f}
+            Área total (ha): {area_total}
+            Captura por ha (tCO2e): {sol.get("Captura por ha (tCO2e)", "-")}
+            Ingreso encadenado (USD/año): {sol.get("Ingreso Encadenado (USD/año)", 0)}
+            Salvaguardas (%): {sol.get("Salvaguardas (%)", 0)}
+            Pérdida evitada (%): {sol.get("% Pérdida Evitada", sol.get("Pérdida Evitada (%)", 0))}
+            Tipo SNC: {sol.get("Tipo SNC", "-")}
+            Tipo Captura: {sol.get("Tipo Captura", "-")}
+                """)
+
+    # Verificación manual del caso base para la solución elegida
+    st.markdown(f"#### 🔍 Verificación Caso Base – Solución: {nombre_solucion}")
     st.code(f'''
-VPN individual: {vpn}
-Área total (ha): {sol["Área (ha)"] * multiplicador_area}
+VPN individual: {vpn_base_lote[k]}
+Área total (ha): {area_total}
 Ingreso encadenado (USD/año): {sol.get("Ingreso Encadenado (USD/año)", 0)}
 Salvaguardas (%): {sol.get("Salvaguardas (%)", 0)}
 % Pérdida evitada: {sol.get("% Pérdida Evitada", sol.get("Pérdida Evitada (%)", 0))}
@@ -903,38 +599,35 @@ Tipo Captura: {sol.get("Tipo Captura", "-")}
 Tipo SNC: {sol.get("Tipo SNC", "-")}
 ''')
 
-st.success(f"✅ VPN total acumulado para el caso base (14.75 USD, 12%): {vpn_total_manual:,.2f}")
-
 # --- Comparación de Escenarios VPN (Corregido con función central) ---
+instrumentacion.marcar("Escenarios")
 precios = [precio_carbono * 0.8, precio_carbono, precio_carbono * 1.2]
 etiquetas = ["Bajo", "Caso Base", "Alto"]
 df_escenarios_plot = []
+vpn_por_escenario = {}
 
 for i, p in enumerate(precios):
-    for _, sol in df_soluciones.iterrows():
-        try:
-            vpn, _, _, _, _, _, _ = calcular_vpn_solucion(
-                sol,
-                tasa_descuento,  # O ajustada si tú decides aplicarla
-                n_anios_default,
-                gastos_adicionales_comunes,
-                p,  # Precio del carbono del escenario
-                multiplicador_precio_carbono,
-                crecimiento_precio_carbono,
-                crecimiento_ingreso_encadenado
-            )
-
-            df_escenarios_plot.append({
-                "Solución": sol["Solución"],
-                "VPN": vpn,
-                "Escenario": etiquetas[i]
-            })
+    if df_soluciones.empty:
+        break
+    try:
+        vpn_escenario = calcular_vpn_lote_incremental(
+            portafolio,
+            replace(parametros, precio_carbono=p),
+            evaluacion
+        )[0][0]
+        vpn_por_escenario[etiquetas[i]] = vpn_escenario
+
+        df_escenarios_plot.append(pd.DataFrame({
+            "Solución": portafolio.nombre,
+            "VPN": vpn_escenario,
+            "Escenario": etiquetas[i]
+        }))
 
-        except Exception as e:
-            st.error(f"❌ Error en solución '{sol.get('Solución', 'N/A')}' – Escenario {etiquetas[i]}: {e}")
+    except Exception as e:
+        st.error(f"❌ Error en el portafolio – Escenario {etiquetas[i]}: {e}")
 
 # Convertir a DataFrame y graficar
-df_escenarios_plot = pd.DataFrame(df_escenarios_plot)
+df_escenarios_plot = pd.concat(df_escenarios_plot, ignore_index=True) if df_escenarios_plot else pd.DataFrame()
 
 if not df_escenarios_plot.empty and all(col in df_escenarios_plot.columns for col in ["Solución", "VPN", "Escenario"]):
     fig_escenarios = px.bar(
@@ -958,37 +651,220 @@ if not df_escenarios_plot.empty and all(col in df_escenarios_plot.columns for co
 else:
     st.info("⚠️ No hay datos suficientes para mostrar el gráfico de comparación de escenarios.")
 
-# --- Visualización 3D (Coherente con el modelo) ---
-data_3d = []
+# --- Análisis de Incertidumbre Monte Carlo ---
+instrumentacion.marcar("Monte Carlo")
+with st.expander("🎲 Análisis de Incertidumbre Monte Carlo", expanded=False):
+    activar_montecarlo = st.checkbox("Ejecutar simulación Monte Carlo", value=False)
+    col_mc1, col_mc2, col_mc3 = st.columns(3)
+    n_muestras_mc = col_mc1.number_input("Número de muestras", 100, 200000, 5000, 500)
+    semilla_mc = col_mc2.number_input("Semilla", 0, value=42)
+    trabajadores_mc = col_mc3.number_input("Procesos en paralelo", 1, os.cpu_count() or 1, 1)
+
+    st.markdown("Variación triangular (± alrededor del valor base) por solución:")
+    df_config_mc = st.data_editor(
+        pd.DataFrame({
+            "Solución": portafolio.nombre.astype(str),
+            "Captura por ha (±%)": 20.0,
+            "OPEX (±%)": 15.0,
+            "Salvaguardas (±pp)": 5.0,
+            "% Pérdida Evitada (±pp)": 1.0
+        }),
+        disabled=["Solución"],
+        hide_index=True,
+        key="config_montecarlo"
+    )
+    rango_crecimiento_mc = st.slider(
+        "Crecimiento anual del precio del carbono (%): mínimo y máximo",
+        0.0, 15.0,
+        (max(0.0, crecimiento_precio_carbono * 100 - 2), min(15.0, crecimiento_precio_carbono * 100 + 2))
+    )
 
-for _, sol in df_soluciones.iterrows():
-    try:
-        vpn, flujo_proyecto, captura_anual, area_por_anio, _, _, _ = calcular_vpn_solucion(
-            sol,
-            tasa_descuento,  # o ajustada si quieres
-            n_anios_default,
-            gastos_adicionales_comunes,
-            precio_carbono,
-            multiplicador_precio_carbono,
-            crecimiento_precio_carbono,
-            crecimiento_ingreso_encadenado
+    if activar_montecarlo and not df_soluciones.empty:
+        def _triangular(base, delta, minimo=-np.inf, maximo=np.inf):
+            if delta <= 0:
+                return None
+            return {"dist": "triangular", "min": max(minimo, base - delta), "moda": base, "max": min(maximo, base + delta)}
+
+        por_solucion_mc = {}
+        for k, fila in enumerate(df_config_mc.itertuples(index=False)):
+            especificacion = {
+                "factor_captura": _triangular(1.0, fila[1] / 100, minimo=0.0),
+                "factor_opex": _triangular(1.0, fila[2] / 100, minimo=0.0),
+                "salvaguardas": _triangular(float(portafolio.salvaguardas[k]), fila[3], 0.0, 100.0)
+            }
+            if portafolio.tipo_snc[k] == TipoSNC.DEGRADACION:
+                especificacion["perdida_evitada"] = _triangular(float(portafolio.perdida_evitada[k]), fila[4], 0.0, 100.0)
+            por_solucion_mc[k] = {clave: spec for clave, spec in especificacion.items() if spec}
+
+        crecimiento_min, crecimiento_max = (v / 100 for v in rango_crecimiento_mc)
+        globales_mc = {}
+        if crecimiento_min < crecimiento_max:
+            globales_mc["crecimiento_precio_carbono"] = {
+                "dist": "triangular",
+                "min": crecimiento_min,
+                "moda": min(max(crecimiento_precio_carbono, crecimiento_min), crecimiento_max),
+                "max": crecimiento_max
+            }
+
+        resultado_mc = simular_montecarlo(
+            portafolio,
+            parametros,
+            ConfiguracionMonteCarlo(por_solucion=por_solucion_mc, globales=globales_mc),
+            n_muestras=int(n_muestras_mc),
+            semilla=int(semilla_mc),
+            trabajadores=int(trabajadores_mc)
         )
+        df_resumen_mc = resultado_mc.resumen()
+        vpn_portafolio_mc = resultado_mc.vpn_portafolio
+        p5_mc, p50_mc, p95_mc = np.percentile(vpn_portafolio_mc, [5, 50, 95])
+
+        col_mc1, col_mc2, col_mc3, col_mc4 = st.columns(4)
+        col_mc1.metric("VPN P5 (USD)", f"{p5_mc:,.0f}")
+        col_mc2.metric("VPN P50 (USD)", f"{p50_mc:,.0f}")
+        col_mc3.metric("VPN P95 (USD)", f"{p95_mc:,.0f}")
+        col_mc4.metric("Prob. VPN < 0", f"{(vpn_portafolio_mc < 0).mean():.1%}")
+
+        fig_mc = px.histogram(
+            pd.DataFrame({"VPN Portafolio (USD)": vpn_portafolio_mc}),
+            x="VPN Portafolio (USD)",
+            nbins=60,
+            title="🎲 Distribución del VPN del Portafolio (Monte Carlo)"
+        )
+        for valor, etiqueta in [(p5_mc, "P5"), (p50_mc, "P50"), (p95_mc, "P95")]:
+            fig_mc.add_vline(x=valor, line_dash="dash", line_color="#003366", annotation_text=etiqueta)
+        fig_mc.update_layout(plot_bgcolor="white", yaxis_title="Frecuencia", margin=dict(t=50, b=40))
+        st.plotly_chart(fig_mc, use_container_width=True)
+
+        st.dataframe(
+            df_resumen_mc.style.format(
+                {col: "{:,.2f}" for col in df_resumen_mc.columns if col not in ("Solución", "Prob. VPN < 0")}
+                | {"Prob. VPN < 0": "{:.1%}"}
+            )
+        )
+
+# --- Optimizador de Portafolio ---
+instrumentacion.marcar("Optimizador")
+with st.expander("🧮 Optimizador de Portafolio (VPN / Carbono con restricciones)", expanded=False):
+    fuente_opt = st.radio(
+        "Candidatos", ("Catálogo predeterminado", "Soluciones actuales"), horizontal=True, key="optimizador_fuente"
+    )
+    col_op1, col_op2, col_op3 = st.columns(3)
+    presupuesto_opt = col_op1.number_input("Presupuesto CAPEX (USD, 0 = sin límite)", 0.0, value=0.0, step=1000.0)
+    area_max_opt = col_op2.number_input("Área total máxima (ha, 0 = sin límite)", 0.0, value=5000.0, step=100.0)
+    area_candidato_opt = col_op3.number_input(
+        "Área máxima por solución del catálogo (ha)", 1.0, value=1000.0, step=100.0,
+        disabled=fuente_opt != "Catálogo predeterminado"
+    )
+    col_op4, col_op5 = st.columns(2)
+    objetivo_opt = col_op4.radio("Maximizar", ("VPN", "Carbono"), horizontal=True)
+    niveles_opt = col_op5.slider("Niveles de área por solución", 2, 20, 10)
 
-        carbono_total = np.sum(captura_anual)
-        area_total = np.sum(area_por_anio)
+    if st.button("Optimizar portafolio"):
+        if fuente_opt == "Catálogo predeterminado":
+            candidatos = candidatos_desde_catalogo(soluciones_predeterminadas, area_candidato_opt)
+        else:
+            # El área de cada solución actual (con el multiplicador de área) es su máximo asignable
+            candidatos = replace(portafolio, area=portafolio.area * multiplicador_area)
+        if not len(candidatos):
+            st.warning("⚠️ No hay soluciones candidatas para optimizar.")
+        else:
+            restricciones_opt = RestriccionesPortafolio(
+                presupuesto_capex=presupuesto_opt if presupuesto_opt > 0 else np.inf,
+                area_maxima=area_max_opt if area_max_opt > 0 else np.inf,
+                niveles_area=niveles_opt
+            )
+            resultado_opt = optimizar_portafolio(candidatos, parametros, restricciones_opt, objetivo_opt.lower())
+            col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+            col_r1.metric("VPN total", f"{resultado_opt.vpn_total:,.0f} USD")
+            col_r2.metric("Carbono total", f"{resultado_opt.carbono_total:,.0f} tCO₂e")
+            col_r3.metric("CAPEX", f"{resultado_opt.capex_total:,.0f} USD")
+            col_r4.metric("Área", f"{resultado_opt.area_total:,.0f} ha")
+            st.dataframe(resultado_opt.asignacion.style.format(
+                {col: "{:,.2f}" for col in resultado_opt.asignacion.columns if col != "Solución"}
+            ))
+
+            df_frente = frente_pareto(candidatos, parametros, restricciones_opt)
+            fig_frente = px.line(
+                df_frente,
+                x="Carbono Total (tCO2e)",
+                y="VPN (USD)",
+                markers=True,
+                hover_data=["Peso VPN", "CAPEX (USD)", "Área (ha)", "Soluciones"],
+                title="📐 Frente de Pareto: Carbono vs VPN"
+            )
+            fig_frente.update_layout(plot_bgcolor="white", margin=dict(t=50, b=40))
+            st.plotly_chart(fig_frente, use_container_width=True, key="plot_frente_pareto")
+
+# --- Análisis Tornado (sensibilidad uno a la vez) ---
+instrumentacion.marcar("Tornado")
+with st.expander("🌪️ Análisis Tornado (sensibilidad uno a la vez)", expanded=False):
+    activar_tornado = st.checkbox("Ejecutar análisis tornado", value=False)
+    df_variaciones = st.data_editor(
+        pd.DataFrame({
+            "Variable": [descripcion for descripcion, _ in VARIABLES_TORNADO.values()],
+            "Unidad": [unidad for _, unidad in VARIABLES_TORNADO.values()],
+            "Variación (±)": list(VARIACIONES_PREDETERMINADAS.values())
+        }),
+        disabled=["Variable", "Unidad"],
+        hide_index=True,
+        key="config_tornado"
+    )
 
-        data_3d.append({
-            "Solución": sol["Solución"],
-            "Área (ha)": area_total,
-            "Carbono Total (tCO2e)": carbono_total,
-            "VPN (USD)": vpn
-        })
+    if activar_tornado and not df_soluciones.empty:
+        variaciones_tornado = dict(zip(VARIABLES_TORNADO, df_variaciones["Variación (±)"].astype(float)))
+        df_tornado = calcular_tornado(portafolio, parametros, variaciones_tornado)
 
-    except Exception as e:
-        st.error(f"❌ Error en solución '{sol.get('Solución', 'N/A')}': {e}")
+        opciones_tornado = ["Total Portafolio"] + list(range(len(portafolio)))
+        eleccion_tornado = st.selectbox(
+            "Ver tornado de",
+            opciones_tornado,
+            format_func=lambda op: op if isinstance(op, str) else f"{op + 1}. {portafolio.nombre[op]}",
+            key="tornado_solucion"
+        )
+        filas_por_solucion = len(df_tornado) // (len(portafolio) + 1)
+        bloque = len(portafolio) if isinstance(eleccion_tornado, str) else eleccion_tornado
+        df_tornado_sel = df_tornado.iloc[bloque * filas_por_solucion:(bloque + 1) * filas_por_solucion]
+
+        vpn_base_tornado = df_tornado_sel["VPN Base (USD)"].iat[0] if not df_tornado_sel.empty else 0.0
+        fig_tornado = go.Figure()
+        for columna, color in [("VPN Bajo (USD)", "#d62728"), ("VPN Alto (USD)", "#2ca02c")]:
+            fig_tornado.add_trace(go.Bar(
+                y=df_tornado_sel["Variable"] + " (" + df_tornado_sel["Variación"] + ")",
+                x=df_tornado_sel[columna] - vpn_base_tornado,
+                base=vpn_base_tornado,
+                orientation="h",
+                name=columna.replace(" (USD)", ""),
+                marker_color=color
+            ))
+        fig_tornado.add_vline(x=vpn_base_tornado, line_dash="dash", line_color="#003366", annotation_text="Caso base")
+        fig_tornado.update_layout(
+            barmode="overlay",
+            title=f"🌪️ Tornado del VPN – {df_tornado_sel['Solución'].iat[0] if not df_tornado_sel.empty else ''}",
+            xaxis_title="VPN (USD)",
+            yaxis=dict(autorange="reversed"),
+            plot_bgcolor="white",
+            margin=dict(t=50, b=40)
+        )
+        st.plotly_chart(fig_tornado, use_container_width=True, key="plot_tornado")
+        st.dataframe(
+            df_tornado_sel.style.format({col: "{:,.2f}" for col in df_tornado_sel.columns if "(USD)" in col}),
+            hide_index=True
+        )
+
+# --- Visualización 3D (Coherente con el modelo) ---
+instrumentacion.marcar("Visualización 3D")
+df_3d = pd.DataFrame()
+
+# Reutiliza la evaluación en lote de la matriz comparativa (mismos parámetros)
+if df_comparativa is not None:
+    df_3d = pd.DataFrame({
+        "Solución": portafolio.nombre,
+        "Área (ha)": area_lote.sum(axis=1),
+        "Carbono Total (tCO2e)": captura_lote.sum(axis=1),
+        "VPN (USD)": vpn_lote
+    })
 
-# Convertir y graficar
-df_3d = pd.DataFrame(data_3d)
+# Graficar
 
 if not df_3d.empty:
     fig3d = px.scatter_3d(
@@ -1013,42 +889,20 @@ else:
 
     
 
-#Exportación de Resultados a PDF
-import streamlit.components.v1 as components
-
-#st.markdown("Descargar la modelación como PDF")
-
-components.html("""
-    <html>
-    <head>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
-    </head>
-    <body>
-        <button onclick="exportarTodo()" style="padding:12px 24px; font-size:14px; background:#f8f9fa; color:grey; border:none; border-radius:8px;">
-            📥 Descargar Modelación Completa en PDF
-        </button>
-
-        <script>
-        async function exportarTodo() {
-            const { jsPDF } = window.jspdf;
-            const doc = new jsPDF('p', 'pt', 'a4');
-            const body = document.body;
-
-            await html2canvas(body, { scale: 2 }).then(canvas => {
-                const imgData = canvas.toDataURL("image/png");
-                const imgProps = doc.getImageProperties(imgData);
-                const pdfWidth = doc.internal.pageSize.getWidth();
-                const pdfHeight = (imgProps.height * pdfWidth) / imgProps.width;
-
-                doc.addImage(imgData, 'PNG', 0, 0, pdfWidth, pdfHeight);
-                doc.save("modelo_sumideros_completo.pdf");
-            });
-        }
-        </script>
-    </body>
-    </html>
-""", height=120)
+#Exportación de Resultados a PDF (generado en el servidor, sin conexión)
+# Se arma solo al pedirlo: "Preparar" lo genera en ese rerun y muestra el botón de descarga,
+# que desaparece en el rerun siguiente, así que nunca queda un archivo viejo ni guardado en la sesión
+if not df_soluciones.empty and st.button("⚙️ Preparar PDF de la Modelación Completa"):
+    st.download_button(
+        label="📥 Descargar Modelación Completa en PDF",
+        data=reporte_pdf_bytes(
+            df_soluciones, parametros, salidas_lote,
+            grilla=(rango_descuento, rango_precio, grilla_vpn, matriz_vpn),
+            escenarios=vpn_por_escenario
+        ),
+        file_name="modelo_sumideros_completo.pdf",
+        mime="application/pdf"
+    )
 
 
 #st.markdown("## 📘 Glosario de Modelo SNC")
@@ -1065,20 +919,147 @@ with st.expander("📖 Términos clave del modelo", expanded=False):
     """)
 
 # --- Exportar a Excel ---
-import io
-output = io.BytesIO()
-with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-    df_resultados.to_excel(writer, index=False)
-output.seek(0)
-
-#st.markdown("##Exportar Resultados del Modelo")
-st.download_button(
-    label="Descargar Excel",
-    data=output,
-    file_name="resultados_modelo_SNC.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# El libro (varias hojas, escrito fila por fila) se arma solo al pedirlo: "Preparar" lo genera en ese
+# rerun y muestra el botón de descarga (st.download_button solo acepta data diferida en versiones recientes)
+instrumentacion.marcar("Exportación")
+if not df_soluciones.empty and st.button("⚙️ Preparar Excel"):
+    st.download_button(
+        label="Descargar Excel",
+        data=libro_resultados_bytes(
+            df_soluciones, parametros, salidas_lote,
+            df_comparativa=df_comparativa,
+            grilla=(rango_descuento, rango_precio, grilla_vpn, matriz_vpn),
+            escenarios=vpn_por_escenario
+        ),
+        file_name="resultados_modelo_SNC.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+# --- Historial de corridas (almacén columnar en disco) ---
+instrumentacion.marcar("Historial")
+almacen = AlmacenResultados()
+with st.expander("🗄️ Historial de corridas", expanded=False):
+    if not df_soluciones.empty:
+        col_etiqueta, col_guardar = st.columns([3, 1])
+        etiqueta_corrida = col_etiqueta.text_input("Etiqueta de la corrida", placeholder="p. ej. Escenario base 2025")
+        if col_guardar.button("💾 Guardar corrida actual"):
+            id_corrida = almacen.guardar(
+                df_soluciones, parametros, salidas_lote,
+                grilla=(rango_descuento, rango_precio, grilla_vpn, matriz_vpn),
+                etiqueta=etiqueta_corrida
+            )
+            st.success(f"Corrida guardada: {id_corrida}")
+
+    df_corridas = almacen.listar()
+    if df_corridas.empty:
+        st.info(f"No hay corridas guardadas en '{almacen.directorio}'.")
+    else:
+        st.dataframe(df_corridas, hide_index=True)
+        id_abrir = st.selectbox(
+            "Abrir corrida", df_corridas["Corrida"],
+            format_func=lambda c: " – ".join(filter(None, [c, df_corridas.set_index("Corrida").at[c, "Etiqueta"]]))
+        )
+        # Lectura con memory map: las matrices no se recalculan ni se copian
+        corrida = almacen.cargar(id_abrir)
+        st.caption(
+            f"Precio {corrida.parametros.precio_carbono:,.2f} USD · tasa {corrida.parametros.tasa_descuento * 100:.2f}% · "
+            f"horizonte {corrida.parametros.n_anios} años · VPN total {corrida.metadatos['vpn_total']:,.2f} USD"
+        )
+        st.dataframe(corrida.resumen().round(2), hide_index=True)
+
+# --- Comparación entre dos escenarios (corridas guardadas o el estado actual) ---
+ACTUAL = "Corrida actual"
+escenarios_disponibles = ([ACTUAL] if not df_soluciones.empty else []) + df_corridas["Corrida"].tolist()
+with st.expander("🔀 Comparar escenarios", expanded=False):
+    if len(escenarios_disponibles) < 2:
+        st.info("Guarda al menos una corrida para comparar escenarios.")
+    else:
+        col_a, col_b = st.columns(2)
+        escenario_a = col_a.selectbox("Escenario A (antes)", escenarios_disponibles, index=1)
+        escenario_b = col_b.selectbox("Escenario B (después)", escenarios_disponibles, index=0)
+
+        def _escenario(nombre):
+            if nombre == ACTUAL:
+                return df_soluciones, parametros
+            guardada = almacen.cargar(nombre)
+            return guardada.soluciones, guardada.parametros
+
+        # Lee las corridas del disco y evalúa ambos portafolios más la cascada: solo a pedido
+        activar_comparacion = st.checkbox("Ejecutar comparación", value=False)
+        if activar_comparacion:
+            comparacion = comparar_escenarios(*_escenario(escenario_a), *_escenario(escenario_b))
+            col_m1, col_m2, col_m3 = st.columns(3)
+            col_m1.metric("VPN A (USD)", f"{comparacion.vpn_a:,.0f}")
+            col_m2.metric("VPN B (USD)", f"{comparacion.vpn_b:,.0f}", delta=f"{comparacion.vpn_b - comparacion.vpn_a:,.0f}")
+            col_m3.metric("Δ Carbono (tCO2e)", f"{comparacion.por_solucion['Carbono Δ (tCO2e)'].sum():,.0f}")
+
+            if not comparacion.parametros_cambiados.empty:
+                st.dataframe(comparacion.parametros_cambiados.astype(str), hide_index=True)
+
+            # Cascada: cambio en VPN atribuido a cada parámetro (secuencialmente) y a las soluciones
+            cascada = comparacion.cascada
+            fig_cascada = go.Figure(go.Waterfall(
+                x=cascada["Paso"],
+                y=np.where(cascada["Tipo"] == "total", 0.0, cascada["Δ VPN (USD)"]),
+                measure=cascada["Tipo"].map({"absoluto": "absolute", "relativo": "relative", "total": "total"}),
+                text=[f"{v:,.0f}" for v in cascada["Δ VPN (USD)"]],
+                textposition="outside"
+            ))
+            fig_cascada.update_layout(
+                title="Atribución del cambio en VPN (A → B)", yaxis_title="VPN (USD)",
+                plot_bgcolor="white", margin=dict(t=50, b=40)
+            )
+            st.plotly_chart(fig_cascada, use_container_width=True, key="plot_cascada")
+
+            st.markdown("**Diferencias por solución**")
+            por_solucion = comparacion.por_solucion
+            st.dataframe(
+                por_solucion.iloc[por_solucion["VPN Δ (USD)"].abs().argsort()[::-1]].round(2),
+                hide_index=True
+            )
+
+            st.markdown("**Diferencias por año (portafolio)**")
+            fig_anual = px.line(
+                comparacion.por_anio, x="Año", y=["Flujo A (USD)", "Flujo B (USD)", "Flujo Δ (USD)"],
+                labels={"value": "USD", "variable": "Serie"}
+            )
+            fig_anual.update_layout(plot_bgcolor="white", margin=dict(t=30, b=40))
+            st.plotly_chart(fig_anual, use_container_width=True, key="plot_comparacion_anual")
+            st.dataframe(comparacion.por_anio.round(2), hide_index=True)
+
+# --- Estado de la caché de resultados ---
+cache_resultados = obtener_cache_resultados()
+st.sidebar.caption(
+    f"🗃️ Caché de resultados: {len(cache_resultados)} entradas · "
+    f"{cache_resultados.aciertos} aciertos · {cache_resultados.fallos} fallos"
 )
 
+# --- Panel de instrumentación (tiempos, llamadas al motor y memoria por sección) ---
+cerrar_pendientes(st.session_state)
+if perfil_rerun is not None:
+    st.session_state["perfil_rerun"] = resumen_perfil(perfil_rerun)
+
+with st.sidebar.expander("⏱️ Instrumentación", expanded=False):
+    st.checkbox("Medir secciones en cada rerun", key="instrumentacion_activa")
+    if instrumentacion.activa:
+        st.dataframe(instrumentacion.tabla(), hide_index=True)
+        col_json, col_csv = st.columns(2)
+        col_json.download_button(
+            "JSON", instrumentacion.como_json(), file_name="instrumentacion.json", mime="application/json"
+        )
+        col_csv.download_button(
+            "CSV", instrumentacion.como_csv(), file_name="instrumentacion.csv", mime="text/csv"
+        )
+    st.button(
+        "Perfilar el próximo rerun (cProfile)",
+        on_click=lambda: st.session_state.update(perfilar_rerun=True)
+    )
+    if "perfil_rerun" in st.session_state:
+        st.download_button(
+            "Descargar perfil", st.session_state["perfil_rerun"], file_name="perfil_rerun.txt", mime="text/plain"
+        )
+        st.code(st.session_state["perfil_rerun"])
+
 # === PIE DE PÁGINA ===
 st.markdown("""---""")
 st.markdown("""
@@ -0,0 +1,208 @@
+# Archivo: benchmarks/bench_modelo.py
+# Mide cómo escala el motor del modelo con el tamaño del portafolio.
+#
+# Uso:
+#   python benchmarks/bench_modelo.py --salida benchmarks/linea_base.json
+#   python benchmarks/bench_modelo.py --tamanos 10 100 --comparar benchmarks/linea_base.json
+#
+# Los portafolios sintéticos se arman a partir de soluciones_predeterminadas
+# (captura constante, lineal y sigmoidal; restauración y degradación; con y sin
+# escalonamiento). Cada etapa se mide por separado y el resultado es un JSON con
+# la mediana y el mínimo de varias repeticiones. Con --comparar se contrasta con
+# una línea base guardada y el proceso sale con código 1 si alguna etapa es más
+# lenta que la tolerancia.
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exportacion import escribir_libro_resultados  # noqa: E402
+from ingesta import leer_portafolio_excel  # noqa: E402
+from modelo import (  # noqa: E402
+    GASTOS_ADICIONALES_COMUNES,
+    ParametrosModelo,
+    calcular_vpn_grilla,
+    calcular_vpn_lote,
+    calcular_vpn_solucion,
+    soluciones_predeterminadas,
+)
+from optimizador import candidatos_desde_catalogo  # noqa: E402
+
+TAMANOS = [10, 100, 1000, 10000]
+RANGO_PRECIO = np.arange(5, 51, 5)
+RANGO_DESCUENTO = np.arange(1, 22, 1)
+MAX_SOLUCIONES_POR_FILA = 1000  # el motor por fila es lento; se omite en portafolios mayores
+
+
+#Def de Funcion: portafolio sintético de n soluciones a partir del catálogo
+def portafolio_sintetico(n_soluciones, semilla=0):
+    rng = np.random.default_rng(semilla)
+    catalogo = candidatos_desde_catalogo(soluciones_predeterminadas)
+    df = catalogo.iloc[np.arange(n_soluciones) % len(catalogo)].reset_index(drop=True)
+    df["Solución"] = df["Solución"] + " #" + (df.index + 1).astype(str)
+    df["Área (ha)"] = rng.uniform(10, 5000, n_soluciones).round(1)
+    df["Salvaguardas (%)"] = rng.choice([0.0, 5.0, 10.0], n_soluciones)
+    df["Ingreso Encadenado (USD/año)"] = rng.choice([0.0, 0.0, 1000.0, 25000.0], n_soluciones)
+    # Una de cada tres soluciones con área escalonada
+    escalonada = np.arange(n_soluciones) % 3 == 0
+    df["Escalonada"] = escalonada
+    df["Años Escalonamiento"] = np.where(escalonada, rng.integers(2, 8, n_soluciones), 1)
+    return df
+
+
+#Def de Funcion: mide una etapa (mediana y mínimo de varias repeticiones)
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {"mediana_s": float(np.median(tiempos)), "min_s": float(np.min(tiempos)), "repeticiones": repeticiones}
+
+
+#Def de Funcion: etapas del modelo para un portafolio (en el mismo orden que app.py)
+def etapas(df_soluciones, parametros):
+    libro = io.BytesIO()
+    df_soluciones.to_excel(libro, index=False)
+    contenido = libro.getvalue()
+    salidas = calcular_vpn_lote(df_soluciones, parametros)
+    grilla_vpn = calcular_vpn_grilla(df_soluciones, parametros, RANGO_DESCUENTO / 100, RANGO_PRECIO)
+    vpn_escenarios = {
+        etiqueta: calcular_vpn_lote(df_soluciones, replace(parametros, precio_carbono=parametros.precio_carbono * factor))[0]
+        for etiqueta, factor in (("Bajo", 0.8), ("Caso Base", 1.0), ("Alto", 1.2))
+    }
+
+    def ingesta():
+        leer_portafolio_excel(io.BytesIO(contenido))
+
+    def vpn_lote():
+        calcular_vpn_lote(df_soluciones, parametros)
+
+    def vpn_por_fila():
+        for sol in df_soluciones.to_dict("records"):
+            calcular_vpn_solucion(sol, parametros)
+
+    def captura_acumulada():
+        captura_acumulada = np.cumsum(salidas[2], axis=1)
+        nombres = np.append(df_soluciones["Solución"].astype(str).to_numpy(), "Total Portafolio")
+        pd.DataFrame({
+            "Año": np.tile(np.arange(1, parametros.n_anios + 1), len(nombres)),
+            "Solución": np.repeat(nombres, parametros.n_anios),
+            "Captura Acumulada": np.vstack([captura_acumulada, captura_acumulada.sum(axis=0)]).ravel()
+        })
+
+    def grillas():
+        calcular_vpn_grilla(df_soluciones, parametros, RANGO_DESCUENTO / 100, RANGO_PRECIO)
+
+    def escenarios():
+        for factor in (0.8, 1.0, 1.2):
+            calcular_vpn_lote(df_soluciones, replace(parametros, precio_carbono=parametros.precio_carbono * factor))
+
+    def exportacion_excel():
+        # El libro de varias hojas que descarga app.py (mismas grillas y escenarios)
+        escribir_libro_resultados(
+            io.BytesIO(), df_soluciones, parametros, salidas,
+            grilla=(RANGO_DESCUENTO, RANGO_PRECIO, grilla_vpn, grilla_vpn.sum(axis=2)),
+            escenarios=vpn_escenarios
+        )
+
+    medidas = {
+        "ingesta_excel": ingesta,
+        "vpn_lote": vpn_lote,
+        "captura_acumulada": captura_acumulada,
+        "grillas_heatmap": grillas,
+        "escenarios": escenarios,
+        "exportacion_excel": exportacion_excel,
+    }
+    if len(df_soluciones) <= MAX_SOLUCIONES_POR_FILA:
+        medidas["vpn_por_fila"] = vpn_por_fila
+    return medidas
+
+
+#Def de Funcion: compara contra una línea base; devuelve filas (tamaño, etapa, base, actual, razón)
+def comparar(actual, linea_base, tolerancia):
+    filas = []
+    for tamano, etapas_actuales in actual["resultados"].items():
+        etapas_base = linea_base.get("resultados", {}).get(tamano, {})
+        for etapa, medida in etapas_actuales.items():
+            if etapa not in etapas_base:
+                continue
+            base_s, actual_s = etapas_base[etapa]["mediana_s"], medida["mediana_s"]
+            razon = actual_s / base_s if base_s > 0 else float("inf")
+            filas.append({
+                "tamano": int(tamano), "etapa": etapa, "base_s": base_s, "actual_s": actual_s,
+                "razon": razon, "regresion": razon > 1 + tolerancia
+            })
+    return filas
+
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks del motor del modelo SNC.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="Número de soluciones por portafolio")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por etapa")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de línea base contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Regresión permitida (0.25 = 25%% más lento)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    parametros = ParametrosModelo(gastos_adicionales_comunes=GASTOS_ADICIONALES_COMUNES)
+
+    resultado = {
+        "metadatos": {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "repeticiones": args.repeticiones,
+        },
+        "resultados": {}
+    }
+    for tamano in args.tamanos:
+        df_soluciones = portafolio_sintetico(tamano)
+        resultado["resultados"][str(tamano)] = {}
+        for etapa, funcion in etapas(df_soluciones, parametros).items():
+            # Etapas lentas en portafolios grandes: una sola repetición
+            medida = medir(funcion, args.repeticiones if tamano <= 1000 or etapa != "ingesta_excel" else 1)
+            resultado["resultados"][str(tamano)][etapa] = medida
+            print(f"{tamano:>6} soluciones  {etapa:<20} {medida['mediana_s'] * 1000:>10.2f} ms", file=sys.stderr, flush=True)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            linea_base = json.load(f)
+        filas = comparar(resultado, linea_base, args.tolerancia)
+        for fila in filas:
+            marca = "❌" if fila["regresion"] else "✅"
+            print(
+                f"{marca} {fila['tamano']:>6} {fila['etapa']:<20} base {fila['base_s'] * 1000:>9.2f} ms  "
+                f"actual {fila['actual_s'] * 1000:>9.2f} ms  ×{fila['razon']:.2f}",
+                file=sys.stderr
+            )
+        if any(fila["regresion"] for fila in filas):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
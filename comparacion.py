@@ -0,0 +1,152 @@
+# Archivo: comparacion.py
+# Comparación "antes / después" entre dos escenarios (portafolio + parámetros),
+# por ejemplo dos corridas guardadas en almacen.py o una corrida y el estado actual.
+#
+# Ambos escenarios se evalúan con el motor en lote cacheado (las soluciones y
+# parámetros que coinciden no se recalculan). Las soluciones se emparejan por
+# nombre (y por orden de aparición si el nombre se repite).
+#
+# Cascada de atribución (secuencial): se parte del escenario A y se cambia un
+# parámetro global a la vez al valor de B, en el orden de ParametrosModelo; al
+# final se reemplaza el portafolio de A por el de B. Cada paso recibe la
+# diferencia de VPN total que produce, así que los pasos suman exactamente el
+# cambio total. Con interacciones entre parámetros la atribución depende del orden.
+
+from dataclasses import dataclass, fields, replace
+
+import numpy as np
+import pandas as pd
+
+from modelo import calcular_vpn_lote_cacheado
+
+ETIQUETAS_PARAMETROS = {
+    "tasa_descuento": "Tasa de descuento",
+    "precio_carbono": "Precio del carbono",
+    "crecimiento_precio_carbono": "Crecimiento precio carbono",
+    "crecimiento_ingreso_encadenado": "Crecimiento ingreso encadenado",
+    "multiplicador_area": "Multiplicador de área",
+    "multiplicador_precio_carbono": "Multiplicador precio carbono",
+    "multiplicador_tasa_descuento": "Multiplicador tasa descuento",
+    "n_anios": "Horizonte (años)",
+    "gastos_adicionales_comunes": "Gastos adicionales comunes",
+}
+PASO_SOLUCIONES = "Cambios en soluciones"
+
+
+#Def de Resultado de una comparación entre dos escenarios
+@dataclass
+class ResultadoComparacion:
+    por_solucion: pd.DataFrame
+    por_anio: pd.DataFrame
+    cascada: pd.DataFrame
+    parametros_cambiados: pd.DataFrame
+    vpn_a: float
+    vpn_b: float
+
+
+#Def de Funcion auxiliar: índice de emparejamiento (nombre, n-ésima aparición del nombre)
+def _indice_solucion(df_soluciones):
+    nombres = df_soluciones["Solución"].astype(str).reset_index(drop=True)
+    return pd.MultiIndex.from_arrays([nombres, nombres.groupby(nombres).cumcount()], names=["Solución", "_n"])
+
+
+#Def de Funcion auxiliar: vector anual llevado a n años (ceros al final)
+def _a_horizonte(vector, n_anios):
+    salida = np.zeros(n_anios)
+    salida[:len(vector)] = vector[:n_anios]
+    return salida
+
+
+#Def de Funcion auxiliar: VPN total del portafolio con el motor cacheado
+def _vpn_total(df_soluciones, parametros, cache):
+    return float(np.nansum(calcular_vpn_lote_cacheado(df_soluciones, parametros, cache)[0]))
+
+
+#Def de Funcion: parámetros globales que cambian entre A y B
+def parametros_cambiados(parametros_a, parametros_b):
+    filas = []
+    for campo in fields(parametros_a):
+        valor_a, valor_b = getattr(parametros_a, campo.name), getattr(parametros_b, campo.name)
+        if valor_a != valor_b:
+            filas.append({
+                "Parámetro": ETIQUETAS_PARAMETROS.get(campo.name, campo.name),
+                "campo": campo.name,
+                "Valor A": valor_a if np.isscalar(valor_a) else f"{len(valor_a)} gastos",
+                "Valor B": valor_b if np.isscalar(valor_b) else f"{len(valor_b)} gastos"
+            })
+    return pd.DataFrame(filas, columns=["Parámetro", "campo", "Valor A", "Valor B"])
+
+
+#Def de Funcion: cascada de atribución secuencial del cambio en VPN total
+def cascada_atribucion(df_a, parametros_a, df_b, parametros_b, cache=None):
+    cambios = parametros_cambiados(parametros_a, parametros_b)
+    vpn_inicial = _vpn_total(df_a, parametros_a, cache)
+    pasos = [{"Paso": "VPN escenario A", "Δ VPN (USD)": vpn_inicial, "Tipo": "absoluto"}]
+
+    parametros, vpn_anterior = parametros_a, vpn_inicial
+    for etiqueta, campo in zip(cambios["Parámetro"], cambios["campo"]):
+        parametros = replace(parametros, **{campo: getattr(parametros_b, campo)})
+        vpn = _vpn_total(df_a, parametros, cache)
+        pasos.append({"Paso": etiqueta, "Δ VPN (USD)": vpn - vpn_anterior, "Tipo": "relativo"})
+        vpn_anterior = vpn
+
+    vpn_final = _vpn_total(df_b, parametros_b, cache)
+    pasos.append({"Paso": PASO_SOLUCIONES, "Δ VPN (USD)": vpn_final - vpn_anterior, "Tipo": "relativo"})
+    pasos.append({"Paso": "VPN escenario B", "Δ VPN (USD)": vpn_final, "Tipo": "total"})
+    return pd.DataFrame(pasos)
+
+
+#Def de Funcion principal: diferencias por solución, por año y cascada entre dos escenarios
+def comparar_escenarios(df_a, parametros_a, df_b, parametros_b, cache=None):
+    df_a, df_b = df_a.reset_index(drop=True), df_b.reset_index(drop=True)
+    salidas_a = calcular_vpn_lote_cacheado(df_a, parametros_a, cache)
+    salidas_b = calcular_vpn_lote_cacheado(df_b, parametros_b, cache)
+
+    # --- Por solución (emparejadas por nombre; las que faltan en un lado cuentan como 0 en ese lado,
+    # pero un NaN del motor, p. ej. con área 0, se conserva para no inventar una diferencia)
+    def _tabla(df, salidas, sufijo):
+        vpn, flujo, captura, _, costo, _, _ = salidas
+        return pd.DataFrame({
+            f"VPN {sufijo} (USD)": vpn,
+            f"Carbono {sufijo} (tCO2e)": captura.sum(axis=1),
+            f"Flujo {sufijo} (USD)": flujo.sum(axis=1),
+            f"Costo {sufijo} (USD)": costo.sum(axis=1)
+        }, index=_indice_solucion(df))
+
+    tabla_a, tabla_b = _tabla(df_a, salidas_a, "A"), _tabla(df_b, salidas_b, "B")
+    por_solucion = tabla_a.join(tabla_b, how="outer")
+    estado = np.select(
+        [~por_solucion.index.isin(tabla_a.index), ~por_solucion.index.isin(tabla_b.index)], ["solo B", "solo A"], "ambas"
+    )
+    for lado, faltante in (("A", estado == "solo B"), ("B", estado == "solo A")):
+        columnas = list(tabla_a.columns if lado == "A" else tabla_b.columns)
+        por_solucion.loc[faltante, columnas] = 0.0
+    for metrica, unidad in (("VPN", "USD"), ("Carbono", "tCO2e"), ("Flujo", "USD"), ("Costo", "USD")):
+        por_solucion[f"{metrica} Δ ({unidad})"] = por_solucion[f"{metrica} B ({unidad})"] - por_solucion[f"{metrica} A ({unidad})"]
+    por_solucion.insert(0, "Estado", estado)
+    orden = ["Estado"] + [
+        f"{metrica} {lado} ({unidad})"
+        for metrica, unidad in (("VPN", "USD"), ("Carbono", "tCO2e"), ("Flujo", "USD"), ("Costo", "USD"))
+        for lado in ("A", "B", "Δ")
+    ]
+    por_solucion = por_solucion[orden].reset_index().drop(columns="_n")
+
+    # --- Por año (portafolio), en el horizonte más largo de los dos
+    n_anios = max(parametros_a.n_anios, parametros_b.n_anios)
+    flujo_a, flujo_b = (_a_horizonte(s[1].sum(axis=0), n_anios) for s in (salidas_a, salidas_b))
+    captura_a, captura_b = (_a_horizonte(s[2].sum(axis=0), n_anios) for s in (salidas_a, salidas_b))
+    por_anio = pd.DataFrame({
+        "Año": np.arange(1, n_anios + 1),
+        "Flujo A (USD)": flujo_a, "Flujo B (USD)": flujo_b, "Flujo Δ (USD)": flujo_b - flujo_a,
+        "Carbono A (tCO2e)": captura_a, "Carbono B (tCO2e)": captura_b, "Carbono Δ (tCO2e)": captura_b - captura_a
+    })
+
+    cascada = cascada_atribucion(df_a, parametros_a, df_b, parametros_b, cache)
+    return ResultadoComparacion(
+        por_solucion=por_solucion,
+        por_anio=por_anio,
+        cascada=cascada,
+        parametros_cambiados=parametros_cambiados(parametros_a, parametros_b).drop(columns="campo"),
+        vpn_a=float(np.nansum(salidas_a[0])),
+        vpn_b=float(np.nansum(salidas_b[0]))
+    )
@@ -0,0 +1,139 @@
+# Archivo: exportacion.py
+# Exportación de resultados a un libro Excel de varias hojas.
+#
+# El libro se escribe con xlsxwriter en modo constant_memory: cada fila se vuelca
+# al disco apenas se escribe, así que la memoria no crece con el número de
+# soluciones. En ese modo las filas deben escribirse en orden (no se puede volver
+# atrás), por eso las tablas se recorren fila por fila y nunca con DataFrame.to_excel.
+# app.py lo construye solo cuando se hace clic en descargar.
+#
+# Hojas: Resumen, Matriz Comparativa, Flujos de Caja (todas las soluciones, año a
+# año), VPN Portafolio y VPN por Solución (grillas tasa × precio), Escenarios y
+# Parámetros.
+
+import io
+
+import numpy as np
+import xlsxwriter
+
+from ingesta import COLUMNAS_GASTOS, HOJA_GASTOS
+from modelo import COLUMNAS_FLUJO_CAJA, matriz_flujo_caja, tabla_resultados
+from registros import como_portafolio
+
+MAX_FILAS_HOJA = 1_048_576  # límite de filas de Excel (incluye el encabezado)
+
+
+#Def de Clase: libro Excel de solo escritura, fila por fila
+class LibroExcel:
+    def __init__(self, destino):
+        self.libro = xlsxwriter.Workbook(destino, {"constant_memory": True, "nan_inf_to_errors": True})
+        self.negrita = self.libro.add_format({"bold": True})
+        self._nombres = set()
+
+    def nueva_hoja(self, nombre, columnas):
+        # Nombres de hoja: máximo 31 caracteres, sin repetir
+        base = nombre[:31]
+        nombre, n = base, 2
+        while nombre.lower() in self._nombres:
+            sufijo = f" ({n})"
+            nombre, n = base[:31 - len(sufijo)] + sufijo, n + 1
+        self._nombres.add(nombre.lower())
+        hoja = self.libro.add_worksheet(nombre)
+        hoja.write_row(0, 0, columnas, self.negrita)
+        hoja.freeze_panes(1, 0)
+        return hoja
+
+    def escribir_tabla(self, nombre, columnas, filas):
+        """Escribe filas (iterable de secuencias) y abre hojas de continuación al llegar al límite de Excel."""
+        hoja, fila_actual = self.nueva_hoja(nombre, columnas), 1
+        for fila in filas:
+            if fila_actual == MAX_FILAS_HOJA:
+                hoja, fila_actual = self.nueva_hoja(nombre, columnas), 1
+            hoja.write_row(fila_actual, 0, fila)
+            fila_actual += 1
+
+    def escribir_dataframe(self, nombre, df):
+        self.escribir_tabla(nombre, [str(c) for c in df.columns], df.itertuples(index=False, name=None))
+
+    def cerrar(self):
+        self.libro.close()
+
+
+#Def de Funcion auxiliar: filas año a año de todas las soluciones, armadas por bloques de soluciones
+def _filas_flujo(df_soluciones, parametros, salidas, tamano_bloque=256):
+    portafolio = como_portafolio(df_soluciones)
+    for inicio in range(0, len(portafolio), tamano_bloque):
+        bloque = slice(inicio, inicio + tamano_bloque)
+        salidas_bloque = (*(salida[bloque] for salida in salidas[:6]), salidas[6])
+        matriz = matriz_flujo_caja(portafolio.tomar(bloque), parametros, salidas_bloque)
+        nombres = np.repeat(portafolio.nombre[bloque], parametros.n_anios).tolist()
+        anios = matriz[:, :, 0].astype(int).ravel().tolist()
+        valores = matriz[:, :, 1:].reshape(-1, matriz.shape[2] - 1).tolist()
+        for nombre, anio, fila in zip(nombres, anios, valores):
+            yield (nombre, anio, *fila)
+
+
+#Def de Funcion principal: escribe el libro de resultados en destino (ruta o archivo binario)
+def escribir_libro_resultados(destino, df_soluciones, parametros, salidas, df_comparativa=None,
+                              grilla=None, escenarios=None, df_resultados=None, hojas_adicionales=None):
+    """grilla: (rango_tasas_pct, rango_precios, grilla_vpn (tasa × precio × solución), matriz_vpn).
+    escenarios: dict etiqueta -> VPN por solución.
+    df_resultados: la tabla_resultados ya calculada (si no, se calcula aquí).
+    hojas_adicionales: dict nombre de hoja -> DataFrame, escritas al final (p. ej. "Errores" en lote.py)."""
+    libro = LibroExcel(destino)
+    try:
+        nombres = df_soluciones["Solución"].astype(str).tolist()
+        if df_resultados is None:
+            df_resultados = tabla_resultados(df_soluciones, parametros, salidas)
+        libro.escribir_dataframe("Resumen", df_resultados)
+        if df_comparativa is not None and not df_comparativa.empty:
+            libro.escribir_dataframe("Matriz Comparativa", df_comparativa)
+
+        if len(nombres):
+            libro.escribir_tabla(
+                "Flujos de Caja", ["Solución", *COLUMNAS_FLUJO_CAJA], _filas_flujo(df_soluciones, parametros, salidas)
+            )
+
+        if grilla is not None:
+            rango_tasas, rango_precios, grilla_vpn, matriz_vpn = grilla
+            libro.escribir_tabla(
+                "VPN Portafolio",
+                ["Tasa (%) \\ Precio (USD)", *[float(p) for p in rango_precios]],
+                ([float(t), *fila] for t, fila in zip(rango_tasas, np.asarray(matriz_vpn)))
+            )
+            # Una fila por solución y una columna por celda (tasa, precio) de la grilla
+            celdas = [f"{float(t):g}% · {float(p):g} USD" for t in rango_tasas for p in rango_precios]
+            por_solucion = np.asarray(grilla_vpn).reshape(len(celdas), len(nombres)).T
+            libro.escribir_tabla(
+                "VPN por Solución", ["Solución", *celdas],
+                ([nombre, *fila] for nombre, fila in zip(nombres, por_solucion))
+            )
+
+        if escenarios:
+            etiquetas = list(escenarios)
+            valores = np.column_stack([np.asarray(escenarios[e], dtype=float) for e in etiquetas])
+            libro.escribir_tabla(
+                "Escenarios", ["Solución", *[f"VPN {e} (USD)" for e in etiquetas]],
+                ([nombre, *fila] for nombre, fila in zip(nombres, valores))
+            )
+
+        valores_parametros = parametros.como_dict()
+        gastos = valores_parametros.pop("gastos_adicionales_comunes")
+        libro.escribir_tabla("Parámetros", ["Parámetro", "Valor"], valores_parametros.items())
+        # Mismo formato que la hoja "Gastos" de los libros de entrada
+        libro.escribir_tabla(
+            HOJA_GASTOS, COLUMNAS_GASTOS,
+            ([g.get("descripcion", ""), g.get("monto"), g.get("anio"), g.get("anio_cada"), g.get("desde"), g.get("hasta")]
+             for g in gastos)
+        )
+        for nombre, df in (hojas_adicionales or {}).items():
+            libro.escribir_dataframe(nombre, df)
+    finally:
+        libro.cerrar()
+
+
+#Def de Funcion: el mismo libro como bytes (para st.download_button)
+def libro_resultados_bytes(*args, **kwargs):
+    salida = io.BytesIO()
+    escribir_libro_resultados(salida, *args, **kwargs)
+    return salida.getvalue()
@@ -0,0 +1,202 @@
+# Archivo: ingesta.py
+# Lectura y validación de portafolios de soluciones desde Excel (esquema de 18 columnas).
+# Compartido por app.py y por el procesamiento por lotes (lote.py); no depende de Streamlit.
+#
+# El libro se lee una sola vez y la conversión de tipos se hace por columna (no fila
+# por fila): los números aceptan coma decimal ("3,88") y las filas inválidas se
+# reportan en una tabla de errores en lugar de interrumpir la carga.
+
+import hashlib
+import importlib.util
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# python-calamine es un lector opcional mucho más rápido; si no está, se usa openpyxl
+MOTOR_EXCEL = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+
+COLUMNAS_ESPERADAS = [
+    "Solución", "Área (ha)", "Costo anual por ha (USD)", "CAPEX Total (USD)",
+    "Duración (años)", "Salvaguardas (%)", "Ingreso Encadenado (USD/año)",
+    "Tipo Captura", "Tipo SNC", "% Pérdida Evitada",
+    "Captura por ha (tCO2e)", "Captura Inicial", "Captura Final",
+    "Captura Máxima", "Velocidad", "Punto Medio",
+    "Escalonada", "Años Escalonamiento"
+]
+
+# Columnas obligatorias en todas las filas
+COLUMNAS_NUMERICAS_OBLIGATORIAS = [
+    "Área (ha)", "Costo anual por ha (USD)", "CAPEX Total (USD)",
+    "Duración (años)", "Salvaguardas (%)", "Ingreso Encadenado (USD/año)"
+]
+COLUMNAS_ENTERAS = ["Duración (años)", "Años Escalonamiento", "Punto Medio"]
+
+# Columnas de captura obligatorias según el tipo de curva
+COLUMNAS_POR_TIPO_CAPTURA = {
+    "constante": ["Captura por ha (tCO2e)"],
+    "lineal": ["Captura Inicial", "Captura Final"],
+    "sigmoidal": ["Captura Máxima", "Velocidad", "Punto Medio"],
+}
+
+# Nombres alternos de columnas que se aceptan al leer (alterno -> nombre del esquema)
+ALIAS_COLUMNAS = {"Años para 100% área": "Años Escalonamiento"}
+
+VALORES_VERDADEROS = {"true", "1", "1.0", "si", "sí", "s", "x", "yes", "verdadero"}
+
+# Hoja opcional con el cronograma de gastos adicionales comunes del portafolio.
+# Cada fila es un gasto puntual (Año; -1 = antes del proyecto, descontado un año)
+# o recurrente (Cada (años), con Desde/Hasta opcionales).
+HOJA_GASTOS = "Gastos"
+COLUMNAS_GASTOS = ["Descripción", "Monto (USD)", "Año", "Cada (años)", "Desde", "Hasta"]
+
+
+#Def de Resultado de la ingesta: soluciones válidas + reporte de errores por fila
+@dataclass
+class ResultadoIngesta:
+    soluciones: pd.DataFrame
+    errores: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=["Fila", "Solución", "Error"]))
+    faltantes: list = field(default_factory=list)
+    gastos: list = None  # cronograma de la hoja "Gastos"; None si el libro no la trae
+
+    def como_registros(self):
+        """Soluciones como lista de dicts (formato de st.session_state.soluciones), sin campos vacíos."""
+        return [
+            {campo: valor for campo, valor in registro.items() if not (isinstance(valor, float) and np.isnan(valor))}
+            for registro in self.soluciones.to_dict("records")
+        ]
+
+
+#Def de Funcion: convierte una columna a número aceptando coma decimal
+def _a_numero(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texto = serie.astype("string").str.strip().str.replace(",", ".", regex=False)
+    return pd.to_numeric(texto, errors="coerce").astype(float)
+
+
+#Def de Funcion para convertir el DataFrame del Excel en soluciones del modelo (por columnas)
+def parsear_soluciones(df_excel):
+    """Devuelve un ResultadoIngesta con las filas válidas ya tipadas y un error por fila inválida."""
+    n_filas = len(df_excel)
+    soluciones = pd.DataFrame(index=df_excel.index)
+    problemas = []  # (máscara de filas, mensaje)
+
+    soluciones["Solución"] = df_excel["Solución"].astype("string").str.strip()
+    problemas.append((soluciones["Solución"].isna() | (soluciones["Solución"] == ""), "Solución vacía"))
+
+    numericas = {col: _a_numero(df_excel[col]) for col in COLUMNAS_ESPERADAS if col in df_excel.columns and col not in (
+        "Solución", "Tipo Captura", "Tipo SNC", "Escalonada"
+    )}
+    for col in COLUMNAS_NUMERICAS_OBLIGATORIAS:
+        problemas.append((numericas[col].isna(), f"'{col}' vacío o no numérico"))
+        soluciones[col] = numericas[col]
+
+    tipo_captura = df_excel["Tipo Captura"].astype("string").str.strip().str.lower().fillna("constante")
+    tipo_sn = df_excel["Tipo SNC"].astype("string").str.strip().str.lower().fillna("restauracion")
+    problemas.append((~tipo_captura.isin(list(COLUMNAS_POR_TIPO_CAPTURA)), "'Tipo Captura' desconocido"))
+    problemas.append((~tipo_sn.isin(["restauracion", "degradacion"]), "'Tipo SNC' desconocido"))
+    soluciones["Tipo Captura"] = tipo_captura
+    soluciones["Tipo SNC"] = tipo_sn
+
+    soluciones["% Pérdida Evitada"] = numericas["% Pérdida Evitada"].fillna(0.0)
+    soluciones["Escalonada"] = df_excel["Escalonada"].astype("string").str.strip().str.lower().isin(VALORES_VERDADEROS)
+    soluciones["Años Escalonamiento"] = numericas["Años Escalonamiento"].fillna(1.0)
+
+    for tipo, columnas in COLUMNAS_POR_TIPO_CAPTURA.items():
+        es_tipo = tipo_captura == tipo
+        for col in columnas:
+            problemas.append((es_tipo & numericas[col].isna(), f"'{col}' requerido para captura {tipo}"))
+            soluciones[col] = numericas[col].where(es_tipo)
+
+    problemas.append((soluciones["Duración (años)"] < 1, "'Duración (años)' debe ser al menos 1"))
+
+    # Enteros como en la carga original (int() trunca); NaN se conserva para columnas que no aplican
+    for col in COLUMNAS_ENTERAS:
+        soluciones[col] = np.trunc(soluciones[col])
+    soluciones["Duración (años)"] = soluciones["Duración (años)"].fillna(0).astype(int)
+    soluciones["Años Escalonamiento"] = soluciones["Años Escalonamiento"].astype(int)
+
+    # --- Reporte de errores: una fila por fila inválida, con todos sus problemas
+    mensajes = pd.Series([[] for _ in range(n_filas)], index=df_excel.index, dtype=object)
+    invalida = np.zeros(n_filas, dtype=bool)
+    for mascara, mensaje in problemas:
+        mascara = mascara.fillna(True).to_numpy(dtype=bool)
+        invalida |= mascara
+        for posicion in np.flatnonzero(mascara):
+            mensajes.iat[posicion].append(mensaje)
+    errores = pd.DataFrame({
+        "Fila": np.flatnonzero(invalida) + 2,  # fila de Excel (encabezado en la fila 1)
+        "Solución": df_excel["Solución"].to_numpy()[invalida],
+        "Error": ["; ".join(m) for m in mensajes[invalida]]
+    })
+
+    soluciones = soluciones.loc[~invalida, COLUMNAS_ESPERADAS].reset_index(drop=True)
+    soluciones["Duración (años)"] = soluciones["Duración (años)"].astype(int)
+    return ResultadoIngesta(soluciones=soluciones, errores=errores)
+
+
+#Def de Funcion: huella del contenido de un libro (mismo archivo ⇒ misma huella, sin importar el nombre)
+def huella_archivo(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+#Def de Funcion para convertir la hoja "Gastos" al formato de GASTOS_ADICIONALES_COMUNES
+def parsear_gastos(df_gastos):
+    """Devuelve (gastos, errores): la lista de dicts del cronograma y las filas inválidas."""
+    numericas = {col: _a_numero(df_gastos[col]) if col in df_gastos.columns else pd.Series(np.nan, index=df_gastos.index)
+                 for col in COLUMNAS_GASTOS[1:]}
+    if "Descripción" in df_gastos.columns:
+        descripcion = df_gastos["Descripción"].astype("string").fillna("Gasto")
+    else:
+        descripcion = pd.Series("Gasto", index=df_gastos.index)
+
+    gastos, errores = [], []
+    for posicion, (monto, anio, cada, desde, hasta) in enumerate(zip(*(numericas[col] for col in COLUMNAS_GASTOS[1:]))):
+        gasto = {"descripcion": str(descripcion.iat[posicion]), "monto": float(monto)}
+        if np.isnan(monto):
+            error = "'Monto (USD)' vacío o no numérico"
+        elif not np.isnan(anio):
+            gasto["anio"] = int(anio)
+            error = None
+        elif not np.isnan(cada) and cada >= 1:
+            gasto["anio_cada"] = int(cada)
+            if not np.isnan(desde):
+                gasto["desde"] = int(desde)
+            if not np.isnan(hasta):
+                gasto["hasta"] = int(hasta)
+            error = None
+        else:
+            error = "se requiere 'Año' o 'Cada (años)' ≥ 1"
+        if error:
+            errores.append({"Fila": posicion + 2, "Solución": f"Hoja {HOJA_GASTOS}", "Error": error})
+        else:
+            gastos.append(gasto)
+    return gastos, pd.DataFrame(errores, columns=["Fila", "Solución", "Error"])
+
+
+#Def de Funcion para leer un portafolio .xlsx completo (una sola lectura del libro)
+def leer_portafolio_excel(archivo):
+    """Lee el libro y valida el esquema.
+
+    Las soluciones se toman de la primera hoja distinta de "Gastos"; si el libro
+    trae la hoja "Gastos", su cronograma queda en `gastos`. Si faltan columnas
+    del esquema, el resultado no trae soluciones y `faltantes` lista las
+    columnas ausentes.
+    """
+    hojas = pd.read_excel(archivo, sheet_name=None, engine=MOTOR_EXCEL)
+    nombre_hoja = next((nombre for nombre in hojas if nombre != HOJA_GASTOS), None)
+    df_excel = hojas[nombre_hoja] if nombre_hoja is not None else pd.DataFrame()
+    df_excel = df_excel.rename(columns={
+        alias: col for alias, col in ALIAS_COLUMNAS.items() if col not in df_excel.columns
+    })
+    faltantes = [col for col in COLUMNAS_ESPERADAS if col not in df_excel.columns]
+    if faltantes:
+        return ResultadoIngesta(soluciones=pd.DataFrame(columns=COLUMNAS_ESPERADAS), faltantes=faltantes)
+    resultado = parsear_soluciones(df_excel)
+
+    if HOJA_GASTOS in hojas:
+        resultado.gastos, errores_gastos = parsear_gastos(hojas[HOJA_GASTOS])
+        if not errores_gastos.empty:
+            resultado.errores = pd.concat([resultado.errores, errores_gastos], ignore_index=True)
+    return resultado
@@ -0,0 +1,114 @@
+# Archivo: instrumentacion.py
+# Medición opcional por sección de un rerun de la app: tiempo de pared, llamadas
+# al motor (modelo.contadores_motor, por hilo) y pico de memoria con tracemalloc.
+#
+# app.py es un script lineal, así que las secciones se delimitan con marcas:
+#   instrumentacion.marcar("Heatmaps")   # cierra la sección anterior y abre esta
+#   ...
+#   instrumentacion.terminar()
+
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+from modelo import contadores_motor
+
+COLUMNAS_MEDICION = [
+    "Sección", "Tiempo (ms)", "calcular_vpn_lote", "Soluciones en lote", "Celdas de grilla", "Pico memoria (MB)"
+]
+
+# tracemalloc es de todo el proceso: solo una sesión a la vez mide memoria (las demás la dejan vacía)
+_memoria = threading.Lock()
+
+
+#Def de Clase: mediciones por sección de un rerun
+class Instrumentacion:
+    def __init__(self, activa=False):
+        self.activa = activa
+        self.mediciones = []
+        self._seccion = None
+        self._inicio = 0.0
+        self._contadores = None
+        self._mide_memoria = activa and _memoria.acquire(blocking=False)
+        self._inicio_tracemalloc = False
+        if self._mide_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._inicio_tracemalloc = True
+
+    def marcar(self, nombre):
+        if not self.activa:
+            return
+        self._cerrar()
+        self._seccion = nombre
+        self._contadores = contadores_motor.copia()
+        if self._mide_memoria:
+            tracemalloc.reset_peak()
+        self._inicio = time.perf_counter()
+
+    def _cerrar(self):
+        if self._seccion is None:
+            return
+        duracion = time.perf_counter() - self._inicio
+        pico = tracemalloc.get_traced_memory()[1] / 2**20 if self._mide_memoria else float("nan")
+        delta = {clave: valor - self._contadores.get(clave, 0) for clave, valor in contadores_motor.copia().items()}
+        self.mediciones.append({
+            "Sección": self._seccion,
+            "Tiempo (ms)": round(duracion * 1000, 2),
+            "calcular_vpn_lote": delta.get("calcular_vpn_lote", 0),
+            "Soluciones en lote": delta.get("soluciones_lote", 0),
+            "Celdas de grilla": delta.get("celdas_grilla", 0),
+            "Pico memoria (MB)": round(pico, 2)
+        })
+        self._seccion = None
+
+    def terminar(self):
+        """Cierra la última sección y libera tracemalloc; se puede llamar más de una vez."""
+        if not self.activa:
+            return
+        self._cerrar()
+        if self._inicio_tracemalloc:
+            tracemalloc.stop()
+            self._inicio_tracemalloc = False
+        if self._mide_memoria:
+            _memoria.release()
+            self._mide_memoria = False
+
+    def tabla(self):
+        return pd.DataFrame(self.mediciones, columns=COLUMNAS_MEDICION)
+
+    def como_json(self):
+        return json.dumps(self.mediciones, indent=2, ensure_ascii=False)
+
+    def como_csv(self):
+        return self.tabla().to_csv(index=False)
+
+
+#Def de Funcion: resumen legible de un perfil de cProfile (las funciones más costosas)
+def resumen_perfil(perfil, n_funciones=40, orden="cumulative"):
+    salida = io.StringIO()
+    pstats.Stats(perfil, stream=salida).strip_dirs().sort_stats(orden).print_stats(n_funciones)
+    return salida.getvalue()
+
+
+def nuevo_perfil():
+    perfil = cProfile.Profile()
+    perfil.enable()
+    return perfil
+
+
+#Def de Funcion: detiene la medición y el perfil que un rerun anterior dejó abiertos
+def cerrar_pendientes(estado):
+    """estado: st.session_state. Un st.rerun() o una excepción cortan el script antes de
+    instrumentacion.terminar(), y tracemalloc y el perfil quedarían activos en el proceso."""
+    instrumentacion = estado.pop("instrumentacion_en_curso", None)
+    if instrumentacion is not None:
+        instrumentacion.terminar()
+    perfil = estado.pop("perfil_en_curso", None)
+    if perfil is not None:
+        perfil.disable()
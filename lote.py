@@ -0,0 +1,186 @@
+# Archivo: lote.py
+# Procesamiento por lotes de portafolios .xlsx sin navegador.
+#
+# Uso:
+#   python lote.py portafolios/ --salida resultados/ --trabajadores 8
+#   python lote.py "portafolios/*.xlsx" --heatmaps --tasa-descuento 10
+#
+# Si un libro trae la hoja "Gastos", su cronograma reemplaza a los gastos comunes.
+# Por cada libro de entrada escribe <nombre>_resultados.xlsx con el mismo libro
+# que exporta la app (exportacion.escribir_libro_resultados: resumen, flujos de
+# caja año a año, parámetros y, con --heatmaps, las grillas de sensibilidad) más
+# la hoja "Errores"; al final escribe resumen_lote.xlsx con todos los portafolios.
+# Si dos libros de carpetas distintas se llaman igual, el nombre de salida lleva
+# su carpeta relativa (a/x.xlsx -> a__x_resultados.xlsx). Los libros se escriben
+# con exportacion.LibroExcel: las tablas que pasan el límite de filas de Excel
+# siguen en hojas de continuación.
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from exportacion import LibroExcel, escribir_libro_resultados
+from ingesta import leer_portafolio_excel
+from modelo import (
+    ParametrosModelo,
+    calcular_vpn_grilla,
+    calcular_vpn_lote,
+    tabla_resultados,
+)
+
+RANGO_PRECIO = np.arange(5, 51, 5)
+RANGO_DESCUENTO = np.arange(1, 22, 1)
+
+
+#Def de Funcion para expandir directorios y patrones glob a la lista de libros
+def buscar_libros(entradas):
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = glob.glob(os.path.join(entrada, "*.xlsx"))
+        else:
+            candidatos = glob.glob(entrada)
+        # Ignora los archivos temporales de Excel (~$libro.xlsx)
+        rutas.extend(r for r in candidatos if not os.path.basename(r).startswith("~$"))
+    return sorted(set(rutas))
+
+
+#Def de Funcion para el nombre de salida de cada libro (sin chocar entre carpetas)
+def nombres_salida(rutas):
+    absolutas = [os.path.abspath(ruta) for ruta in rutas]
+    repetidos = Counter(os.path.basename(ruta).lower() for ruta in absolutas)
+    base = os.path.commonpath([os.path.dirname(ruta) for ruta in absolutas]) if absolutas else ""
+    nombres = {}
+    for ruta, absoluta in zip(rutas, absolutas):
+        if repetidos[os.path.basename(absoluta).lower()] > 1:
+            relativa = os.path.relpath(absoluta, base)
+        else:
+            relativa = os.path.basename(absoluta)
+        nombres[ruta] = os.path.splitext(relativa)[0].replace(os.sep, "__")
+    return nombres
+
+
+#Def de Funcion: evalúa un portafolio completo y escribe su libro de resultados
+def procesar_libro(ruta, parametros, carpeta_salida, con_heatmaps=False, nombre_salida=None):
+    inicio = time.perf_counter()
+    ingesta = leer_portafolio_excel(ruta)
+    if ingesta.faltantes:
+        raise ValueError(f"faltan columnas {ingesta.faltantes}")
+    df_soluciones = ingesta.soluciones
+    if df_soluciones.empty:
+        raise ValueError("no se encontraron soluciones válidas")
+    if ingesta.gastos is not None:
+        parametros = replace(parametros, gastos_adicionales_comunes=ingesta.gastos)
+
+    salidas = calcular_vpn_lote(df_soluciones, parametros)
+    df_resultados = tabla_resultados(df_soluciones, parametros, salidas)
+
+    nombre_base = nombre_salida or os.path.splitext(os.path.basename(ruta))[0]
+    archivo = nombre_base + os.path.splitext(ruta)[1]
+    ruta_salida = os.path.join(carpeta_salida, f"{nombre_base}_resultados.xlsx")
+    grilla = None
+    if con_heatmaps:
+        grilla_vpn = calcular_vpn_grilla(df_soluciones, parametros, RANGO_DESCUENTO / 100, RANGO_PRECIO)
+        grilla = (RANGO_DESCUENTO, RANGO_PRECIO, grilla_vpn, np.nansum(grilla_vpn, axis=2))
+    # Mismo libro que el botón "Descargar Excel" de la app, más la hoja de filas con error
+    escribir_libro_resultados(
+        ruta_salida, df_soluciones, parametros, salidas, grilla=grilla, df_resultados=df_resultados,
+        hojas_adicionales={"Errores": ingesta.errores} if not ingesta.errores.empty else None
+    )
+
+    return {
+        "Archivo": archivo,
+        "Soluciones": len(df_soluciones),
+        "Filas con error": len(ingesta.errores),
+        "Carbono Total (tCO2e)": df_resultados["Carbono Total (tCO2e)"].sum(),
+        "VPN Total (USD)": df_resultados["VPN (USD)"].sum(),
+        "Segundos": round(time.perf_counter() - inicio, 3),
+        "Salida": ruta_salida
+    }, df_resultados.assign(Archivo=archivo)
+
+
+def _argumentos(argv):
+    defecto = ParametrosModelo()
+    parser = argparse.ArgumentParser(description="Evalúa portafolios SNC (.xlsx) en paralelo.")
+    parser.add_argument("entradas", nargs="+", help="Directorios o patrones glob con libros .xlsx")
+    parser.add_argument("--salida", default="resultados_lote", help="Carpeta de salida")
+    parser.add_argument("--trabajadores", type=int, default=os.cpu_count(), help="Procesos en paralelo")
+    parser.add_argument("--heatmaps", action="store_true", help="Incluye las grillas tasa × precio")
+    parser.add_argument("--precio-carbono", type=float, default=defecto.precio_carbono, help="USD/ton CO2")
+    parser.add_argument("--crecimiento-precio", type=float, default=defecto.crecimiento_precio_carbono * 100, help="%% anual")
+    parser.add_argument("--tasa-descuento", type=float, default=defecto.tasa_descuento * 100, help="%%")
+    parser.add_argument("--crecimiento-ingreso", type=float, default=defecto.crecimiento_ingreso_encadenado * 100, help="%% anual")
+    parser.add_argument("--multiplicador-area", type=float, default=100, help="%%")
+    parser.add_argument("--multiplicador-precio", type=float, default=100, help="%%")
+    parser.add_argument("--multiplicador-tasa", type=float, default=100, help="%%")
+    parser.add_argument("--anios", type=int, default=defecto.n_anios, help="Horizonte de evaluación (años)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    parametros = ParametrosModelo(
+        tasa_descuento=args.tasa_descuento / 100,
+        precio_carbono=args.precio_carbono,
+        crecimiento_precio_carbono=args.crecimiento_precio / 100,
+        crecimiento_ingreso_encadenado=args.crecimiento_ingreso / 100,
+        multiplicador_area=args.multiplicador_area / 100,
+        multiplicador_precio_carbono=args.multiplicador_precio / 100,
+        multiplicador_tasa_descuento=args.multiplicador_tasa / 100,
+        n_anios=args.anios
+    )
+
+    rutas = buscar_libros(args.entradas)
+    if not rutas:
+        print("No se encontraron libros .xlsx en las entradas indicadas.", file=sys.stderr)
+        return 1
+    os.makedirs(args.salida, exist_ok=True)
+    nombres = nombres_salida(rutas)
+
+    resumen, detalle, fallidos = [], [], 0
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.trabajadores)) as pool:
+        futuros = {
+            pool.submit(procesar_libro, ruta, parametros, args.salida, args.heatmaps, nombres[ruta]): ruta
+            for ruta in rutas
+        }
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            ruta = futuros[futuro]
+            try:
+                fila, df_resultados = futuro.result()
+            except Exception as e:
+                fallidos += 1
+                print(f"[{i}/{len(rutas)}] ❌ {os.path.basename(ruta)}: {e}", flush=True)
+                continue
+            resumen.append(fila)
+            detalle.append(df_resultados)
+            print(
+                f"[{i}/{len(rutas)}] ✅ {fila['Archivo']}: {fila['Soluciones']} soluciones, "
+                f"VPN {fila['VPN Total (USD)']:,.2f} USD ({fila['Segundos']} s)",
+                flush=True
+            )
+
+    if resumen:
+        ruta_resumen = os.path.join(args.salida, "resumen_lote.xlsx")
+        libro = LibroExcel(ruta_resumen)
+        try:
+            libro.escribir_dataframe("Portafolios", pd.DataFrame(resumen).sort_values("Archivo"))
+            libro.escribir_dataframe("Soluciones", pd.concat(detalle, ignore_index=True))
+        finally:
+            libro.cerrar()
+        print(f"Resumen combinado: {ruta_resumen}", flush=True)
+
+    print(f"{len(resumen)} portafolio(s) procesado(s), {fallidos} con error, en {time.perf_counter() - inicio:.1f} s.")
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,974 @@
+# Archivo: modelo.py
+# Núcleo de cálculo del modelo SNC: no depende de Streamlit, se puede importar
+# desde app.py, procesos por lotes, pruebas o benchmarks.
+
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from dataclasses import asdict, dataclass, field, fields
+
+import numpy as np
+import pandas as pd
+
+from registros import TipoCaptura, TipoSNC, como_portafolio
+
+# --- GASTOS ADICIONALES COMUNES (se aplican a cada solución) ---
+GASTOS_ADICIONALES_COMUNES = [
+    {"descripcion": "Estudio base", "monto": 50000, "anio": -2},
+    {"descripcion": "Estudio base", "monto": 50000, "anio": -1},
+    {"descripcion": "Estudio base", "monto": 25000, "anio": 1},
+    {"descripcion": "Estudio base", "monto": 20000, "anio": 2},
+    {"descripcion": "Estudio base", "monto": 10000, "anio": 3},
+    {"descripcion": "Imprevistos", "monto": 3000, "anio_cada": 1, "desde": 0, "hasta": 15},
+    {"descripcion": "CostosTransaccion", "monto": 30000, "anio_cada": 3, "desde": 1, "hasta": 19},
+]
+
+# --- CATÁLOGO DE SOLUCIONES PREDETERMINADAS ---
+soluciones_predeterminadas = {
+    "Pastos Marinos": {"captura": 7.5, "costo": 70, "duracion": 30, "capex": 500, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+    "Manglares": {"captura": 10, "costo": 90, "duracion": 30, "capex": 800, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+    "Bosque Seco Tropical": {"captura": 6, "costo": 55, "duracion": 25, "capex": 400, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+    "Corales": {"captura": 3, "costo": 100, "duracion": 20, "capex": 1500, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+    "Agroforestería con Cacao": {"captura": 5, "costo": 50, "duracion": 20, "capex": 300, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+    "Bosque de Galería": {"captura": 8, "costo": 65, "duracion": 30, "capex": 600, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+    "Turberas Andinas": {"captura": 5, "costo": 70, "duracion": 30, "capex": 750, "tipo_captura": "constante", "tipo_sn": "restauracion"},
+
+    "Restauración de Pastos Degradados": {
+        "tipo_captura": "lineal", "captura_inicial": 2.0, "captura_final": 6.0,
+        "costo": 40, "duracion": 30, "capex": 300, "tipo_sn": "restauracion"
+    },
+    "Reforestación Productiva Zonas ECP": {
+        "tipo_captura": "lineal", "captura_inicial": 1.5, "captura_final": 5.5,
+        "costo": 60, "duracion": 30, "capex": 350, "tipo_sn": "restauracion"
+    },
+    "Restauración de Manglares Caribe (Esp.)": {
+        "tipo_captura": "sigmoidal", "captura_max": 8.0, "velocidad": 0.3, "punto_medio": 15,
+        "costo": 80, "duracion": 30, "capex": 900, "tipo_sn": "restauracion"
+    },
+
+    "Manglar Degradación Evitada": {"captura": 8.0, "costo": 60, "duracion": 30, "capex": 400, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Manglar Degradación Evitada (2)": {"captura": 8.0, "costo": 60, "duracion": 30, "capex": 400, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Bosque Húmedo Degradación Evitada": {"captura": 7.0, "costo": 50, "duracion": 30, "capex": 350, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Bosque Húmedo Degradación Evitada (2)": {"captura": 7.0, "costo": 50, "duracion": 30, "capex": 350, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Páramo Degradación Evitada": {"captura": 5.5, "costo": 55, "duracion": 30, "capex": 370, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Páramo Degradación Evitada (2)": {"captura": 5.5, "costo": 55, "duracion": 30, "capex": 370, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Humedal Degradación Evitada": {"captura": 6.5, "costo": 60, "duracion": 30, "capex": 390, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Humedal Degradación Evitada (2)": {"captura": 6.5, "costo": 60, "duracion": 30, "capex": 390, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Humedal Degradación Evitada (3)": {"captura": 6.5, "costo": 60, "duracion": 30, "capex": 390, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Pastos Degradación Evitada": {"captura": 4.5, "costo": 40, "duracion": 30, "capex": 310, "tipo_captura": "constante", "tipo_sn": "degradacion"},
+    "Pastos Degradación Evitada (2)": {"captura": 4.5, "costo": 40, "duracion": 30, "capex": 310, "tipo_captura": "constante", "tipo_sn": "degradacion"}
+}
+
+
+#Def de Contadores de evaluaciones del motor (los lee instrumentacion.py para el panel de la app).
+# Son por hilo: Streamlit corre cada sesión en su propio hilo y así una sesión no suma las llamadas de otra.
+class ContadoresMotor(threading.local):
+    def __init__(self):
+        self.valores = Counter()
+
+    def __getitem__(self, clave):
+        return self.valores[clave]
+
+    def __setitem__(self, clave, valor):
+        self.valores[clave] = valor
+
+    def copia(self):
+        return dict(self.valores)
+
+
+contadores_motor = ContadoresMotor()
+
+
+# Horizonte de evaluación (años): predeterminado y máximo permitido en la app
+N_ANIOS_PREDETERMINADO = 30
+N_ANIOS_MAXIMO = 200
+
+
+#Def de Parámetros globales del modelo (antes leídos de los sliders como variables globales)
+@dataclass
+class ParametrosModelo:
+    tasa_descuento: float = 0.12
+    precio_carbono: float = 14.75
+    crecimiento_precio_carbono: float = 0.0497
+    crecimiento_ingreso_encadenado: float = 0.015
+    multiplicador_area: float = 1.0
+    multiplicador_precio_carbono: float = 1.0
+    multiplicador_tasa_descuento: float = 1.0
+    n_anios: int = N_ANIOS_PREDETERMINADO  # horizonte de evaluación; todos los vectores anuales miden esto
+    gastos_adicionales_comunes: list = field(default_factory=lambda: [dict(g) for g in GASTOS_ADICIONALES_COMUNES])
+
+    def como_dict(self):
+        return asdict(self)
+
+
+#Def de Funcion Simple para VPN
+def calcular_vpn_simple(flujo_anual, tasa):
+    return sum([
+        flujo_anual[i] / ((1 + tasa) ** (i + 1))
+        for i in range(len(flujo_anual))
+    ])
+
+
+#Def de Cronograma de gastos adicionales compilado: se arma una vez por (cronograma, horizonte)
+class CronogramaGastos:
+    """Gastos adicionales comunes precompilados a vectores anuales.
+
+    Los gastos puntuales ("anio") se suman a un vector base; los recurrentes
+    ("anio_cada", "desde", "hasta") se guardan como arreglos y se expanden con una
+    máscara (recurrentes × años) en vez de un bucle por año. El gasto del año -1
+    es el único que depende de la tasa (se descuenta un año y va al año 0), así
+    que el vector de cada tasa se arma a partir de la base y se memoriza.
+    Los vectores devueltos por vector() son de solo lectura.
+    """
+
+    def __init__(self, gastos_adicionales_comunes, n_anios_default):
+        self.n_anios = n_anios_default
+        anios = np.arange(n_anios_default)
+        base = np.zeros(n_anios_default)
+        self.previo = 0.0  # monto del año -1, antes de descontar
+
+        puntuales = [g for g in gastos_adicionales_comunes if "anio" in g]
+        for gasto in puntuales:
+            if gasto["anio"] == -1:
+                self.previo += gasto["monto"]
+            elif 0 <= gasto["anio"] < n_anios_default:
+                base[gasto["anio"]] += gasto["monto"]
+
+        recurrentes = [g for g in gastos_adicionales_comunes if "anio" not in g and "anio_cada" in g]
+        if recurrentes:
+            monto = np.array([g["monto"] for g in recurrentes], dtype=float)
+            cada = np.array([g["anio_cada"] for g in recurrentes], dtype=int)
+            desde = np.array([g.get("desde", 0) for g in recurrentes], dtype=int)
+            hasta = np.array([g.get("hasta", n_anios_default) for g in recurrentes], dtype=int)
+            relativo = anios[None, :] - desde[:, None]
+            aplica = (relativo >= 0) & (anios[None, :] <= hasta[:, None]) & (relativo % cada[:, None] == 0)
+            base += monto @ aplica
+
+        base.flags.writeable = False
+        self.base = base
+        self._por_tasa = {}
+
+    def vector(self, tasa_descuento):
+        vector = self._por_tasa.get(tasa_descuento)
+        if vector is None:
+            vector = self.base.copy()
+            if self.previo and self.n_anios:
+                vector[0] += self.previo / (1 + tasa_descuento)
+            vector.flags.writeable = False
+            if len(self._por_tasa) < 256:
+                self._por_tasa[tasa_descuento] = vector
+        return vector
+
+
+@lru_cache(maxsize=64)
+def _cronograma_compilado(clave, n_anios_default):
+    return CronogramaGastos([dict(items) for items in clave], n_anios_default)
+
+
+#Def de Funcion: cronograma compilado y compartido para una lista de gastos y un horizonte
+def compilar_gastos(gastos_adicionales_comunes, n_anios_default):
+    clave = tuple(tuple(sorted(gasto.items())) for gasto in gastos_adicionales_comunes)
+    return _cronograma_compilado(clave, n_anios_default)
+
+
+#Def de Funcion para expandir los gastos adicionales comunes a un vector anual
+def expandir_gastos_adicionales(gastos_adicionales_comunes, tasa_descuento, n_anios_default):
+    return compilar_gastos(gastos_adicionales_comunes, n_anios_default).vector(tasa_descuento)
+
+
+#Def de Funcion para VPN
+def calcular_vpn_solucion(sol, parametros):
+    contadores_motor["calcular_vpn_solucion"] += 1
+    n_anios_default = parametros.n_anios
+    tasa_descuento = parametros.tasa_descuento
+
+    dur = int(sol["Duración (años)"])
+    area_total = sol["Área (ha)"] * parametros.multiplicador_area
+    tipo_sn = sol.get("Tipo SNC", "restauracion")
+    anos_area_escalonada = int(sol.get("Años Escalonamiento", sol.get(ALIAS_ANOS_ESCALONAMIENTO, 1)))
+
+    # Curvas del generador compartido (las mismas que usa el motor en lote)
+    area_por_anio = area_total * forma_area(anos_area_escalonada, n_anios_default)
+    cap_ha = curva_captura(*parametros_curva_solucion(sol), dur, n_anios_default)
+
+    salv = 1 - sol["Salvaguardas (%)"] / 100
+
+    if tipo_sn == "degradacion":
+        perdida_pct = sol.get("% Pérdida Evitada", 0.0) / 100
+        area_efectiva = area_por_anio * perdida_pct
+    else:
+        area_efectiva = area_por_anio
+
+    captura_anual = cap_ha * area_efectiva * salv
+
+    costo_base = sol["Costo anual por ha (USD)"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        costo_anual = costo_base * ((area_por_anio / 100) ** -0.2) * area_por_anio
+
+    capex = sol["CAPEX Total (USD)"]
+    ingreso_base = sol["Ingreso Encadenado (USD/año)"]
+
+    gastos_adicionales = expandir_gastos_adicionales(parametros.gastos_adicionales_comunes, tasa_descuento, n_anios_default)
+
+    # Todos los vectores anuales miden el horizonte; los años fuera de la duración quedan en 0
+    anios = np.arange(n_anios_default)
+    monitoreo_en_campo = np.where(anios < dur, 9.2 * area_por_anio, 0.0)
+
+    precio_base = parametros.precio_carbono * parametros.multiplicador_precio_carbono
+    ingreso = (
+        captura_anual * precio_base * ((1 + parametros.crecimiento_precio_carbono) ** anios)
+        + ingreso_base * ((1 + parametros.crecimiento_ingreso_encadenado) ** anios)
+    )
+    with np.errstate(invalid="ignore"):
+        flujo_neto = ingreso - costo_anual - (gastos_adicionales + monitoreo_en_campo)
+    flujo_neto = np.where(flujo_neto > 0, flujo_neto * (1 - 0.15), flujo_neto)
+    flujo_proyecto = np.where((anios >= 1) & (anios < dur), flujo_neto, 0.0)
+    flujo_proyecto[0] = -capex
+
+    tasa_desc = tasa_descuento * parametros.multiplicador_tasa_descuento
+    vpn = (flujo_proyecto / ((1 + tasa_desc) ** (anios + 1))).sum()
+
+    return vpn, flujo_proyecto, captura_anual, area_por_anio, costo_anual, monitoreo_en_campo, gastos_adicionales
+
+
+#Def de Generador de curvas: una sola implementación de las curvas de área y captura.
+# El motor por fila y el motor en lote piden aquí sus curvas; cada curva se genera una
+# vez por (tipo, parámetros, duración, años) y se comparte como arreglo de solo lectura.
+TIPOS_CAPTURA = tuple(tipo.name.lower() for tipo in TipoCaptura)  # índice = código de TipoCaptura
+ALIAS_ANOS_ESCALONAMIENTO = "Años para 100% área"
+MAX_CURVAS_CACHEADAS_POR_LOTE = 512  # con más curvas distintas se generan en bloque sin caché
+
+
+def _solo_lectura(arreglo):
+    arreglo.flags.writeable = False
+    return arreglo
+
+
+#Def de Funcion auxiliar: curvas de captura por ha en bloque (filas × años)
+def _generar_curvas_captura(codigos, parametros_curva, dur, n_anios_default):
+    """codigos: índice en TIPOS_CAPTURA; parametros_curva: (filas × 3) con
+    (captura,) / (inicial, final) / (máxima, velocidad, punto medio) según el tipo."""
+    anios = np.arange(n_anios_default)
+    cap_ha = np.zeros((len(codigos), n_anios_default))
+    p1, p2, p3 = (parametros_curva[:, j, None] for j in range(3))
+    es_lineal = codigos == 1
+    es_sigmoidal = codigos == 2
+    es_constante = ~(es_lineal | es_sigmoidal)
+    if es_constante.any():
+        cap_ha[es_constante] = p1[es_constante]
+    if es_lineal.any():
+        cap_ini, cap_fin = p1[es_lineal], p2[es_lineal]
+        dur_lineal = dur[es_lineal, None]
+        paso = (cap_fin - cap_ini) / np.maximum(dur_lineal - 1, 1)
+        cap_ha[es_lineal] = np.where(
+            (anios[None, :] == dur_lineal - 1) & (dur_lineal > 1),
+            cap_fin,
+            anios[None, :] * paso + cap_ini
+        )
+    if es_sigmoidal.any():
+        cap_ha[es_sigmoidal] = p1[es_sigmoidal] / (1 + np.exp(-p2[es_sigmoidal] * (anios[None, :] - p3[es_sigmoidal])))
+    # Sin captura después de la duración de cada solución
+    return np.where(anios[None, :] < dur[:, None], cap_ha, 0.0)
+
+
+#Def de Funcion: curva de captura por ha de una solución (cacheada, solo lectura)
+@lru_cache(maxsize=4096)
+def curva_captura(tipo, parametros_curva, dur, n_anios_default):
+    codigo = TIPOS_CAPTURA.index(tipo) if tipo in TIPOS_CAPTURA else 0
+    curva = _generar_curvas_captura(
+        np.array([codigo]), np.array([parametros_curva], dtype=float), np.array([dur]), n_anios_default
+    )[0]
+    return _solo_lectura(curva)
+
+
+#Def de Funcion: fracción del área aplicada por año con rampa escalonada (cacheada, solo lectura)
+@lru_cache(maxsize=256)
+def forma_area(anos_area_escalonada, n_anios_default):
+    # Rampa lineal (como np.linspace) hasta completar el área y luego el área completa
+    anios = np.arange(n_anios_default)
+    anos = max(int(anos_area_escalonada), 1)
+    inicio_rampa = 1 / anos
+    paso_rampa = (1 - inicio_rampa) / max(anos - 1, 1)
+    return _solo_lectura(np.where(anios < anos - 1, anios * paso_rampa + inicio_rampa, 1.0))
+
+
+#Def de Funcion auxiliar: parámetros de curva de una solución (dict) según su tipo
+def parametros_curva_solucion(sol):
+    tipo = sol.get("Tipo Captura", "constante")
+    if tipo == "lineal":
+        return tipo, (float(sol["Captura Inicial"]), float(sol["Captura Final"]), 0.0)
+    if tipo == "sigmoidal":
+        return tipo, (float(sol["Captura Máxima"]), float(sol["Velocidad"]), float(sol["Punto Medio"]))
+    return "constante", (float(sol["Captura por ha (tCO2e)"]), 0.0, 0.0)
+
+
+#Def de Funcion: área aplicada por año con rampa escalonada (soluciones × años)
+def calcular_area_por_anio(area_total, anos_area_escalonada, n_anios_default):
+    anos = np.maximum(np.asarray(anos_area_escalonada, dtype=int), 1)
+    unicos, inversa = np.unique(anos, return_inverse=True)
+    formas = np.stack([forma_area(int(a), n_anios_default) for a in unicos]) if len(unicos) else np.zeros((0, n_anios_default))
+    return area_total[:, None] * formas[inversa.ravel()]
+
+
+#Def de Funcion: curvas de captura por ha (constante, lineal, sigmoidal) para el portafolio
+def calcular_captura_por_ha(df_soluciones, dur, n_anios_default):
+    portafolio = como_portafolio(df_soluciones)
+    n_sol = len(portafolio)
+    codigos = portafolio.tipo_captura
+    es_lineal = codigos == TipoCaptura.LINEAL
+    es_sigmoidal = codigos == TipoCaptura.SIGMOIDAL
+
+    # Solo los parámetros que usa cada tipo; así las curvas iguales comparten clave
+    parametros_curva = np.zeros((n_sol, 3))
+    parametros_curva[:, 0] = np.select(
+        [es_lineal, es_sigmoidal], [portafolio.captura_inicial, portafolio.captura_maxima], portafolio.captura
+    )
+    parametros_curva[:, 1] = np.select([es_lineal, es_sigmoidal], [portafolio.captura_final, portafolio.velocidad], 0.0)
+    parametros_curva[:, 2] = np.where(es_sigmoidal, portafolio.punto_medio, 0.0)
+
+    claves = np.column_stack([codigos, parametros_curva, dur])
+    unicas, inversa = np.unique(claves, axis=0, return_inverse=True)
+    if len(unicas) <= MAX_CURVAS_CACHEADAS_POR_LOTE:
+        curvas = [
+            curva_captura(TIPOS_CAPTURA[int(c)], (p1, p2, p3), int(d), n_anios_default)
+            for c, p1, p2, p3, d in unicas.tolist()
+        ]
+        curvas = np.stack(curvas) if curvas else np.zeros((0, n_anios_default))
+    else:
+        curvas = _generar_curvas_captura(unicas[:, 0].astype(int), unicas[:, 1:4], unicas[:, 4].astype(int), n_anios_default)
+    return _solo_lectura(curvas[inversa.ravel()])
+
+
+#Def de Funcion auxiliar: componentes físicos y de costo del portafolio (soluciones × años)
+def _componentes_lote(df_soluciones, n_anios_default, multiplicador_area):
+    portafolio = como_portafolio(df_soluciones)
+    anios = np.arange(n_anios_default)
+
+    dur = portafolio.duracion.astype(int)
+    area_total = portafolio.area * multiplicador_area
+    vigente = anios[None, :] < dur[:, None]
+
+    area_por_anio = calcular_area_por_anio(area_total, portafolio.anos_escalonamiento, n_anios_default)
+    cap_ha = calcular_captura_por_ha(portafolio, dur, n_anios_default)
+
+    salvaguardas_pct = portafolio.salvaguardas
+    salv = 1 - salvaguardas_pct / 100
+
+    es_degradacion = portafolio.tipo_snc == TipoSNC.DEGRADACION
+    perdida_evitada_pct = portafolio.perdida_evitada
+    perdida_pct = perdida_evitada_pct / 100
+    area_efectiva = np.where(es_degradacion[:, None], area_por_anio * perdida_pct[:, None], area_por_anio)
+
+    captura_anual = cap_ha * area_efectiva * salv[:, None]
+
+    costo_base = portafolio.costo_anual_ha
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor_escala = (area_por_anio / 100) ** -0.2
+        costo_anual = costo_base[:, None] * factor_escala * area_por_anio
+
+    capex = portafolio.capex
+    ingreso_base = portafolio.ingreso_encadenado
+
+    monitoreo_en_campo = np.where(vigente, 9.2 * area_por_anio, 0.0)
+
+    return {
+        "area_por_anio": area_por_anio,
+        "captura_anual": captura_anual,
+        "costo_anual": costo_anual,
+        "monitoreo_en_campo": monitoreo_en_campo,
+        "capex": capex,
+        "ingreso_base": ingreso_base,
+        "activo": vigente & (anios[None, :] >= 1),
+        # Insumos sin combinar, para re-muestrear captura, OPEX, salvaguardas y pérdida evitada
+        "captura_por_ha": cap_ha,
+        "costo_base": costo_base,
+        "factor_escala_costo": factor_escala,
+        "salvaguardas_pct": salvaguardas_pct,
+        "perdida_evitada_pct": perdida_evitada_pct,
+        "es_degradacion": es_degradacion
+    }
+
+
+#Def de Funcion auxiliar: impuesto del 15% sobre flujos positivos, vigencia y CAPEX en el año 0
+def _flujo_proyecto_lote(flujo_neto, activo, capex):
+    with np.errstate(invalid="ignore"):
+        flujo_neto = np.where(flujo_neto > 0, flujo_neto * (1 - 0.15), flujo_neto)
+    flujo_proyecto = np.where(activo, flujo_neto, 0.0)
+    flujo_proyecto[..., 0] = -capex
+    return flujo_proyecto
+
+
+#Def de Funcion Vectorizada para VPN de todo el portafolio
+def calcular_vpn_lote(df_soluciones, parametros):
+    """Versión por lotes de calcular_vpn_solucion.
+
+    Evalúa todas las filas de df_soluciones a la vez y devuelve las mismas salidas
+    que la función por fila, pero como matrices (soluciones × años); el VPN es un
+    vector con un valor por solución y los gastos adicionales son comunes (un vector).
+    """
+    contadores_motor["calcular_vpn_lote"] += 1
+    contadores_motor["soluciones_lote"] += len(df_soluciones)
+    n_anios_default = parametros.n_anios
+    anios = np.arange(n_anios_default)
+    comp = _componentes_lote(df_soluciones, n_anios_default, parametros.multiplicador_area)
+    gastos_adicionales = expandir_gastos_adicionales(
+        parametros.gastos_adicionales_comunes, parametros.tasa_descuento, n_anios_default
+    )
+
+    precio_base = parametros.precio_carbono * parametros.multiplicador_precio_carbono
+    ingreso = (
+        comp["captura_anual"] * precio_base * ((1 + parametros.crecimiento_precio_carbono) ** anios)
+        + comp["ingreso_base"][:, None] * ((1 + parametros.crecimiento_ingreso_encadenado) ** anios)
+    )
+    with np.errstate(invalid="ignore"):
+        flujo_neto = ingreso - comp["costo_anual"] - (gastos_adicionales + comp["monitoreo_en_campo"])
+    flujo_proyecto = _flujo_proyecto_lote(flujo_neto, comp["activo"], comp["capex"])
+
+    tasa_desc = parametros.tasa_descuento * parametros.multiplicador_tasa_descuento
+    vpn = (flujo_proyecto / ((1 + tasa_desc) ** (anios + 1))).sum(axis=1)
+
+    return (
+        vpn, flujo_proyecto, comp["captura_anual"], comp["area_por_anio"],
+        comp["costo_anual"], comp["monitoreo_en_campo"], gastos_adicionales
+    )
+
+
+#Def de Funcion auxiliar: suma geométrica sum_{t=1..T} q**t, estable cuando q ≈ 1
+def _suma_geometrica(q, T):
+    cerca_de_uno = np.abs(q - 1) < 1e-8
+    with np.errstate(divide="ignore", invalid="ignore"):
+        suma = q * (1 - q ** T) / (1 - q)
+    # Desarrollo de primer orden alrededor de q = 1
+    return np.where(cerca_de_uno, q * T * (1 + (T - 1) / 2 * (q - 1)), suma)
+
+
+#Def de Funcion: VPN en forma cerrada para soluciones de captura constante sin escalonamiento
+def calcular_vpn_analitico(df_soluciones, parametros, rango_tasas, rango_precios):
+    """VPN analítico (tasa × precio × solución) y máscara de celdas donde es válido.
+
+    Con captura constante y área completa desde el año 1, el flujo del año t es
+    a·g^t + b·h^t − C − G_t (carbono, encadenamiento, costos fijos y gastos
+    comunes), y su VPN es una combinación de sumas geométricas. El impuesto del
+    15% solo se puede sacar de la suma si todos los años vigentes tienen el mismo
+    signo; como a·g^t y b·h^t son monótonos en t, basta acotar el flujo con sus
+    valores en t = 1 y t = T. Devuelve (matriz_vpn, elegible), con elegible de
+    forma (precio × solución); las celdas no elegibles quedan en NaN.
+    """
+    portafolio = como_portafolio(df_soluciones)
+    comp = _componentes_lote(portafolio, parametros.n_anios, parametros.multiplicador_area)
+    return _vpn_analitico(portafolio, comp, parametros, rango_tasas, rango_precios)
+
+
+def _vpn_analitico(portafolio, comp, parametros, rango_tasas, rango_precios):
+    n_anios_default = parametros.n_anios
+    anios = np.arange(n_anios_default)
+    rango_tasas = np.asarray(rango_tasas, dtype=float)
+    rango_precios = np.asarray(rango_precios, dtype=float)
+    es_constante = portafolio.tipo_captura == TipoCaptura.CONSTANTE
+    sin_escalonar = portafolio.anos_escalonamiento <= 1
+    dur = portafolio.duracion.astype(int)
+    T = np.clip(np.minimum(dur, n_anios_default) - 1, 0, None)  # años vigentes 1..T
+    t1 = min(1, n_anios_default - 1)
+
+    # Coeficientes del flujo (todos constantes en el tiempo para estas soluciones)
+    captura = comp["captura_anual"][:, t1]
+    costo_fijo = comp["costo_anual"][:, t1] + comp["monitoreo_en_campo"][:, t1]
+    b = comp["ingreso_base"]
+    g = 1 + parametros.crecimiento_precio_carbono
+    h = 1 + parametros.crecimiento_ingreso_encadenado
+    a = (rango_precios * parametros.multiplicador_precio_carbono)[:, None] * captura[None, :]  # (precio, solución)
+
+    # Gastos comunes: la tasa solo afecta el año 0, que no entra al flujo
+    gastos = expandir_gastos_adicionales(parametros.gastos_adicionales_comunes, 0.0, n_anios_default)
+    gastos_vigentes = np.where(anios >= 1, gastos, np.nan)
+    gasto_max = np.fmax.accumulate(gastos_vigentes)[np.maximum(T, t1)]
+    gasto_min = np.fmin.accumulate(gastos_vigentes)[np.maximum(T, t1)]
+
+    # Cotas del flujo sobre los años 1..T
+    extremos_carbono = np.stack([a * g, a * g ** T[None, :]])
+    extremos_encadenado = np.stack([b * h, b * h ** T])
+    with np.errstate(invalid="ignore"):
+        cota_inferior = (
+            extremos_carbono.min(axis=0) + extremos_encadenado.min(axis=0)[None, :] - (costo_fijo + gasto_max)[None, :]
+        )
+        cota_superior = (
+            extremos_carbono.max(axis=0) + extremos_encadenado.max(axis=0)[None, :] - (costo_fijo + gasto_min)[None, :]
+        )
+        todos_positivos = cota_inferior > 0
+        ninguno_positivo = cota_superior <= 0
+    elegible = (es_constante & sin_escalonar)[None, :] & (todos_positivos | ninguno_positivo | (T == 0)[None, :])
+    factor_impuesto = np.where(todos_positivos, 1 - 0.15, 1.0)
+
+    # Sumas descontadas por tasa: d = 1/(1+r); el año t se descuenta con d^(t+1)
+    d = 1 / (1 + rango_tasas * parametros.multiplicador_tasa_descuento)  # (tasa,)
+    suma_carbono = _suma_geometrica(g * d[:, None], T[None, :])
+    suma_encadenado = _suma_geometrica(h * d[:, None], T[None, :])
+    suma_costos = _suma_geometrica(d[:, None], T[None, :])
+    gastos_descontados = np.cumsum(np.where(anios >= 1, gastos, 0.0)[None, :] * d[:, None] ** anios, axis=1)[:, T]
+
+    with np.errstate(invalid="ignore"):
+        flujos_descontados = (
+            a[None] * suma_carbono[:, None, :]
+            + (b[None, :] * suma_encadenado - costo_fijo[None, :] * suma_costos - gastos_descontados)[:, None, :]
+        )
+        # Sin años vigentes (T = 0) el flujo solo tiene el CAPEX: se anula la suma vacía, que con
+        # área 0 daría NaN · 0 por el factor de escala del costo
+        flujos_descontados = np.where((T > 0)[None, None, :], flujos_descontados, 0.0)
+        matriz_vpn = d[:, None, None] * (factor_impuesto[None] * flujos_descontados - comp["capex"][None, None, :])
+    matriz_vpn[:, ~elegible] = np.nan
+    return matriz_vpn, elegible
+
+
+#Def de Funcion Vectorizada para la grilla de sensibilidad (tasa × precio × solución)
+def calcular_vpn_grilla(df_soluciones, parametros, rango_tasas, rango_precios, tamano_bloque=2048):
+    """VPN de cada solución para cada combinación (tasa, precio) de la grilla.
+
+    Devuelve una matriz (len(rango_tasas), len(rango_precios), n_soluciones) con el
+    mismo valor que calcular_vpn_solucion en cada celda. El flujo con impuesto solo
+    depende del precio, así que se arma el tensor precio × solución × año una vez y
+    el descuento de todas las tasas se aplica en una sola contracción sobre los años.
+    Las soluciones se procesan en bloques de tamano_bloque para acotar la memoria.
+    Las soluciones de captura constante cuyo flujo tiene signo conocido en toda la
+    grilla de precios se resuelven en forma cerrada (calcular_vpn_analitico).
+    """
+    contadores_motor["calcular_vpn_grilla"] += 1
+    contadores_motor["celdas_grilla"] += len(rango_tasas) * len(rango_precios) * len(df_soluciones)
+    n_anios_default = parametros.n_anios
+    anios = np.arange(n_anios_default)
+    rango_tasas = np.asarray(rango_tasas, dtype=float)
+    rango_precios = np.asarray(rango_precios, dtype=float)
+    portafolio = como_portafolio(df_soluciones)
+    comp = _componentes_lote(portafolio, n_anios_default, parametros.multiplicador_area)
+
+    # La tasa solo afecta el año 0 de los gastos, que nunca entra al flujo del proyecto
+    gastos_adicionales = expandir_gastos_adicionales(parametros.gastos_adicionales_comunes, 0.0, n_anios_default)
+
+    ingreso_carbono_unitario = comp["captura_anual"] * ((1 + parametros.crecimiento_precio_carbono) ** anios)
+    with np.errstate(invalid="ignore"):
+        flujo_sin_carbono = (
+            comp["ingreso_base"][:, None] * ((1 + parametros.crecimiento_ingreso_encadenado) ** anios)
+            - comp["costo_anual"] - (gastos_adicionales + comp["monitoreo_en_campo"])
+        )
+    precios_base = rango_precios * parametros.multiplicador_precio_carbono
+    factor_descuento = 1 / ((1 + rango_tasas[:, None] * parametros.multiplicador_tasa_descuento) ** (anios + 1))
+
+    matriz_vpn, elegible = _vpn_analitico(portafolio, comp, parametros, rango_tasas, rango_precios)
+    generales = np.flatnonzero(~elegible.all(axis=0))
+    for inicio in range(0, len(generales), tamano_bloque):
+        bloque = generales[inicio:inicio + tamano_bloque]
+        with np.errstate(invalid="ignore"):
+            flujo_neto = (
+                precios_base[:, None, None] * ingreso_carbono_unitario[None, bloque]
+                + flujo_sin_carbono[None, bloque]
+            )
+        flujo_proyecto = _flujo_proyecto_lote(flujo_neto, comp["activo"][None, bloque], comp["capex"][bloque])
+        matriz_vpn[:, :, bloque] = np.einsum("pnt,rt->rpn", flujo_proyecto, factor_descuento)
+
+    return matriz_vpn
+
+
+#Def de Funcion: precio del carbono de equilibrio (VPN = 0) por bisección vectorizada
+def calcular_precio_equilibrio(df_soluciones, parametros, precio_maximo=1e6, iteraciones=80):
+    """precio_carbono que hace VPN = 0 para cada solución, resuelto para todo el portafolio a la vez.
+
+    El flujo de cada año es creciente en el precio (también con el impuesto del 15%,
+    que solo cambia la pendiente en los años positivos), así que el VPN es monótono
+    y la bisección converge pese al quiebre. Devuelve 0 si la solución ya tiene
+    VPN ≥ 0 sin precio del carbono y NaN si no llega a VPN = 0 antes de precio_maximo.
+    El precio devuelto es el de la barra lateral, antes del multiplicador de precio.
+    """
+    n_anios_default = parametros.n_anios
+    anios = np.arange(n_anios_default)
+    comp = _componentes_lote(df_soluciones, n_anios_default, parametros.multiplicador_area)
+    gastos_adicionales = expandir_gastos_adicionales(
+        parametros.gastos_adicionales_comunes, parametros.tasa_descuento, n_anios_default
+    )
+    carbono_unitario = (
+        comp["captura_anual"] * parametros.multiplicador_precio_carbono
+        * ((1 + parametros.crecimiento_precio_carbono) ** anios)
+    )
+    with np.errstate(invalid="ignore"):
+        flujo_sin_carbono = (
+            comp["ingreso_base"][:, None] * ((1 + parametros.crecimiento_ingreso_encadenado) ** anios)
+            - comp["costo_anual"] - (gastos_adicionales + comp["monitoreo_en_campo"])
+        )
+    factor_descuento = 1 / ((1 + parametros.tasa_descuento * parametros.multiplicador_tasa_descuento) ** (anios + 1))
+
+    def vpn(precios):
+        with np.errstate(invalid="ignore"):
+            flujo_neto = precios[:, None] * carbono_unitario + flujo_sin_carbono
+        return _flujo_proyecto_lote(flujo_neto, comp["activo"], comp["capex"]) @ factor_descuento
+
+    n_sol = len(df_soluciones)
+    bajo = np.zeros(n_sol)
+    alto = np.full(n_sol, float(precio_maximo))
+    ya_rentable = vpn(bajo) >= 0
+    alcanzable = vpn(alto) >= 0
+    for _ in range(iteraciones):
+        medio = (bajo + alto) / 2
+        positivo = vpn(medio) >= 0
+        alto = np.where(positivo, medio, alto)
+        bajo = np.where(positivo, bajo, medio)
+    return np.where(ya_rentable, 0.0, np.where(alcanzable, alto, np.nan))
+
+
+#Def de Funcion: TIR de cada fila de flujo_proyecto por bisección vectorizada
+def calcular_tir_lote(flujo_proyecto, tasa_minima=-0.99, tasa_maxima=100.0, iteraciones=100):
+    """Tasa r con sum(flujo[t] / (1 + r)^(t+1)) = 0, para todas las soluciones a la vez.
+
+    Busca la raíz entre tasa_minima y tasa_maxima; si el VPN no cambia de signo en
+    ese intervalo (p. ej. todos los flujos negativos), la TIR es NaN.
+    """
+    flujo_proyecto = np.atleast_2d(flujo_proyecto)
+    n_anios = flujo_proyecto.shape[1]
+    if n_anios == 0:
+        return np.full(flujo_proyecto.shape[0], np.nan)
+    exponentes = np.arange(1, n_anios + 1)
+
+    # La bisección solo usa el signo del VPN, así que cada fila se multiplica por (1 + r)^k
+    # (positivo), con k = año del último flujo no nulo si r < 0 y del primero si r >= 0.
+    # Así los factores de los años con flujo quedan en [0, 1] y un horizonte largo no
+    # desborda a inf ni deja 0 · inf = NaN en los años sin flujo (que se descartan).
+    no_nulo = flujo_proyecto != 0
+    hay_flujo = no_nulo.any(axis=1)
+    primero = np.where(hay_flujo, np.argmax(no_nulo, axis=1) + 1, 0)
+    ultimo = np.where(hay_flujo, n_anios - np.argmax(no_nulo[:, ::-1], axis=1), 0)
+
+    def signo_vpn(tasas):
+        referencia = np.where(tasas < 0, ultimo, primero)
+        factores = np.exp((referencia[:, None] - exponentes) * np.log1p(tasas)[:, None])
+        return np.sign(np.where(no_nulo, flujo_proyecto * factores, 0.0).sum(axis=1))
+
+    n_sol = flujo_proyecto.shape[0]
+    bajo = np.full(n_sol, tasa_minima)
+    alto = np.full(n_sol, tasa_maxima)
+    with np.errstate(over="ignore", invalid="ignore"):
+        signo_bajo = signo_vpn(bajo)
+        valida = signo_bajo * signo_vpn(alto) < 0
+        for _ in range(iteraciones):
+            medio = (bajo + alto) / 2
+            mismo_signo = signo_vpn(medio) == signo_bajo
+            bajo = np.where(mismo_signo, medio, bajo)
+            alto = np.where(mismo_signo, alto, medio)
+    return np.where(valida, (bajo + alto) / 2, np.nan)
+
+
+#Def de Funcion: ingresos anuales por carbono y por encadenamiento (soluciones × años)
+def calcular_ingresos_lote(df_soluciones, parametros, captura_anual):
+    anios = np.arange(parametros.n_anios)
+    precio_base = parametros.precio_carbono * parametros.multiplicador_precio_carbono
+    ingreso_carbono = captura_anual * (precio_base * ((1 + parametros.crecimiento_precio_carbono) ** anios))
+    ingreso_base = como_portafolio(df_soluciones).ingreso_encadenado
+    ingreso_encadenado = ingreso_base[:, None] * ((1 + parametros.crecimiento_ingreso_encadenado) ** anios)
+    return ingreso_carbono, ingreso_encadenado
+
+
+#Def de Funcion: tabla resumen por solución (la que se exporta a Excel)
+def tabla_resultados(df_soluciones, parametros, salidas):
+    vpn, flujo_proyecto, captura_anual, _, costo_anual, _, _ = salidas
+    portafolio = como_portafolio(df_soluciones)
+    ingreso_carbono, ingreso_encadenado = calcular_ingresos_lote(portafolio, parametros, captura_anual)
+    return pd.DataFrame({
+        "Solución": portafolio.nombre,
+        "Área (ha)": portafolio.area * parametros.multiplicador_area,
+        "Carbono Total (tCO2e)": captura_anual.sum(axis=1),
+        "Costo Total (USD)": costo_anual.sum(axis=1),
+        "CAPEX Total (USD)": portafolio.capex,
+        "Ingreso Total (USD)": ingreso_carbono.sum(axis=1) + ingreso_encadenado.sum(axis=1),
+        "VPN (USD)": vpn,
+        "TIR (%)": calcular_tir_lote(flujo_proyecto) * 100 if len(vpn) else np.zeros(0),
+        "Precio de Equilibrio (USD/tCO2e)": calcular_precio_equilibrio(portafolio, parametros)
+    })
+
+
+# Columnas de la tabla de flujo de caja año a año (una fila por año)
+COLUMNAS_FLUJO_CAJA = [
+    "Año", "Área aplicada (ha)", "Captura anual (tCO₂e)", "Ingreso carbono (USD)", "Ingreso encadenado (USD)",
+    "OPEX ajustado (USD)", "Monitoreo campo (USD)", "Gastos adicionales (USD)", "Flujo neto (USD)"
+]
+
+
+#Def de Funcion: flujo de caja año a año de todas las soluciones (soluciones × años × COLUMNAS_FLUJO_CAJA)
+def matriz_flujo_caja(df_soluciones, parametros, salidas):
+    _, flujo_proyecto, captura_anual, area_por_anio, costo_anual, monitoreo_en_campo, gastos_adicionales = salidas
+    portafolio = como_portafolio(df_soluciones)
+    ingreso_carbono, ingreso_encadenado = calcular_ingresos_lote(portafolio, parametros, captura_anual)
+    forma = (len(portafolio), parametros.n_anios)
+    return np.round(np.stack([
+        np.broadcast_to(np.arange(1, parametros.n_anios + 1), forma),
+        area_por_anio, captura_anual, ingreso_carbono, ingreso_encadenado,
+        costo_anual, monitoreo_en_campo, np.broadcast_to(gastos_adicionales, forma), flujo_proyecto
+    ], axis=2), 2)
+
+
+#Def de Funcion: flujo de caja año a año de cada solución, como (nombre, DataFrame)
+def tablas_flujo_caja(df_soluciones, parametros, salidas):
+    portafolio = como_portafolio(df_soluciones)
+    matriz = matriz_flujo_caja(portafolio, parametros, salidas)
+    for k, nombre in enumerate(portafolio.nombre):
+        tabla = pd.DataFrame(matriz[k], columns=COLUMNAS_FLUJO_CAJA)
+        tabla["Año"] = tabla["Año"].astype(int)
+        yield nombre, tabla
+
+
+#Def de Cache LRU de resultados por solución (acotada por memoria, con contadores de aciertos y fallos)
+# Una misma instancia la comparten los hilos de todas las sesiones de Streamlit: cada método toma el lock.
+class CacheResultados:
+    def __init__(self, max_bytes=512 * 2**20):
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self.nbytes = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave):
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            if clave in self._entradas:
+                self.nbytes -= _tamano(self._entradas[clave])
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            self.nbytes += _tamano(valor)
+            while self.nbytes > self.max_bytes and len(self._entradas) > 1:
+                _, viejo = self._entradas.popitem(last=False)
+                self.nbytes -= _tamano(viejo)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+            self.nbytes = 0
+
+
+#Def de Funcion auxiliar: memoria de un arreglo o de una tupla de arreglos guardada en la cache
+def _tamano(valor):
+    if isinstance(valor, tuple):
+        return sum(arreglo.nbytes for arreglo in valor)
+    return valor.nbytes
+
+
+# Una sola instancia por proceso: el módulo se importa una vez y sobrevive a cada rerun de Streamlit
+_cache_resultados = CacheResultados()
+
+
+def obtener_cache_resultados():
+    return _cache_resultados
+
+
+#Def de Funcion para la huella de los parámetros globales (una vez por llamada, no por solución)
+def huella_parametros(*parametros):
+    texto = json.dumps(parametros, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+#Def de Funcion para las claves de contenido de todas las soluciones a la vez
+def claves_soluciones(df_soluciones):
+    """Una clave por solución (hash de 64 bits de sus campos en el Portafolio), como arreglo uint64.
+
+    Se calcula por columnas con pd.util.hash_pandas_object, sin armar un dict ni un
+    JSON por fila; dos soluciones con las mismas entradas tienen la misma clave.
+    """
+    portafolio = como_portafolio(df_soluciones)
+    campos = pd.DataFrame({campo.name: getattr(portafolio, campo.name) for campo in fields(portafolio)})
+    return pd.util.hash_pandas_object(campos, index=False).to_numpy(dtype=np.uint64)
+
+
+#Def de Funcion para la huella del portafolio completo (soluciones en orden)
+def huella_portafolio(claves):
+    return hashlib.sha256(np.ascontiguousarray(claves, dtype=np.uint64).tobytes()).hexdigest()
+
+
+#Def de Funcion VPN en lote con cache del portafolio completo
+def calcular_vpn_lote_cacheado(df_soluciones, parametros, cache=None):
+    """Mismas salidas que calcular_vpn_lote, guardadas por (parámetros, portafolio).
+
+    El motor en lote recalcula miles de soluciones en milisegundos, menos de lo que
+    cuesta armar la salida fila por fila desde la cache; por eso aquí se guarda el
+    resultado del portafolio entero. La evaluación solo de las soluciones nuevas o
+    editadas está en calcular_vpn_lote_incremental.
+    """
+    cache = cache if cache is not None else obtener_cache_resultados()
+    portafolio = como_portafolio(df_soluciones)
+    clave = (huella_parametros("lote", parametros.como_dict()), huella_portafolio(claves_soluciones(portafolio)))
+    salidas = cache.obtener(clave)
+    if salidas is None:
+        salidas = tuple(_solo_lectura(salida) for salida in calcular_vpn_lote(portafolio, parametros)[:6])
+        cache.guardar(clave, salidas)
+
+    gastos_adicionales = expandir_gastos_adicionales(
+        parametros.gastos_adicionales_comunes, parametros.tasa_descuento, parametros.n_anios
+    )
+    return (*salidas, gastos_adicionales)
+
+
+#Def de Funcion grilla de sensibilidad con cache por solución y del portafolio completo
+def calcular_vpn_grilla_cacheada(df_soluciones, parametros, rango_tasas, rango_precios, cache=None):
+    cache = cache if cache is not None else obtener_cache_resultados()
+    portafolio = como_portafolio(df_soluciones)
+    # La tasa y el precio de los parámetros no intervienen en la grilla
+    clave_parametros = parametros.como_dict()
+    del clave_parametros["tasa_descuento"], clave_parametros["precio_carbono"]
+    rejilla = (list(map(float, rango_tasas)), list(map(float, rango_precios)))
+    huella = huella_parametros("grilla", rejilla, clave_parametros)
+    claves = claves_soluciones(portafolio)
+
+    clave_portafolio = (huella, huella_portafolio(claves))
+    grilla = cache.obtener(clave_portafolio)
+    if grilla is not None:
+        return grilla
+
+    # Cada celda de la grilla cuesta más que su búsqueda: se reutilizan las soluciones ya evaluadas
+    claves = [(huella, clave) for clave in claves.tolist()]
+    celdas = [cache.obtener(clave) for clave in claves]
+    faltantes = [k for k, celda in enumerate(celdas) if celda is None]
+    if faltantes:
+        nuevas = calcular_vpn_grilla(portafolio.tomar(faltantes), parametros, rango_tasas, rango_precios)
+        for pos, k in enumerate(faltantes):
+            celdas[k] = _solo_lectura(np.array(nuevas[:, :, pos]))
+            cache.guardar(claves[k], celdas[k])
+
+    if celdas:
+        grilla = _solo_lectura(np.stack(celdas, axis=2))
+    else:
+        grilla = _solo_lectura(np.zeros((len(rango_tasas), len(rango_precios), 0)))
+    cache.guardar(clave_portafolio, grilla)
+    return grilla
+
+
+#Def de Agregado incremental: columnas por solución y sus sumas del portafolio
+class AgregadoIncremental:
+    """Resultados por solución (por clave de contenido) y sus sumas sobre el portafolio.
+
+    Al actualizar con las claves del portafolio actual solo se evalúan las claves
+    nuevas. Los resultados se guardan una sola vez, apilados por columna
+    (soluciones × ...), en arreglos propios: no son vistas de las entradas del
+    caché de contenido, así que lo que el caché desaloja se libera. Las sumas se
+    recalculan desde las columnas (np.nansum: una solución sin resultado, p. ej.
+    con área 0, no contamina el total ni lo deja en NaN después de quitarla); si
+    las claves no cambiaron desde la última actualización se devuelve el
+    resultado anterior.
+    """
+
+    def __init__(self):
+        self._claves = None
+        self._posiciones = {}  # clave -> fila en las columnas guardadas
+        self._resultado = None
+
+    @property
+    def nbytes(self):
+        if self._resultado is None:
+            return 0
+        columnas, totales = self._resultado
+        return sum(columna.nbytes for columna in columnas) + sum(total.nbytes for total in totales)
+
+    def actualizar(self, claves, evaluar_posiciones):
+        # evaluar_posiciones(posiciones) -> tupla de columnas con una fila por posición pedida
+        if claves == self._claves:
+            return self._resultado
+
+        nuevas = {}
+        for posicion, clave in enumerate(claves):
+            if clave not in self._posiciones:
+                nuevas.setdefault(clave, posicion)
+        fuentes = []  # (columnas de origen, posiciones en el portafolio, filas en el origen)
+        guardadas = [(posicion, self._posiciones[clave]) for posicion, clave in enumerate(claves) if clave in self._posiciones]
+        if guardadas:
+            fuentes.append((self._resultado[0], *map(np.array, zip(*guardadas))))
+        if nuevas:
+            fila_nueva = {clave: fila for fila, clave in enumerate(nuevas)}
+            calculadas = [(posicion, fila_nueva[clave]) for posicion, clave in enumerate(claves) if clave in fila_nueva]
+            fuentes.append((tuple(evaluar_posiciones(list(nuevas.values()))), *map(np.array, zip(*calculadas))))
+
+        # Solo se guardan las filas del portafolio actual; el caché de contenido conserva el resto
+        columnas = tuple(np.empty((len(claves), *columna.shape[1:]), dtype=columna.dtype) for columna in fuentes[0][0])
+        for origen, posiciones, filas in fuentes:
+            for columna, columna_origen in zip(columnas, origen):
+                columna[posiciones] = columna_origen[filas]
+        columnas = tuple(_solo_lectura(columna) for columna in columnas)
+        totales = [np.nansum(columna, axis=0) for columna in columnas]
+
+        self._posiciones = {clave: posicion for posicion, clave in enumerate(claves)}
+        self._claves, self._resultado = list(claves), (columnas, totales)
+        return self._resultado
+
+
+#Def de Estado incremental de una sesión: un agregado por tipo de cálculo y juego de parámetros
+class EstadoIncremental:
+    """Agregados de una sesión, acotados por memoria como CacheResultados: al pasar
+    de max_bytes se descartan los usados hace más tiempo (el último se conserva)."""
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self._agregados = OrderedDict()
+
+    def __len__(self):
+        return len(self._agregados)
+
+    @property
+    def nbytes(self):
+        return sum(agregado.nbytes for agregado in self._agregados.values())
+
+    def actualizar(self, clave, claves, evaluar_posiciones):
+        clave = huella_parametros(*clave)
+        agregado = self._agregados.pop(clave, None) or AgregadoIncremental()
+        self._agregados[clave] = agregado
+        resultado = agregado.actualizar(claves, evaluar_posiciones)
+        while self.nbytes > self.max_bytes and len(self._agregados) > 1:
+            self._agregados.popitem(last=False)
+        return resultado
+
+
+#Def de Funcion VPN en lote incremental: salidas por solución + totales del portafolio
+def calcular_vpn_lote_incremental(df_soluciones, parametros, estado, cache=None):
+    """Como calcular_vpn_lote_cacheado, y además devuelve los totales del portafolio
+    (VPN, flujo, captura, área, costo y monitoreo sumados sobre las soluciones);
+    `estado` guarda las filas por solución entre reruns."""
+    portafolio = como_portafolio(df_soluciones)
+    claves = claves_soluciones(portafolio).tolist()
+    if not claves:
+        salidas = calcular_vpn_lote_cacheado(portafolio, parametros, cache)
+        return salidas, [np.zeros(salida.shape[1:]) for salida in salidas[:6]]
+
+    def evaluar(posiciones):
+        return calcular_vpn_lote_cacheado(portafolio.tomar(posiciones), parametros, cache)[:6]
+
+    columnas, totales = estado.actualizar(("lote", parametros.como_dict()), claves, evaluar)
+    gastos_adicionales = expandir_gastos_adicionales(
+        parametros.gastos_adicionales_comunes, parametros.tasa_descuento, parametros.n_anios
+    )
+    return columnas + (gastos_adicionales,), totales
+
+
+#Def de Funcion grilla de sensibilidad incremental: grilla por solución + grilla del portafolio
+def calcular_vpn_grilla_incremental(df_soluciones, parametros, rango_tasas, rango_precios, estado, cache=None):
+    portafolio = como_portafolio(df_soluciones)
+    claves = claves_soluciones(portafolio).tolist()
+    if not claves:
+        return np.zeros((len(rango_tasas), len(rango_precios), 0)), np.zeros((len(rango_tasas), len(rango_precios)))
+
+    def evaluar(posiciones):
+        grilla = calcular_vpn_grilla_cacheada(portafolio.tomar(posiciones), parametros, rango_tasas, rango_precios, cache)
+        return (np.moveaxis(grilla, 2, 0),)
+
+    clave_parametros = parametros.como_dict()
+    del clave_parametros["tasa_descuento"], clave_parametros["precio_carbono"]
+    rejilla = (list(map(float, rango_tasas)), list(map(float, rango_precios)))
+    columnas, totales = estado.actualizar(("grilla", rejilla, clave_parametros), claves, evaluar)
+    return np.moveaxis(columnas[0], 0, 2), totales[0]
+
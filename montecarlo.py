@@ -0,0 +1,207 @@
+# Archivo: montecarlo.py
+# Análisis de incertidumbre Monte Carlo sobre el motor vectorizado de modelo.py.
+#
+# Cada parámetro incierto se describe con un dict de distribución:
+#   {"dist": "normal", "media": 1.0, "desv": 0.1}
+#   {"dist": "triangular", "min": 0.8, "moda": 1.0, "max": 1.2}
+#   {"dist": "uniforme", "min": 0.9, "max": 1.1}
+#   {"dist": "lognormal", "media": 0.0, "desv": 0.1}   (parámetros de la normal subyacente)
+#   {"dist": "fija", "valor": 1.0}
+#
+# Parámetros por solución:
+#   "factor_captura"   multiplica la curva de captura por ha (base 1.0)
+#   "factor_opex"      multiplica el Costo anual por ha (base 1.0)
+#   "salvaguardas"     Salvaguardas (%) en valor absoluto
+#   "perdida_evitada"  % Pérdida Evitada en valor absoluto (solo degradación)
+# Parámetro global (una muestra compartida por todas las soluciones):
+#   "crecimiento_precio_carbono"  fracción anual, p. ej. 0.0497
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from modelo import _componentes_lote, _flujo_proyecto_lote, expandir_gastos_adicionales
+from registros import como_portafolio
+
+#Def de Configuración de distribuciones: por defecto, por solución y globales
+# por_solucion acepta como clave la posición de la fila en el portafolio o el nombre de la solución.
+@dataclass
+class ConfiguracionMonteCarlo:
+    defecto: dict = field(default_factory=dict)
+    por_solucion: dict = field(default_factory=dict)
+    globales: dict = field(default_factory=dict)
+
+    def especificaciones(self, nombres, parametro):
+        return [
+            self.por_solucion.get(k, self.por_solucion.get(nombre, {})).get(parametro, self.defecto.get(parametro))
+            for k, nombre in enumerate(nombres)
+        ]
+
+
+#Def de Resultado: muestras de VPN (muestras × soluciones) y resumen de percentiles
+@dataclass
+class ResultadoMonteCarlo:
+    nombres: list
+    vpn_muestras: np.ndarray
+
+    @property
+    def vpn_portafolio(self):
+        return self.vpn_muestras.sum(axis=1)
+
+    def resumen(self):
+        columnas = np.column_stack([self.vpn_muestras, self.vpn_portafolio])
+        p5, p50, p95 = np.percentile(columnas, [5, 50, 95], axis=0)
+        return pd.DataFrame({
+            "Solución": list(self.nombres) + ["Total Portafolio"],
+            "VPN P5 (USD)": p5,
+            "VPN P50 (USD)": p50,
+            "VPN P95 (USD)": p95,
+            "VPN Media (USD)": columnas.mean(axis=0),
+            "Prob. VPN < 0": (columnas < 0).mean(axis=0)
+        })
+
+
+#Def de Funcion: muestrea un parámetro para todas las soluciones, agrupando por tipo de distribución
+def _muestrear(rng, especificaciones, base, n_muestras):
+    valores = np.broadcast_to(base, (n_muestras, len(base))).copy()
+    tipos = sorted({spec["dist"] for spec in especificaciones if spec})
+    for dist in tipos:
+        idx = np.array([k for k, spec in enumerate(especificaciones) if spec and spec["dist"] == dist])
+        p = lambda clave: np.array([especificaciones[k][clave] for k in idx], dtype=float)
+        forma = (n_muestras, len(idx))
+        if dist == "normal":
+            valores[:, idx] = rng.normal(p("media"), p("desv"), size=forma)
+        elif dist == "triangular":
+            valores[:, idx] = rng.triangular(p("min"), p("moda"), p("max"), size=forma)
+        elif dist == "uniforme":
+            valores[:, idx] = rng.uniform(p("min"), p("max"), size=forma)
+        elif dist == "lognormal":
+            valores[:, idx] = rng.lognormal(p("media"), p("desv"), size=forma)
+        elif dist == "fija":
+            valores[:, idx] = p("valor")
+        else:
+            raise ValueError(f"Distribución no soportada: {dist}")
+    return valores
+
+
+# Muestras por semilla: cada grupo de MUESTRAS_POR_SEMILLA muestras consecutivas sale de su propio
+# flujo aleatorio, independiente del tamaño de bloque con que se evalúan (memoria) y del número de trabajadores
+MUESTRAS_POR_SEMILLA = 256
+
+
+#Def de Funcion: sortea un grupo de muestras de todos los parámetros inciertos (muestras × soluciones)
+def _sortear_grupo(comp, parametros, configuracion, nombres, semilla, n_muestras):
+    # Siempre se sortea el grupo completo y se recorta, para que la muestra k no dependa de n_muestras
+    rng = np.random.default_rng(semilla)
+    n_sol = len(nombres)
+    sorteo = {
+        "factor_captura": _muestrear(
+            rng, configuracion.especificaciones(nombres, "factor_captura"), np.ones(n_sol), MUESTRAS_POR_SEMILLA
+        ),
+        "factor_opex": _muestrear(
+            rng, configuracion.especificaciones(nombres, "factor_opex"), np.ones(n_sol), MUESTRAS_POR_SEMILLA
+        ),
+        "salvaguardas": np.clip(_muestrear(
+            rng, configuracion.especificaciones(nombres, "salvaguardas"), comp["salvaguardas_pct"], MUESTRAS_POR_SEMILLA
+        ), 0, 100),
+        "perdida": np.clip(_muestrear(
+            rng, configuracion.especificaciones(nombres, "perdida_evitada"), comp["perdida_evitada_pct"], MUESTRAS_POR_SEMILLA
+        ), 0, 100),
+        "crecimiento": _muestrear(
+            rng, [configuracion.globales.get("crecimiento_precio_carbono")],
+            np.array([parametros.crecimiento_precio_carbono]), MUESTRAS_POR_SEMILLA
+        )
+    }
+    return {clave: valores[:n_muestras] for clave, valores in sorteo.items()}
+
+
+#Def de Funcion: evalúa un bloque de muestras ya sorteadas (muestras × soluciones × años) en una pasada
+def _evaluar_muestras(comp, gastos_adicionales, parametros, sorteo):
+    anios = np.arange(parametros.n_anios)
+    factor_captura, factor_opex = sorteo["factor_captura"], sorteo["factor_opex"]
+    salvaguardas, perdida, crecimiento = sorteo["salvaguardas"], sorteo["perdida"], sorteo["crecimiento"]
+
+    area = comp["area_por_anio"][None]
+    area_efectiva = np.where(comp["es_degradacion"][None, :, None], area * (perdida / 100)[..., None], area)
+    captura_anual = (
+        comp["captura_por_ha"][None] * factor_captura[..., None] * area_efectiva
+        * (1 - salvaguardas / 100)[..., None]
+    )
+    costo_anual = (comp["costo_base"][None] * factor_opex)[..., None] * (comp["factor_escala_costo"] * comp["area_por_anio"])[None]
+
+    precio_base = parametros.precio_carbono * parametros.multiplicador_precio_carbono
+    factor_precio = (1 + crecimiento) ** anios  # (muestras, años)
+    ingreso = (
+        captura_anual * precio_base * factor_precio[:, None, :]
+        + (comp["ingreso_base"][:, None] * ((1 + parametros.crecimiento_ingreso_encadenado) ** anios))[None]
+    )
+    with np.errstate(invalid="ignore"):
+        flujo_neto = ingreso - costo_anual - (gastos_adicionales + comp["monitoreo_en_campo"])[None]
+    flujo_proyecto = _flujo_proyecto_lote(flujo_neto, comp["activo"][None], comp["capex"])
+
+    tasa_desc = parametros.tasa_descuento * parametros.multiplicador_tasa_descuento
+    return flujo_proyecto @ (1 / ((1 + tasa_desc) ** (anios + 1)))
+
+
+#Def de Funcion: sortea un grupo de muestras y lo evalúa en bloques de tamano_bloque
+def _simular_grupo(comp, gastos_adicionales, parametros, configuracion, nombres, semilla, n_muestras, tamano_bloque):
+    sorteo = _sortear_grupo(comp, parametros, configuracion, nombres, semilla, n_muestras)
+    return np.concatenate([
+        _evaluar_muestras(
+            comp, gastos_adicionales, parametros,
+            {clave: valores[inicio:inicio + tamano_bloque] for clave, valores in sorteo.items()}
+        )
+        for inicio in range(0, n_muestras, tamano_bloque)
+    ], axis=0)
+
+
+#Def de Funcion principal: simulación por bloques, reproducible con semilla y opcionalmente en paralelo
+def simular_montecarlo(
+    df_soluciones,
+    parametros,
+    configuracion,
+    n_muestras=5000,
+    semilla=0,
+    tamano_bloque=None,
+    max_bytes_bloque=64 * 2**20,
+    trabajadores=1
+):
+    """VPN de n_muestras escenarios para cada solución del portafolio.
+
+    Las muestras se sortean en grupos de MUESTRAS_POR_SEMILLA, cada uno con su
+    propia semilla derivada de `semilla`, y se evalúan en bloques para que la
+    memoria no dependa de n_muestras: si no se indica tamano_bloque, se elige
+    para que el tensor (muestras × soluciones × años) de un bloque no supere
+    max_bytes_bloque. Como los grupos no dependen del tamaño de bloque, las
+    muestras de una semilla son las mismas con cualquier tamano_bloque,
+    max_bytes_bloque u horizonte, y con 1 o varios trabajadores.
+    """
+    portafolio = como_portafolio(df_soluciones)
+    nombres = portafolio.nombre.astype(str).tolist()
+    n_sol = len(nombres)
+    comp = _componentes_lote(portafolio, parametros.n_anios, parametros.multiplicador_area)
+    gastos_adicionales = expandir_gastos_adicionales(
+        parametros.gastos_adicionales_comunes, parametros.tasa_descuento, parametros.n_anios
+    )
+
+    if tamano_bloque is None:
+        # ~8 temporales de float64 del tamaño del tensor por bloque
+        tamano_bloque = max(1, int(max_bytes_bloque // (8 * 8 * max(n_sol, 1) * max(parametros.n_anios, 1))))
+    tamano_bloque = min(tamano_bloque, MUESTRAS_POR_SEMILLA)
+    tamanos = [min(MUESTRAS_POR_SEMILLA, n_muestras - inicio) for inicio in range(0, n_muestras, MUESTRAS_POR_SEMILLA)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = [
+        (comp, gastos_adicionales, parametros, configuracion, nombres, semilla_grupo, tamano, tamano_bloque)
+        for semilla_grupo, tamano in zip(semillas, tamanos)
+    ]
+
+    if trabajadores > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+            grupos = list(pool.map(_simular_grupo, *zip(*tareas)))
+    else:
+        grupos = [_simular_grupo(*tarea) for tarea in tareas]
+
+    vpn_muestras = np.concatenate(grupos, axis=0) if grupos else np.zeros((0, n_sol))
+    return ResultadoMonteCarlo(nombres=nombres, vpn_muestras=vpn_muestras)
@@ -0,0 +1,222 @@
+# Archivo: optimizador.py
+# Selección de soluciones y hectáreas para maximizar VPN o carbono con restricciones
+# de CAPEX y de área total.
+#
+# Cada candidato se evalúa una sola vez, en lote, en una rejilla de niveles de área
+# (0, paso, 2·paso, ... hasta su área máxima). Con esos coeficientes la búsqueda es
+# una mochila de elección múltiple (un nivel por candidato) resuelta por programación
+# dinámica vectorizada sobre la rejilla presupuesto × área; el modelo nunca se evalúa
+# dentro de la búsqueda.
+
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from ingesta import COLUMNAS_ESPERADAS
+from modelo import calcular_vpn_lote
+from registros import como_portafolio
+
+
+#Def de Restricciones del portafolio (np.inf = sin restricción)
+@dataclass
+class RestriccionesPortafolio:
+    presupuesto_capex: float = np.inf
+    area_maxima: float = np.inf
+    niveles_area: int = 10    # niveles de área por candidato (además de no seleccionarlo)
+    resolucion: int = 100     # celdas de la rejilla por cada restricción activa
+
+
+#Def de Resultado de una optimización: asignación por solución y totales
+@dataclass
+class ResultadoOptimizacion:
+    asignacion: pd.DataFrame
+    vpn_total: float
+    carbono_total: float
+    capex_total: float
+    area_total: float
+
+
+#Def de Funcion: candidatos en el esquema de 18 columnas a partir del catálogo predeterminado
+def candidatos_desde_catalogo(catalogo, area_maxima_por_solucion=1000.0, perdida_evitada=3.5):
+    filas = []
+    for nombre, base in catalogo.items():
+        tipo_captura = base.get("tipo_captura", "constante")
+        tipo_sn = base.get("tipo_sn", "restauracion")
+        fila = {
+            "Solución": nombre,
+            "Área (ha)": area_maxima_por_solucion,
+            "Costo anual por ha (USD)": base["costo"],
+            "CAPEX Total (USD)": base["capex"],
+            "Duración (años)": base["duracion"],
+            "Salvaguardas (%)": 0.0,
+            "Ingreso Encadenado (USD/año)": 0.0,
+            "Tipo Captura": tipo_captura,
+            "Tipo SNC": tipo_sn,
+            "% Pérdida Evitada": perdida_evitada if tipo_sn == "degradacion" else 0.0,
+            "Escalonada": False,
+            "Años Escalonamiento": 1
+        }
+        if tipo_captura == "constante":
+            fila["Captura por ha (tCO2e)"] = base["captura"]
+        elif tipo_captura == "lineal":
+            fila["Captura Inicial"] = base["captura_inicial"]
+            fila["Captura Final"] = base["captura_final"]
+        elif tipo_captura == "sigmoidal":
+            fila["Captura Máxima"] = base["captura_max"]
+            fila["Velocidad"] = base["velocidad"]
+            fila["Punto Medio"] = base["punto_medio"]
+        filas.append(fila)
+    return pd.DataFrame(filas).reindex(columns=COLUMNAS_ESPERADAS)
+
+
+#Def de Funcion: VPN y carbono de cada candidato en cada nivel de área (una evaluación en lote)
+def coeficientes_por_nivel(df_candidatos, parametros, areas_por_nivel):
+    """areas_por_nivel: matriz (candidatos × niveles) de hectáreas; el nivel 0 es "no seleccionar".
+
+    Devuelve (vpn, carbono), ambas (candidatos × niveles). El área de la fila ya es
+    el área asignada, así que se evalúa con multiplicador_area = 1.
+    """
+    n_cand, n_niveles = areas_por_nivel.shape
+    filas = como_portafolio(df_candidatos).tomar(np.repeat(np.arange(n_cand), n_niveles))
+    filas = replace(filas, area=areas_por_nivel.ravel())
+    vpn, _, captura_anual, _, _, _, _ = calcular_vpn_lote(filas, replace(parametros, multiplicador_area=1.0))
+    vpn = vpn.reshape(n_cand, n_niveles)
+    carbono = captura_anual.sum(axis=1).reshape(n_cand, n_niveles)
+    # Sin área no hay solución: ni CAPEX ni gastos
+    vpn[areas_por_nivel <= 0] = 0.0
+    carbono[areas_por_nivel <= 0] = 0.0
+    return np.nan_to_num(vpn, nan=-np.inf), np.nan_to_num(carbono)
+
+
+#Def de Funcion auxiliar: mochila de elección múltiple sobre la rejilla (presupuesto × área)
+def _mochila(valores, peso_capex, peso_area, n_capex, n_area):
+    """valores: (candidatos × niveles); pesos en celdas de la rejilla (peso_capex por candidato,
+    peso_area por candidato y nivel). Devuelve el nivel elegido para cada candidato."""
+    n_cand, n_niveles = valores.shape
+    mejor = np.full((n_capex + 1, n_area + 1), -np.inf)
+    mejor[0, 0] = 0.0
+    elecciones = np.zeros((n_cand, n_capex + 1, n_area + 1), dtype=np.int16)
+
+    for i in range(n_cand):
+        nuevo = mejor.copy()  # nivel 0: el candidato no entra
+        for nivel in range(1, n_niveles):
+            wc, wa = peso_capex[i], peso_area[i, nivel]
+            if wc > n_capex or wa > n_area or not np.isfinite(valores[i, nivel]):
+                continue
+            candidato = np.full_like(mejor, -np.inf)
+            candidato[wc:, wa:] = mejor[:n_capex + 1 - wc, :n_area + 1 - wa] + valores[i, nivel]
+            mejora = candidato > nuevo
+            nuevo[mejora] = candidato[mejora]
+            elecciones[i][mejora] = nivel
+        mejor = nuevo
+
+    celda = np.unravel_index(np.argmax(mejor), mejor.shape)
+    niveles = np.zeros(n_cand, dtype=int)
+    for i in range(n_cand - 1, -1, -1):
+        nivel = elecciones[i][celda]
+        niveles[i] = nivel
+        if nivel:
+            celda = (celda[0] - peso_capex[i], celda[1] - peso_area[i, nivel])
+    return niveles
+
+
+#Def de Clase: problema preparado (coeficientes y pesos) para resolver varios objetivos
+class ProblemaPortafolio:
+    def __init__(self, df_candidatos, parametros, restricciones=None):
+        self.restricciones = restricciones or RestriccionesPortafolio()
+        self.candidatos = como_portafolio(df_candidatos)
+        r = self.restricciones
+        area_candidato = self.candidatos.area
+        self.capex = self.candidatos.capex
+
+        # Rejilla de área: con restricción, los niveles son múltiplos exactos del paso
+        if np.isfinite(r.area_maxima):
+            self.n_area = r.resolucion
+            paso_area = r.area_maxima / r.resolucion
+            celdas_max = np.floor(np.minimum(area_candidato, r.area_maxima) / paso_area).astype(int)
+            celdas = np.round(
+                np.linspace(0, 1, r.niveles_area + 1)[None, :] * celdas_max[:, None]
+            ).astype(int)
+            self.areas = celdas * paso_area
+            self.peso_area = celdas
+        else:
+            self.n_area = 0
+            self.areas = np.linspace(0, 1, r.niveles_area + 1)[None, :] * area_candidato[:, None]
+            self.peso_area = np.zeros(self.areas.shape, dtype=int)
+
+        # Rejilla de presupuesto: el CAPEX se redondea hacia arriba (la solución siempre es factible)
+        if np.isfinite(r.presupuesto_capex):
+            self.n_capex = r.resolucion
+            paso_capex = r.presupuesto_capex / r.resolucion if r.presupuesto_capex > 0 else 1.0
+            self.peso_capex = np.ceil(np.maximum(self.capex, 0) / paso_capex - 1e-9).astype(int)
+            self.peso_capex[(self.capex > 0) & (r.presupuesto_capex <= 0)] = r.resolucion + 1
+        else:
+            self.n_capex = 0
+            self.peso_capex = np.zeros(len(self.capex), dtype=int)
+
+        self.vpn, self.carbono = coeficientes_por_nivel(self.candidatos, parametros, self.areas)
+
+    def resolver(self, peso_vpn=1.0):
+        """Maximiza peso_vpn·VPN + (1 − peso_vpn)·carbono, ambos normalizados a su mayor valor absoluto."""
+        escala_vpn = np.abs(self.vpn[np.isfinite(self.vpn)]).max(initial=0.0) or 1.0
+        escala_carbono = np.abs(self.carbono).max(initial=0.0) or 1.0
+        valores = peso_vpn * self.vpn / escala_vpn + (1 - peso_vpn) * self.carbono / escala_carbono
+        # Con peso extremo, el otro criterio desempata sin cambiar el óptimo principal
+        valores = valores + 1e-9 * (self.vpn / escala_vpn + self.carbono / escala_carbono)
+        niveles = _mochila(valores, self.peso_capex, self.peso_area, self.n_capex, self.n_area)
+        return self._resultado(niveles)
+
+    def _resultado(self, niveles):
+        filas = np.arange(len(niveles))
+        elegidos = niveles > 0
+        asignacion = pd.DataFrame({
+            "Solución": self.candidatos.nombre,
+            "Área asignada (ha)": self.areas[filas, niveles],
+            "CAPEX (USD)": np.where(elegidos, self.capex, 0.0),
+            "Carbono Total (tCO2e)": self.carbono[filas, niveles],
+            "VPN (USD)": self.vpn[filas, niveles]
+        })[elegidos].reset_index(drop=True)
+        return ResultadoOptimizacion(
+            asignacion=asignacion,
+            vpn_total=float(asignacion["VPN (USD)"].sum()),
+            carbono_total=float(asignacion["Carbono Total (tCO2e)"].sum()),
+            capex_total=float(asignacion["CAPEX (USD)"].sum()),
+            area_total=float(asignacion["Área asignada (ha)"].sum())
+        )
+
+
+#Def de Funcion principal: mejor portafolio para un objetivo ("vpn" o "carbono")
+def optimizar_portafolio(df_candidatos, parametros, restricciones=None, objetivo="vpn"):
+    peso_vpn = {"vpn": 1.0, "carbono": 0.0}[objetivo]
+    return ProblemaPortafolio(df_candidatos, parametros, restricciones).resolver(peso_vpn)
+
+
+#Def de Funcion: frente de Pareto carbono vs VPN por barrido de pesos
+def frente_pareto(df_candidatos, parametros, restricciones=None, n_pesos=21):
+    """Resuelve la mochila para n_pesos combinaciones VPN/carbono y se queda con los
+    portafolios no dominados. El barrido de pesos encuentra los puntos de la envolvente
+    convexa del frente; los coeficientes se calculan una sola vez para todo el barrido."""
+    problema = ProblemaPortafolio(df_candidatos, parametros, restricciones)
+    puntos = []
+    for peso_vpn in np.linspace(0, 1, n_pesos):
+        resultado = problema.resolver(peso_vpn)
+        puntos.append({
+            "Peso VPN": peso_vpn,
+            "Carbono Total (tCO2e)": resultado.carbono_total,
+            "VPN (USD)": resultado.vpn_total,
+            "CAPEX (USD)": resultado.capex_total,
+            "Área (ha)": resultado.area_total,
+            "Soluciones": ", ".join(
+                f"{nombre} ({area:,.0f} ha)"
+                for nombre, area in zip(resultado.asignacion["Solución"], resultado.asignacion["Área asignada (ha)"])
+            )
+        })
+    frente = pd.DataFrame(puntos).drop_duplicates(subset=["Carbono Total (tCO2e)", "VPN (USD)"])
+    carbono = frente["Carbono Total (tCO2e)"].to_numpy()
+    vpn = frente["VPN (USD)"].to_numpy()
+    dominado = (
+        (carbono[None, :] >= carbono[:, None]) & (vpn[None, :] >= vpn[:, None])
+        & ((carbono[None, :] > carbono[:, None]) | (vpn[None, :] > vpn[:, None]))
+    ).any(axis=1)
+    return frente[~dominado].sort_values("Carbono Total (tCO2e)").reset_index(drop=True)
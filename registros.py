@@ -0,0 +1,193 @@
+# Archivo: registros.py
+# Representación columnar y tipada del portafolio de soluciones.
+#
+# En lugar de una lista de dicts con claves largas en español (o filas de un
+# DataFrame recorridas con iterrows), el portafolio se guarda como un arreglo de
+# numpy por campo, con enteros pequeños para Tipo Captura y Tipo SNC. El motor de
+# modelo.py lo consume directamente; desde_dataframe / a_dataframe lo convierten
+# desde y hacia el esquema de 18 columnas del Excel (ingesta.COLUMNAS_ESPERADAS).
+
+from dataclasses import dataclass, fields
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+from ingesta import ALIAS_COLUMNAS, COLUMNAS_ESPERADAS, VALORES_VERDADEROS
+
+
+#Def de Tipos de curva de captura (el código es el índice de modelo.TIPOS_CAPTURA)
+class TipoCaptura(IntEnum):
+    CONSTANTE = 0
+    LINEAL = 1
+    SIGMOIDAL = 2
+
+
+#Def de Tipos de solución natural del clima
+class TipoSNC(IntEnum):
+    RESTAURACION = 0
+    DEGRADACION = 1
+
+
+# Campo del portafolio -> columna del esquema Excel
+COLUMNAS_CAMPOS = {
+    "nombre": "Solución",
+    "area": "Área (ha)",
+    "costo_anual_ha": "Costo anual por ha (USD)",
+    "capex": "CAPEX Total (USD)",
+    "duracion": "Duración (años)",
+    "salvaguardas": "Salvaguardas (%)",
+    "ingreso_encadenado": "Ingreso Encadenado (USD/año)",
+    "tipo_captura": "Tipo Captura",
+    "tipo_snc": "Tipo SNC",
+    "perdida_evitada": "% Pérdida Evitada",
+    "captura": "Captura por ha (tCO2e)",
+    "captura_inicial": "Captura Inicial",
+    "captura_final": "Captura Final",
+    "captura_maxima": "Captura Máxima",
+    "velocidad": "Velocidad",
+    "punto_medio": "Punto Medio",
+    "escalonada": "Escalonada",
+    "anos_escalonamiento": "Años Escalonamiento",
+}
+
+# Parámetros de curva que aplican a cada tipo de captura (los demás se exportan vacíos)
+CAMPOS_POR_TIPO_CAPTURA = {
+    TipoCaptura.CONSTANTE: ["captura"],
+    TipoCaptura.LINEAL: ["captura_inicial", "captura_final"],
+    TipoCaptura.SIGMOIDAL: ["captura_maxima", "velocidad", "punto_medio"],
+}
+
+
+#Def de Funcion auxiliar: columna numérica tolerante a comas decimales ("3,88")
+def _columna_numerica(df_soluciones, columna, defecto=0.0):
+    if columna not in df_soluciones.columns:
+        return np.full(len(df_soluciones), float(defecto))
+    valores = df_soluciones[columna]
+    if not pd.api.types.is_numeric_dtype(valores):
+        valores = valores.astype(str).str.replace(",", ".", regex=False)
+    return pd.to_numeric(valores, errors="coerce").fillna(defecto).to_numpy(dtype=float)
+
+
+#Def de Funcion auxiliar: columna de texto en minúsculas -> códigos de un IntEnum
+def _codigos(df_soluciones, columna, enum, defecto):
+    codigos = np.full(len(df_soluciones), int(defecto), dtype=np.int8)
+    if columna in df_soluciones.columns:
+        texto = df_soluciones[columna].astype("string").str.strip().str.lower()
+        for miembro in enum:
+            codigos[(texto == miembro.name.lower()).fillna(False).to_numpy(dtype=bool)] = miembro
+    return codigos
+
+
+#Def de Portafolio columnar: un arreglo de numpy por campo (una posición por solución)
+@dataclass
+class Portafolio:
+    nombre: np.ndarray
+    area: np.ndarray
+    costo_anual_ha: np.ndarray
+    capex: np.ndarray
+    duracion: np.ndarray
+    salvaguardas: np.ndarray
+    ingreso_encadenado: np.ndarray
+    tipo_captura: np.ndarray
+    tipo_snc: np.ndarray
+    perdida_evitada: np.ndarray
+    captura: np.ndarray
+    captura_inicial: np.ndarray
+    captura_final: np.ndarray
+    captura_maxima: np.ndarray
+    velocidad: np.ndarray
+    punto_medio: np.ndarray
+    escalonada: np.ndarray
+    anos_escalonamiento: np.ndarray
+
+    def __len__(self):
+        return len(self.nombre)
+
+    @property
+    def nbytes(self):
+        """Memoria de los arreglos numéricos (los nombres se cuentan como referencias)."""
+        return sum(getattr(self, campo.name).nbytes for campo in fields(self))
+
+    @classmethod
+    def desde_dataframe(cls, df_soluciones):
+        """Portafolio a partir de un DataFrame con el esquema Excel; columnas ausentes o vacías
+        toman el valor por defecto del motor (0, o 1 para Años Escalonamiento)."""
+        df = df_soluciones.rename(columns={
+            alias: col for alias, col in ALIAS_COLUMNAS.items() if col not in df_soluciones.columns
+        })
+        if "Solución" in df.columns:
+            nombre = df["Solución"].astype(str).to_numpy(dtype=object)
+        else:
+            nombre = np.full(len(df), "", dtype=object)
+        if "Escalonada" in df.columns:
+            escalonada = df["Escalonada"].astype("string").str.strip().str.lower().isin(VALORES_VERDADEROS).to_numpy(dtype=bool)
+        else:
+            escalonada = np.zeros(len(df), dtype=bool)
+        numericos = {
+            campo: _columna_numerica(df, columna)
+            for campo, columna in COLUMNAS_CAMPOS.items()
+            if campo not in ("nombre", "tipo_captura", "tipo_snc", "escalonada")
+        }
+        numericos["duracion"] = numericos["duracion"].astype(np.int32)
+        numericos["anos_escalonamiento"] = _columna_numerica(df, "Años Escalonamiento", 1).astype(np.int32)
+        return cls(
+            nombre=nombre,
+            tipo_captura=_codigos(df, "Tipo Captura", TipoCaptura, TipoCaptura.CONSTANTE),
+            tipo_snc=_codigos(df, "Tipo SNC", TipoSNC, TipoSNC.RESTAURACION),
+            escalonada=escalonada,
+            **numericos
+        )
+
+    @classmethod
+    def desde_registros(cls, registros):
+        """Portafolio a partir de una lista de dicts con las claves del esquema Excel."""
+        return cls.desde_dataframe(pd.DataFrame(list(registros)))
+
+    @classmethod
+    def vacio(cls):
+        return cls.desde_dataframe(pd.DataFrame(columns=COLUMNAS_ESPERADAS))
+
+    @classmethod
+    def concatenar(cls, portafolios):
+        portafolios = list(portafolios)
+        if not portafolios:
+            return cls.vacio()
+        return cls(**{
+            campo.name: np.concatenate([getattr(p, campo.name) for p in portafolios])
+            for campo in fields(cls)
+        })
+
+    def tomar(self, posiciones):
+        """Subportafolio con las soluciones en las posiciones dadas (índices o máscara)."""
+        return Portafolio(**{campo.name: getattr(self, campo.name)[posiciones] for campo in fields(self)})
+
+    def a_dataframe(self):
+        """DataFrame con el esquema Excel; los parámetros de curva que no aplican al tipo quedan vacíos."""
+        datos = {}
+        for campo, columna in COLUMNAS_CAMPOS.items():
+            datos[columna] = getattr(self, campo)
+        for tipo, campos in CAMPOS_POR_TIPO_CAPTURA.items():
+            for campo in campos:
+                datos[COLUMNAS_CAMPOS[campo]] = np.where(self.tipo_captura == tipo, datos[COLUMNAS_CAMPOS[campo]], np.nan)
+        datos["Tipo Captura"] = np.array([t.name.lower() for t in TipoCaptura], dtype=object)[self.tipo_captura]
+        datos["Tipo SNC"] = np.array([t.name.lower() for t in TipoSNC], dtype=object)[self.tipo_snc]
+        datos["Duración (años)"] = self.duracion.astype(int)
+        datos["Años Escalonamiento"] = self.anos_escalonamiento.astype(int)
+        return pd.DataFrame(datos, columns=COLUMNAS_ESPERADAS)
+
+    def a_registros(self):
+        """Lista de dicts con las claves del esquema Excel, sin los campos que no aplican."""
+        return [
+            {columna: valor for columna, valor in registro.items() if not (isinstance(valor, float) and np.isnan(valor))}
+            for registro in self.a_dataframe().to_dict("records")
+        ]
+
+
+#Def de Funcion: el portafolio tal cual, o convertido si llega como DataFrame o lista de dicts
+def como_portafolio(soluciones):
+    if isinstance(soluciones, Portafolio):
+        return soluciones
+    if isinstance(soluciones, pd.DataFrame):
+        return Portafolio.desde_dataframe(soluciones)
+    return Portafolio.desde_registros(soluciones)
@@ -0,0 +1,154 @@
+# Archivo: reporte_pdf.py
+# Reporte PDF del portafolio generado en el servidor, sin conexión a internet.
+#
+# Las gráficas se redibujan con matplotlib (backend PDF, fuentes incluidas) a
+# partir de los mismos resultados que alimentan las figuras plotly de app.py; la
+# exportación estática de plotly necesita kaleido y un navegador, que no existen
+# en el despliegue sin red. Cada página se escribe en PdfPages y se descarta
+# antes de dibujar la siguiente, así que un portafolio largo no acumula figuras
+# en memoria: la tabla resumen se reparte en tantas páginas como haga falta.
+
+import io
+from datetime import datetime
+
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from modelo import tabla_resultados
+
+TAMANO_PAGINA = (11.69, 8.27)  # A4 horizontal, en pulgadas
+FILAS_POR_PAGINA = 30
+MAX_SERIES_GRAFICA = 10  # soluciones con más carbono que se dibujan por nombre
+
+
+#Def de Funcion auxiliar: página nueva con título
+def _pagina(titulo):
+    fig = Figure(figsize=TAMANO_PAGINA)
+    fig.suptitle(titulo, fontsize=14, fontweight="bold")
+    return fig
+
+
+#Def de Funcion auxiliar: formato de celdas de la tabla resumen
+def _formato(valor):
+    if isinstance(valor, (float, np.floating)):
+        return "-" if np.isnan(valor) else f"{valor:,.2f}"
+    return str(valor)
+
+
+#Def de Funcion: portada con parámetros y totales del portafolio
+def _portada(pdf, df_resumen, parametros):
+    fig = _pagina("Sumideros Naturales de Carbono – Reporte del Portafolio")
+    ax = fig.add_subplot()
+    ax.axis("off")
+    lineas = [
+        f"Generado: {datetime.now():%Y-%m-%d %H:%M}",
+        f"Soluciones: {len(df_resumen)}",
+        "",
+        f"VPN total (USD): {df_resumen['VPN (USD)'].sum():,.2f}",
+        f"Carbono total (tCO2e): {df_resumen['Carbono Total (tCO2e)'].sum():,.2f}",
+        f"CAPEX total (USD): {df_resumen['CAPEX Total (USD)'].sum():,.2f}",
+        f"Área total (ha): {df_resumen['Área (ha)'].sum():,.2f}",
+        "",
+        f"Precio del carbono: {parametros.precio_carbono:,.2f} USD/tCO2e "
+        f"(crecimiento {parametros.crecimiento_precio_carbono * 100:.2f}% anual)",
+        f"Tasa de descuento: {parametros.tasa_descuento * 100:.2f}%",
+        f"Crecimiento ingreso encadenado: {parametros.crecimiento_ingreso_encadenado * 100:.2f}% anual",
+        f"Multiplicadores – área: {parametros.multiplicador_area:.0%}, "
+        f"precio: {parametros.multiplicador_precio_carbono:.0%}, tasa: {parametros.multiplicador_tasa_descuento:.0%}",
+        f"Horizonte de evaluación: {parametros.n_anios} años",
+    ]
+    ax.text(0.02, 0.95, "\n".join(lineas), va="top", fontsize=12, family="monospace", transform=ax.transAxes)
+    pdf.savefig(fig)
+
+
+#Def de Funcion: captura acumulada (soluciones con más carbono + total) y flujo acumulado del portafolio
+def _graficas_anuales(pdf, nombres, salidas, n_anios):
+    _, flujo_proyecto, captura_anual, _, _, _, _ = salidas
+    anios = np.arange(1, n_anios + 1)
+    fig = _pagina("Captura y Flujo de Caja Acumulados")
+    ax_captura, ax_flujo = fig.subplots(1, 2)
+
+    captura_acumulada = np.cumsum(captura_anual, axis=1)
+    for k in np.argsort(-captura_acumulada[:, -1])[:MAX_SERIES_GRAFICA]:
+        ax_captura.plot(anios, captura_acumulada[k], linewidth=1, label=nombres[k])
+    ax_captura.plot(anios, captura_acumulada.sum(axis=0), color="black", linewidth=2.5, label="Total Portafolio")
+    ax_captura.set(title="Captura acumulada de carbono", xlabel="Año", ylabel="tCO2e")
+    ax_captura.legend(fontsize=7)
+    ax_captura.grid(alpha=0.3)
+
+    ax_flujo.plot(anios, np.cumsum(flujo_proyecto.sum(axis=0)), marker="o", markersize=3)
+    ax_flujo.axhline(0, color="grey", linewidth=0.8)
+    ax_flujo.set(title="Flujo de caja acumulado del portafolio", xlabel="Año del Proyecto", ylabel="USD acumulado")
+    ax_flujo.grid(alpha=0.3)
+    pdf.savefig(fig)
+
+
+#Def de Funcion: heatmap del VPN del portafolio (tasa × precio)
+def _heatmap(pdf, grilla):
+    rango_tasas, rango_precios, _, matriz_vpn = grilla
+    fig = _pagina("Sensibilidad del VPN del Portafolio")
+    ax = fig.add_subplot()
+    imagen = ax.imshow(np.asarray(matriz_vpn), aspect="auto", origin="lower", cmap="YlGnBu")
+    ax.set_xticks(range(len(rango_precios)), [f"{p:g}" for p in rango_precios])
+    ax.set_yticks(range(len(rango_tasas)), [f"{t:g}%" for t in rango_tasas])
+    ax.set(xlabel="Precio del carbono (USD/tCO2e)", ylabel="Tasa de descuento")
+    fig.colorbar(imagen, ax=ax, label="VPN (USD)")
+    pdf.savefig(fig)
+
+
+#Def de Funcion: VPN total del portafolio por escenario de precio
+def _escenarios(pdf, escenarios):
+    etiquetas = list(escenarios)
+    totales = [float(np.nansum(escenarios[e])) for e in etiquetas]
+    fig = _pagina("Comparación de Escenarios (VPN del portafolio)")
+    ax = fig.add_subplot()
+    barras = ax.bar(etiquetas, totales, color=["#d62728", "#1f77b4", "#2ca02c"][:len(etiquetas)])
+    ax.bar_label(barras, labels=[f"{t:,.0f}" for t in totales])
+    ax.axhline(0, color="grey", linewidth=0.8)
+    ax.set_ylabel("VPN (USD)")
+    pdf.savefig(fig)
+
+
+#Def de Funcion: tabla resumen paginada
+def _tabla_resumen(pdf, df_resumen):
+    columnas = list(df_resumen.columns)
+    n_paginas = max(1, -(-len(df_resumen) // FILAS_POR_PAGINA))
+    for pagina, inicio in enumerate(range(0, max(len(df_resumen), 1), FILAS_POR_PAGINA), start=1):
+        bloque = df_resumen.iloc[inicio:inicio + FILAS_POR_PAGINA]
+        fig = _pagina(f"Resultados por Solución ({pagina}/{n_paginas})")
+        ax = fig.add_subplot()
+        ax.axis("off")
+        if not bloque.empty:
+            tabla = ax.table(
+                cellText=[[_formato(v) for v in fila] for fila in bloque.itertuples(index=False, name=None)],
+                colLabels=columnas, loc="upper center", cellLoc="right"
+            )
+            tabla.auto_set_font_size(False)
+            tabla.set_fontsize(7)
+            tabla.auto_set_column_width(range(len(columnas)))
+        pdf.savefig(fig)
+
+
+#Def de Funcion principal: escribe el reporte en destino (ruta o archivo binario)
+def escribir_reporte_pdf(destino, df_soluciones, parametros, salidas, grilla=None, escenarios=None):
+    """grilla: (rango_tasas_pct, rango_precios, grilla_vpn, matriz_vpn), como en exportacion.py.
+    escenarios: dict etiqueta -> VPN por solución."""
+    df_resumen = tabla_resultados(df_soluciones, parametros, salidas)
+    nombres = df_resumen["Solución"].astype(str).tolist()
+    with PdfPages(destino, metadata={"Title": "Reporte del Portafolio SNC"}) as pdf:
+        _portada(pdf, df_resumen, parametros)
+        if nombres:
+            _graficas_anuales(pdf, nombres, salidas, parametros.n_anios)
+        if grilla is not None and nombres:
+            _heatmap(pdf, grilla)
+        if escenarios:
+            _escenarios(pdf, escenarios)
+        _tabla_resumen(pdf, df_resumen)
+
+
+#Def de Funcion: el mismo reporte como bytes (para st.download_button)
+def reporte_pdf_bytes(*args, **kwargs):
+    salida = io.BytesIO()
+    escribir_reporte_pdf(salida, *args, **kwargs)
+    return salida.getvalue()
@@ -0,0 +1,143 @@
+# Archivo: sensibilidad.py
+# Análisis tornado (uno a la vez) sobre el motor vectorizado de modelo.py.
+#
+# Cada variable se lleva a su valor bajo y alto manteniendo las demás en el caso
+# base. Todas las perturbaciones de todas las soluciones se apilan como filas de un
+# mismo lote (escenarios × soluciones) y se evalúan en una sola pasada.
+#
+# Variaciones:
+#   relativas (%):  área, captura, OPEX, CAPEX
+#   absolutas (pp): salvaguardas, pérdida evitada, crecimientos y tasa
+
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from modelo import _componentes_lote, _flujo_proyecto_lote, expandir_gastos_adicionales
+from registros import Portafolio, como_portafolio
+
+VARIABLES_TORNADO = {
+    "area": ("Área", "%"),
+    "captura": ("Captura por ha", "%"),
+    "opex": ("OPEX (Costo anual por ha)", "%"),
+    "capex": ("CAPEX", "%"),
+    "salvaguardas": ("Salvaguardas", "pp"),
+    "perdida_evitada": ("% Pérdida Evitada", "pp"),
+    "crecimiento_precio_carbono": ("Crecimiento precio carbono", "pp"),
+    "crecimiento_ingreso_encadenado": ("Crecimiento ingreso encadenado", "pp"),
+    "tasa_descuento": ("Tasa de descuento", "pp"),
+}
+
+VARIACIONES_PREDETERMINADAS = {
+    "area": 20.0,
+    "captura": 20.0,
+    "opex": 20.0,
+    "capex": 20.0,
+    "salvaguardas": 5.0,
+    "perdida_evitada": 1.0,
+    "crecimiento_precio_carbono": 2.0,
+    "crecimiento_ingreso_encadenado": 1.0,
+    "tasa_descuento": 2.0,
+}
+
+CAMPOS_CAPTURA = ["captura", "captura_inicial", "captura_final", "captura_maxima"]
+
+
+#Def de Funcion auxiliar: copia del portafolio con una variable de solución perturbada
+def _perturbar(portafolio, variable, signo, variacion):
+    factor = 1 + signo * variacion / 100
+    if variable == "area":
+        return replace(portafolio, area=portafolio.area * factor)
+    if variable == "captura":
+        return replace(portafolio, **{campo: getattr(portafolio, campo) * factor for campo in CAMPOS_CAPTURA})
+    if variable == "opex":
+        return replace(portafolio, costo_anual_ha=portafolio.costo_anual_ha * factor)
+    if variable == "capex":
+        return replace(portafolio, capex=portafolio.capex * factor)
+    if variable == "salvaguardas":
+        return replace(portafolio, salvaguardas=np.clip(portafolio.salvaguardas + signo * variacion, 0, 100))
+    if variable == "perdida_evitada":
+        return replace(portafolio, perdida_evitada=np.clip(portafolio.perdida_evitada + signo * variacion, 0, 100))
+    return portafolio
+
+
+#Def de Funcion auxiliar: VPN por fila con crecimientos y tasa propios de cada fila
+def _vpn_filas(portafolio_filas, parametros, crecimiento_precio, crecimiento_ingreso, tasa_descuento):
+    n_anios_default = parametros.n_anios
+    anios = np.arange(n_anios_default)
+    comp = _componentes_lote(portafolio_filas, n_anios_default, parametros.multiplicador_area)
+    # La tasa solo afecta el año 0 de los gastos, que nunca entra al flujo del proyecto
+    gastos_adicionales = expandir_gastos_adicionales(parametros.gastos_adicionales_comunes, 0.0, n_anios_default)
+
+    precio_base = parametros.precio_carbono * parametros.multiplicador_precio_carbono
+    ingreso = (
+        comp["captura_anual"] * precio_base * ((1 + crecimiento_precio[:, None]) ** anios)
+        + comp["ingreso_base"][:, None] * ((1 + crecimiento_ingreso[:, None]) ** anios)
+    )
+    with np.errstate(invalid="ignore"):
+        flujo_neto = ingreso - comp["costo_anual"] - (gastos_adicionales + comp["monitoreo_en_campo"])
+    flujo_proyecto = _flujo_proyecto_lote(flujo_neto, comp["activo"], comp["capex"])
+    tasa_desc = tasa_descuento * parametros.multiplicador_tasa_descuento
+    return (flujo_proyecto / ((1 + tasa_desc[:, None]) ** (anios + 1))).sum(axis=1)
+
+
+#Def de Funcion principal: tabla tornado por solución y para el portafolio
+def calcular_tornado(df_soluciones, parametros, variaciones=None):
+    """VPN bajo/alto de cada variable, para cada solución y para el total del portafolio.
+
+    variaciones: dict variable -> magnitud (% para área, captura, OPEX y CAPEX; puntos
+    porcentuales para el resto); las variables ausentes o en 0 no se evalúan.
+    Devuelve un DataFrame largo con una fila por (solución, variable), ordenado por
+    el rango |VPN alto − VPN bajo| de mayor a menor dentro de cada solución.
+    """
+    variaciones = VARIACIONES_PREDETERMINADAS if variaciones is None else variaciones
+    variables = [v for v in VARIABLES_TORNADO if variaciones.get(v, 0) > 0]
+    portafolio = como_portafolio(df_soluciones)
+    n_sol = len(portafolio)
+
+    # Escenario 0 = caso base; luego (variable, bajo) y (variable, alto)
+    bloques = [portafolio]
+    globales = {
+        "crecimiento_precio_carbono": [parametros.crecimiento_precio_carbono],
+        "crecimiento_ingreso_encadenado": [parametros.crecimiento_ingreso_encadenado],
+        "tasa_descuento": [parametros.tasa_descuento],
+    }
+    for variable in variables:
+        for signo in (-1, 1):
+            bloques.append(_perturbar(portafolio, variable, signo, variaciones[variable]))
+            for nombre, valores in globales.items():
+                base = getattr(parametros, nombre)
+                valores.append(base + signo * variaciones[variable] / 100 if nombre == variable else base)
+
+    portafolio_filas = Portafolio.concatenar(bloques)
+    por_fila = {nombre: np.repeat(np.array(valores, dtype=float), n_sol) for nombre, valores in globales.items()}
+    vpn = _vpn_filas(
+        portafolio_filas, parametros,
+        por_fila["crecimiento_precio_carbono"],
+        por_fila["crecimiento_ingreso_encadenado"],
+        np.maximum(por_fila["tasa_descuento"], -0.99)
+    ).reshape(len(bloques), n_sol)
+
+    # Columna extra con el total del portafolio en cada escenario
+    vpn = np.column_stack([vpn, vpn.sum(axis=1)])
+    nombres = portafolio.nombre.tolist() + ["Total Portafolio"]
+
+    filas = []
+    for j, variable in enumerate(variables):
+        descripcion, unidad = VARIABLES_TORNADO[variable]
+        bajo, alto = vpn[1 + 2 * j], vpn[2 + 2 * j]
+        for k, nombre in enumerate(nombres):
+            filas.append({
+                "_posicion": k,
+                "Solución": nombre,
+                "Variable": descripcion,
+                "Variación": f"±{variaciones[variable]:g} {unidad}",
+                "VPN Base (USD)": vpn[0, k],
+                "VPN Bajo (USD)": bajo[k],
+                "VPN Alto (USD)": alto[k],
+                "Rango (USD)": abs(alto[k] - bajo[k])
+            })
+    columnas = ["_posicion", "Solución", "Variable", "Variación", "VPN Base (USD)", "VPN Bajo (USD)", "VPN Alto (USD)", "Rango (USD)"]
+    tabla = pd.DataFrame(filas, columns=columnas)
+    return tabla.sort_values(["_posicion", "Rango (USD)"], ascending=[True, False]).drop(columns="_posicion").reset_index(drop=True)
@@ -0,0 +1,65 @@
+# Archivo: tests/test_almacen.py
+# Pruebas del historial de corridas en disco de almacen.py.
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacen import AlmacenResultados  # noqa: E402
+from modelo import ParametrosModelo, calcular_vpn_grilla, calcular_vpn_lote  # noqa: E402
+from registros import Portafolio  # noqa: E402
+
+SOLUCIONES = [
+    {"Solución": "A", "Área (ha)": 100.0, "Costo anual por ha (USD)": 50.0, "CAPEX Total (USD)": 500.0,
+     "Duración (años)": 20, "Salvaguardas (%)": 5.0, "Ingreso Encadenado (USD/año)": 1e4,
+     "Tipo Captura": "constante", "Tipo SNC": "restauracion", "Captura por ha (tCO2e)": 7.5},
+    {"Solución": "B", "Área (ha)": 0.0, "Costo anual por ha (USD)": 40.0, "CAPEX Total (USD)": 300.0,
+     "Duración (años)": 30, "Salvaguardas (%)": 0.0, "Ingreso Encadenado (USD/año)": 0.0,
+     "Tipo Captura": "lineal", "Tipo SNC": "degradacion", "% Pérdida Evitada": 3.5,
+     "Captura Inicial": 2.0, "Captura Final": 6.0},
+]
+
+
+def test_guardar_y_cargar_conserva_entradas_salidas_y_grilla(tmp_path):
+    almacen = AlmacenResultados(str(tmp_path))
+    df_soluciones = Portafolio.desde_registros(SOLUCIONES).a_dataframe()
+    parametros = ParametrosModelo(precio_carbono=20.0, n_anios=45)
+    salidas = calcular_vpn_lote(df_soluciones, parametros)
+    rango_tasas, rango_precios = np.arange(1, 6), np.array([5.0, 15.0, 50.0])
+    grilla_vpn = calcular_vpn_grilla(df_soluciones, parametros, rango_tasas / 100, rango_precios)
+
+    id_corrida = almacen.guardar(
+        df_soluciones, parametros, salidas, grilla=(rango_tasas, rango_precios, grilla_vpn, None), etiqueta="base"
+    )
+    corrida = almacen.cargar(id_corrida)
+
+    assert corrida.parametros == parametros
+    pd.testing.assert_frame_equal(
+        corrida.soluciones.astype(object), df_soluciones.astype(object), check_dtype=False
+    )
+    for cargada, original in zip(corrida.salidas, salidas):
+        np.testing.assert_array_equal(cargada, original)  # incluye el VPN NaN de la solución sin área
+    assert not corrida.salidas[1].flags.writeable  # vista sobre el archivo, sin copia
+
+    tasas, precios, grilla_cargada, matriz = corrida.grilla
+    np.testing.assert_array_equal(tasas, rango_tasas)
+    np.testing.assert_array_equal(precios, rango_precios)
+    np.testing.assert_array_equal(grilla_cargada, grilla_vpn)
+    np.testing.assert_array_equal(matriz, grilla_vpn.sum(axis=2))
+
+    listado = almacen.listar()
+    assert listado["Corrida"].tolist() == [id_corrida]
+    assert listado.loc[0, "Etiqueta"] == "base" and listado.loc[0, "Horizonte (años)"] == 45
+    assert listado.loc[0, "VPN Total (USD)"] == np.nansum(salidas[0])
+
+    del corrida, cargada, grilla_cargada  # los memory maps se liberan antes de borrar
+    almacen.eliminar(id_corrida)
+    assert almacen.listar().empty
+
+
+def test_listar_sin_directorio(tmp_path):
+    assert AlmacenResultados(str(tmp_path / "no existe")).listar().empty
@@ -0,0 +1,80 @@
+# Archivo: tests/test_comparacion.py
+# Pruebas de la comparación entre escenarios de comparacion.py.
+
+import os
+import sys
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comparacion import PASO_SOLUCIONES, comparar_escenarios  # noqa: E402
+from modelo import CacheResultados, ParametrosModelo, calcular_vpn_lote  # noqa: E402
+
+
+#Def de Funcion auxiliar: solución de captura constante con los campos obligatorios
+def _solucion(nombre, area, captura=7.5, duracion=25):
+    return {"Solución": nombre, "Área (ha)": area, "Costo anual por ha (USD)": 50.0, "CAPEX Total (USD)": 500.0,
+            "Duración (años)": duracion, "Salvaguardas (%)": 0.0, "Ingreso Encadenado (USD/año)": 0.0,
+            "Tipo Captura": "constante", "Tipo SNC": "restauracion", "Captura por ha (tCO2e)": captura}
+
+
+DF_A = pd.DataFrame([_solucion("X", 1000.0), _solucion("Y", 400.0), _solucion("Y", 50.0), _solucion("Solo A", 30.0)])
+DF_B = pd.DataFrame([_solucion("X", 1200.0), _solucion("Y", 400.0, captura=9.0), _solucion("Y", 50.0), _solucion("Solo B", 80.0)])
+PARAMETROS_A = ParametrosModelo()
+PARAMETROS_B = replace(PARAMETROS_A, precio_carbono=30.0, tasa_descuento=0.08, crecimiento_precio_carbono=0.02, n_anios=40)
+
+
+def test_cascada_suma_el_cambio_total():
+    resultado = comparar_escenarios(DF_A, PARAMETROS_A, DF_B, PARAMETROS_B, CacheResultados())
+    vpn_a = np.nansum(calcular_vpn_lote(DF_A, PARAMETROS_A)[0])
+    vpn_b = np.nansum(calcular_vpn_lote(DF_B, PARAMETROS_B)[0])
+    assert resultado.vpn_a == pytest.approx(vpn_a) and resultado.vpn_b == pytest.approx(vpn_b)
+
+    cascada = resultado.cascada
+    pasos = cascada[cascada["Tipo"] == "relativo"]
+    assert pasos["Paso"].tolist()[-1] == PASO_SOLUCIONES
+    assert len(pasos) == len(resultado.parametros_cambiados) + 1 == 5
+    assert cascada["Δ VPN (USD)"].iloc[0] == pytest.approx(vpn_a)
+    assert cascada["Δ VPN (USD)"].iloc[-1] == pytest.approx(vpn_b)
+    assert pasos["Δ VPN (USD)"].sum() == pytest.approx(vpn_b - vpn_a, rel=1e-9)
+
+
+def test_diferencias_por_solucion_y_por_anio():
+    resultado = comparar_escenarios(DF_A, PARAMETROS_A, DF_B, PARAMETROS_B, CacheResultados())
+    por_solucion = resultado.por_solucion
+    # Emparejadas por nombre y por orden de aparición del nombre repetido
+    assert por_solucion["Solución"].tolist().count("Y") == 2
+    estados = dict(zip(por_solucion["Solución"], por_solucion["Estado"]))
+    assert estados["Solo A"] == "solo A" and estados["Solo B"] == "solo B" and estados["X"] == "ambas"
+    assert por_solucion["VPN Δ (USD)"].sum() == pytest.approx(resultado.vpn_b - resultado.vpn_a, rel=1e-9)
+    np.testing.assert_allclose(
+        por_solucion["VPN Δ (USD)"], por_solucion["VPN B (USD)"] - por_solucion["VPN A (USD)"]
+    )
+
+    por_anio = resultado.por_anio
+    assert len(por_anio) == PARAMETROS_B.n_anios  # horizonte más largo de los dos
+    assert (por_anio["Flujo A (USD)"].iloc[PARAMETROS_A.n_anios:] == 0).all()
+    assert por_anio["Flujo B (USD)"].sum() == pytest.approx(calcular_vpn_lote(DF_B, PARAMETROS_B)[1].sum())
+
+
+def test_escenarios_iguales_no_tienen_diferencias():
+    resultado = comparar_escenarios(DF_A, PARAMETROS_A, DF_A.copy(), PARAMETROS_A, CacheResultados())
+    assert resultado.parametros_cambiados.empty
+    assert (resultado.por_solucion["VPN Δ (USD)"] == 0).all()
+    assert resultado.cascada.loc[resultado.cascada["Paso"] == PASO_SOLUCIONES, "Δ VPN (USD)"].item() == 0
+
+
+def test_vpn_nan_del_motor_no_se_vuelve_cero():
+    # Área 0 con años vigentes: el motor da NaN (como calcular_vpn_solucion) en ambos escenarios
+    df_a = pd.DataFrame([_solucion("X", 1000.0), _solucion("Sin área", 0.0)])
+    df_b = pd.DataFrame([_solucion("X", 1000.0), _solucion("Sin área", 0.0), _solucion("Nueva", 0.0)])
+    por_solucion = comparar_escenarios(df_a, PARAMETROS_A, df_b, PARAMETROS_B, CacheResultados()).por_solucion
+    filas = por_solucion.set_index("Solución")
+    assert np.isnan(filas.loc["Sin área", ["VPN A (USD)", "VPN B (USD)", "VPN Δ (USD)"]].astype(float)).all()
+    # Solo el lado que falta se completa con 0
+    assert filas.loc["Nueva", "VPN A (USD)"] == 0 and np.isnan(filas.loc["Nueva", "VPN B (USD)"])
+    assert np.isfinite(filas.loc["X", ["VPN A (USD)", "VPN B (USD)", "VPN Δ (USD)"]].astype(float)).all()
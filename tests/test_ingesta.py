@@ -0,0 +1,117 @@
+# Archivo: tests/test_ingesta.py
+# Pruebas de la lectura y validación de libros Excel de ingesta.py.
+
+import hashlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingesta import COLUMNAS_ESPERADAS, COLUMNAS_GASTOS, HOJA_GASTOS, huella_archivo, leer_portafolio_excel  # noqa: E402
+
+
+#Def de Funcion auxiliar: fila del esquema de 18 columnas con valores válidos (todo como texto, como en Excel)
+def _fila(nombre, **cambios):
+    fila = {col: "" for col in COLUMNAS_ESPERADAS}
+    fila.update({
+        "Solución": nombre, "Área (ha)": "100", "Costo anual por ha (USD)": "50", "CAPEX Total (USD)": "500",
+        "Duración (años)": "30", "Salvaguardas (%)": "0", "Ingreso Encadenado (USD/año)": "0",
+        "Tipo Captura": "constante", "Tipo SNC": "restauracion", "Captura por ha (tCO2e)": "5",
+        "Escalonada": "no", "Años Escalonamiento": "1"
+    })
+    fila.update(cambios)
+    return fila
+
+
+def _escribir(ruta, filas, **hojas):
+    with pd.ExcelWriter(ruta) as escritor:
+        pd.DataFrame(filas, columns=COLUMNAS_ESPERADAS).to_excel(escritor, sheet_name="Soluciones", index=False)
+        for nombre, df in hojas.items():
+            df.to_excel(escritor, sheet_name=nombre, index=False)
+    return ruta
+
+
+def test_coma_decimal_y_filas_con_error(tmp_path):
+    ruta = _escribir(tmp_path / "portafolio.xlsx", [
+        _fila("Coma", **{"Captura por ha (tCO2e)": "3,88", "Área (ha)": "1250,5"}),
+        _fila("Sin área", **{"Área (ha)": ""}),
+        _fila("Tipo raro", **{"Tipo Captura": "exponencial"}),
+        _fila("Lineal incompleta", **{"Tipo Captura": "lineal", "Captura Inicial": "2"}),
+        _fila("", **{"Duración (años)": "0"}),
+        _fila("Sigmoidal", **{"Tipo Captura": " Sigmoidal ", "Captura Máxima": "8", "Velocidad": "0,3",
+                              "Punto Medio": "15,7", "Escalonada": "Sí", "Años Escalonamiento": "4"}),
+    ])
+    resultado = leer_portafolio_excel(ruta)
+
+    assert resultado.faltantes == []
+    assert resultado.soluciones["Solución"].tolist() == ["Coma", "Sigmoidal"]
+    coma, sigmoidal = resultado.soluciones.to_dict("records")
+    assert coma["Captura por ha (tCO2e)"] == 3.88 and coma["Área (ha)"] == 1250.5
+    assert np.isnan(coma["Captura Máxima"])  # no aplica a captura constante
+    assert sigmoidal["Tipo Captura"] == "sigmoidal" and sigmoidal["Velocidad"] == 0.3
+    assert sigmoidal["Punto Medio"] == 15 and sigmoidal["Escalonada"] and sigmoidal["Años Escalonamiento"] == 4
+
+    errores = resultado.errores.set_index("Fila")["Error"]
+    assert errores.index.tolist() == [3, 4, 5, 6]  # filas de Excel (encabezado en la fila 1)
+    assert "'Área (ha)' vacío o no numérico" in errores[3]
+    assert "'Tipo Captura' desconocido" in errores[4]
+    assert "'Captura Final' requerido para captura lineal" in errores[5]
+    assert "Solución vacía" in errores[6] and "al menos 1" in errores[6]
+
+
+def test_columnas_faltantes_y_alias(tmp_path):
+    fila = _fila("A")
+    fila["Años para 100% área"] = fila.pop("Años Escalonamiento")
+    ruta = tmp_path / "alias.xlsx"
+    pd.DataFrame([fila]).to_excel(ruta, index=False)
+    assert leer_portafolio_excel(ruta).soluciones["Años Escalonamiento"].tolist() == [1]
+
+    incompleto = tmp_path / "incompleto.xlsx"
+    pd.DataFrame([fila]).drop(columns=["CAPEX Total (USD)"]).to_excel(incompleto, index=False)
+    resultado = leer_portafolio_excel(incompleto)
+    assert resultado.faltantes == ["CAPEX Total (USD)"]
+    assert resultado.soluciones.empty
+
+
+def test_huella_depende_solo_del_contenido(tmp_path):
+    ruta = _escribir(tmp_path / "a.xlsx", [_fila("A"), _fila("B")])
+    contenido = ruta.read_bytes()
+    copia = tmp_path / "otro nombre.xlsx"
+    copia.write_bytes(contenido)
+    assert huella_archivo(copia.read_bytes()) == huella_archivo(contenido)
+    assert huella_archivo(contenido) == hashlib.sha256(contenido).hexdigest()
+
+    editado = _escribir(tmp_path / "a2.xlsx", [_fila("A"), _fila("B", **{"Área (ha)": "101"})])
+    assert huella_archivo(editado.read_bytes()) != huella_archivo(contenido)
+
+    # Registro de cargas como en app.py: el mismo libro subido dos veces se parsea y agrega una sola vez
+    cargas = {}
+    for archivo in (io.BytesIO(contenido), io.BytesIO(copia.read_bytes()), io.BytesIO(editado.read_bytes())):
+        huella = huella_archivo(archivo.getvalue())
+        if huella not in cargas:
+            cargas[huella] = leer_portafolio_excel(archivo).soluciones
+    assert len(cargas) == 2
+    assert sum(len(soluciones) for soluciones in cargas.values()) == 4
+
+
+def test_hoja_gastos(tmp_path):
+    hoja = pd.DataFrame([
+        ["Estudio", 50000, -1, None, None, None],
+        ["Imprevistos", "3000,5", None, 1, 0, 15],
+        ["Transacción", 30000, None, 3, 1, None],
+        ["Sin año", 100, None, None, None, None],
+    ], columns=COLUMNAS_GASTOS)
+    ruta = _escribir(tmp_path / "gastos.xlsx", [_fila("A")], **{HOJA_GASTOS: hoja})
+    resultado = leer_portafolio_excel(ruta)
+    assert resultado.soluciones["Solución"].tolist() == ["A"]
+    assert resultado.gastos == [
+        {"descripcion": "Estudio", "monto": 50000.0, "anio": -1},
+        {"descripcion": "Imprevistos", "monto": 3000.5, "anio_cada": 1, "desde": 0, "hasta": 15},
+        {"descripcion": "Transacción", "monto": 30000.0, "anio_cada": 3, "desde": 1},
+    ]
+    assert resultado.errores["Solución"].tolist() == [f"Hoja {HOJA_GASTOS}"]
+    assert resultado.errores["Fila"].tolist() == [5]
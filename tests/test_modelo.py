@@ -0,0 +1,406 @@
+# Archivo: tests/test_modelo.py
+# Pruebas del motor de modelo.py.
+#
+# Uso:
+#   python -m pytest -q tests
+
+import os
+import sys
+import threading
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import (  # noqa: E402
+    GASTOS_ADICIONALES_COMUNES,
+    N_ANIOS_MAXIMO,
+    CacheResultados,
+    CronogramaGastos,
+    EstadoIncremental,
+    ParametrosModelo,
+    calcular_precio_equilibrio,
+    calcular_tir_lote,
+    calcular_vpn_lote,
+    calcular_vpn_lote_cacheado,
+    calcular_vpn_lote_incremental,
+    calcular_vpn_analitico,
+    calcular_vpn_grilla,
+    calcular_vpn_solucion,
+    claves_soluciones,
+    compilar_gastos,
+    contadores_motor,
+)
+
+TASAS = np.array([0.01, 0.0497, 0.05, 0.12, 0.21])
+PRECIOS = np.array([0.0, 5.0, 14.75, 50.0, 500.0, 5000.0])
+
+
+#Def de Funcion auxiliar: portafolio y parámetros aleatorios (mezcla de tipos de captura y de SNC)
+def _caso_aleatorio(semilla):
+    rng = np.random.default_rng(semilla)
+    soluciones = []
+    for k in range(int(rng.integers(1, 8))):
+        soluciones.append({
+            "Solución": f"S{k}",
+            "Área (ha)": float(rng.choice([0, 0.5, 50, 500, 5000, 20000])),
+            "Costo anual por ha (USD)": float(rng.uniform(0, 120)),
+            "CAPEX Total (USD)": float(rng.uniform(0, 2000)),
+            "Duración (años)": int(rng.choice([1, 2, int(rng.integers(4, 21)), 60])),
+            "Salvaguardas (%)": float(rng.uniform(0, 30)),
+            "Ingreso Encadenado (USD/año)": float(rng.choice([0, 1e3, 1e5, 2e6])),
+            "Tipo Captura": str(rng.choice(["constante"] * 3 + ["lineal", "sigmoidal"])),
+            "Tipo SNC": str(rng.choice(["restauracion", "degradacion"])),
+            "% Pérdida Evitada": float(rng.uniform(0, 50)),
+            "Escalonada": bool(rng.random() < 0.25),
+            "Años Escalonamiento": int(rng.choice([1, 1, 1, 4, 25, 80])),
+            "Captura por ha (tCO2e)": float(rng.uniform(0, 40)),
+            "Captura Inicial": float(rng.uniform(0, 5)),
+            "Captura Final": float(rng.uniform(0, 10)),
+            "Captura Máxima": float(rng.uniform(0, 10)),
+            "Velocidad": float(rng.uniform(0.1, 1.0)),
+            "Punto Medio": int(rng.integers(1, 15))
+        })
+    parametros = ParametrosModelo(
+        crecimiento_precio_carbono=float(rng.choice([0, 0.0497, 0.12])),
+        crecimiento_ingreso_encadenado=float(rng.choice([0, 0.015, 0.1])),
+        multiplicador_area=float(rng.choice([0.5, 1, 1.5])),
+        multiplicador_precio_carbono=float(rng.choice([0.5, 1, 1.5])),
+        multiplicador_tasa_descuento=float(rng.choice([0.5, 1, 1.5])),
+        n_anios=int(rng.choice([1, 2, 20, 30, 45])),
+        gastos_adicionales_comunes=GASTOS_ADICIONALES_COMUNES
+    )
+    return soluciones, parametros
+
+
+#Def de Funcion auxiliar: compara con tolerancia relativa (NaN solo si la referencia es NaN)
+def _coincide(valor, referencia):
+    if np.isnan(referencia):
+        return np.isnan(valor)
+    return abs(valor - referencia) <= 1e-9 * max(1.0, abs(referencia))
+
+
+@pytest.mark.parametrize("semilla", range(40))
+def test_grilla_y_forma_cerrada_coinciden_con_motor_por_fila(semilla):
+    soluciones, parametros = _caso_aleatorio(semilla)
+    df_soluciones = pd.DataFrame(soluciones)
+    analitico, elegible = calcular_vpn_analitico(df_soluciones, parametros, TASAS, PRECIOS)
+    grilla = calcular_vpn_grilla(df_soluciones, parametros, TASAS, PRECIOS)
+
+    for ip, precio in enumerate(PRECIOS):
+        for it, tasa in enumerate(TASAS):
+            celda = replace(parametros, precio_carbono=float(precio), tasa_descuento=float(tasa))
+            for k, sol in enumerate(soluciones):
+                referencia = calcular_vpn_solucion(sol, celda)[0]
+                assert _coincide(grilla[it, ip, k], referencia), (sol, celda)
+                if elegible[ip, k]:
+                    assert _coincide(analitico[it, ip, k], referencia), (sol, celda)
+
+
+#Def de Funcion auxiliar: VPN de cada fila a la tasa dada (definición directa)
+def _vpn(flujo, tasas):
+    return (flujo / (1 + tasas[:, None]) ** np.arange(1, flujo.shape[1] + 1)).sum(axis=1)
+
+
+def test_tir_horizonte_largo():
+    # Flujos que terminan antes del horizonte: con 200 años los años finales en 0
+    # no deben anular la búsqueda (antes todas las TIR salían NaN)
+    flujo = np.zeros((3, N_ANIOS_MAXIMO))
+    flujo[:, 0] = -1000.0
+    flujo[0, 1:20] = 150.0
+    flujo[1, 1:] = 30.0
+    flujo[2, 150:160] = 1e5
+    tir = calcular_tir_lote(flujo)
+    assert np.isfinite(tir).all()
+    np.testing.assert_allclose(_vpn(flujo, tir), 0.0, atol=1e-6)
+
+
+@pytest.mark.parametrize("semilla", range(40))
+def test_tir_y_precio_de_equilibrio_anulan_el_vpn(semilla):
+    # Sobre los casos aleatorios ampliados (horizonte de 1 año, duración fuera del horizonte, ...)
+    soluciones, parametros = _caso_aleatorio(semilla)
+    df_soluciones = pd.DataFrame(soluciones)
+    flujo = calcular_vpn_lote(df_soluciones, parametros)[1]
+
+    # A ambos lados de la TIR el VPN cambia de signo; sin TIR, no cambia en todo el intervalo
+    # (con área 0 y años vigentes el flujo es NaN, como en calcular_vpn_solucion, y la TIR también)
+    tir = calcular_tir_lote(flujo)
+    finita = np.isfinite(tir)
+    sin_raiz = ~finita & np.isfinite(flujo).all(axis=1)
+    delta = 1e-9 * np.maximum(1.0, np.abs(tir[finita]))
+    antes, despues = _vpn(flujo[finita], tir[finita] - delta), _vpn(flujo[finita], tir[finita] + delta)
+    assert (np.sign(antes) * np.sign(despues) <= 0).all()
+    extremos = np.sign(_vpn(flujo[sin_raiz], np.full(sin_raiz.sum(), -0.99)))
+    assert (extremos * np.sign(_vpn(flujo[sin_raiz], np.full(sin_raiz.sum(), 100.0))) >= 0).all()
+
+    # El precio de equilibrio queda entre un VPN < 0 y uno ≥ 0 (0 si ya es rentable sin carbono)
+    precio = calcular_precio_equilibrio(df_soluciones, parametros)
+    vpn_en = lambda p: calcular_vpn_lote(df_soluciones, replace(parametros, precio_carbono=p))[0]
+    for k, p in enumerate(precio):
+        if np.isnan(p):
+            assert not vpn_en(1e6)[k] >= 0
+        elif p == 0:
+            assert vpn_en(0.0)[k] >= 0
+        else:
+            assert vpn_en(float(p) * (1 + 1e-6))[k] >= 0
+            assert vpn_en(float(p) * (1 - 1e-6))[k] < 0
+
+
+def test_tir_sin_raiz_es_nan():
+    flujo = np.zeros((2, N_ANIOS_MAXIMO))
+    flujo[0] = -10.0
+    assert np.isnan(calcular_tir_lote(flujo)).all()
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_lote_coincide_con_motor_por_fila(semilla):
+    soluciones, parametros = _caso_aleatorio(semilla)
+    lote = calcular_vpn_lote(pd.DataFrame(soluciones), parametros)
+    for k, sol in enumerate(soluciones):
+        fila = calcular_vpn_solucion(sol, parametros)
+        assert _coincide(lote[0][k], fila[0]), sol
+        for matriz_lote, vector_fila in zip(lote[1:6], fila[1:6]):
+            np.testing.assert_allclose(matriz_lote[k], vector_fila, rtol=1e-12, atol=1e-9)
+        np.testing.assert_array_equal(lote[6], fila[6])
+
+
+def test_cache_desaloja_por_memoria_y_cuenta_aciertos():
+    cache = CacheResultados(max_bytes=3 * 800)
+    for k in range(3):
+        cache.guardar(k, np.zeros(100))
+    assert cache.obtener(0) is not None  # 0 pasa a ser el más reciente
+    cache.guardar(3, np.zeros(100))
+    assert len(cache) == 3 and cache.nbytes == 3 * 800
+    assert cache.obtener(1) is None  # el menos usado se desalojó
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+    cache.guardar(4, (np.zeros(200), np.zeros(200)))  # más grande que el límite: queda sola
+    assert len(cache) == 1 and cache.obtener(4) is not None
+    cache.limpiar()
+    assert (len(cache), cache.nbytes, cache.aciertos, cache.fallos) == (0, 0, 0, 0)
+
+
+def test_cache_compartida_entre_hilos():
+    # Como _cache_resultados con varias sesiones de Streamlit: lecturas y desalojos a la vez
+    cache = CacheResultados(max_bytes=4 * 800)
+    errores = []
+
+    def trabajar(hilo):
+        try:
+            for k in range(2000):
+                clave = (hilo + k) % 12
+                if cache.obtener(clave) is None:
+                    cache.guardar(clave, np.zeros(100))
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=trabajar, args=(h,)) for h in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert errores == []
+    assert cache.aciertos + cache.fallos == 8 * 2000
+    assert cache.nbytes == 800 * len(cache) <= cache.max_bytes
+
+
+def test_lote_cacheado_reutiliza_el_portafolio_y_las_claves_son_de_contenido():
+    soluciones, parametros = _caso_aleatorio(3)
+    df_soluciones = pd.DataFrame(soluciones)
+    cache = CacheResultados()
+    primera = calcular_vpn_lote_cacheado(df_soluciones, parametros, cache)
+    segunda = calcular_vpn_lote_cacheado(df_soluciones.copy(), parametros, cache)
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+    assert all(a is b for a, b in zip(primera[:6], segunda[:6]))
+    np.testing.assert_array_equal(primera[0], calcular_vpn_lote(df_soluciones, parametros)[0])
+
+    otros = replace(parametros, precio_carbono=parametros.precio_carbono + 1)
+    calcular_vpn_lote_cacheado(df_soluciones, otros, cache)
+    assert cache.fallos == 2
+
+    claves = claves_soluciones(pd.DataFrame(soluciones + soluciones[:1]))
+    assert claves[-1] == claves[0]
+    editada = dict(soluciones[0], **{"Área (ha)": soluciones[0]["Área (ha)"] + 1})
+    assert claves_soluciones(pd.DataFrame([editada]))[0] != claves[0]
+
+
+#Def de Funcion auxiliar: expansión de gastos del app.py original, año por año
+def _gastos_referencia(gastos_adicionales_comunes, tasa_descuento, n_anios_default):
+    gastos_adicionales = np.zeros(n_anios_default)
+    for gasto in gastos_adicionales_comunes:
+        if "anio" in gasto:
+            if gasto["anio"] == -1:
+                gastos_adicionales[0] += gasto["monto"] / (1 + tasa_descuento)
+            elif 0 <= gasto["anio"] < n_anios_default:
+                gastos_adicionales[gasto["anio"]] += gasto["monto"]
+        elif "anio_cada" in gasto:
+            desde = gasto.get("desde", 0)
+            hasta = gasto.get("hasta", n_anios_default)
+            for anio in range(desde, min(hasta + 1, n_anios_default)):
+                if (anio - desde) % gasto["anio_cada"] == 0:
+                    gastos_adicionales[anio] += gasto["monto"]
+    return gastos_adicionales
+
+
+@pytest.mark.parametrize("semilla", range(10))
+def test_cronograma_compilado_coincide_con_la_expansion_original(semilla):
+    rng = np.random.default_rng(semilla)
+    gastos = [dict(g) for g in GASTOS_ADICIONALES_COMUNES]
+    for _ in range(int(rng.integers(0, 6))):
+        if rng.random() < 0.5:
+            gastos.append({"descripcion": "Puntual", "monto": float(rng.uniform(0, 1e5)), "anio": int(rng.integers(-2, 60))})
+        else:
+            gasto = {"descripcion": "Recurrente", "monto": float(rng.uniform(0, 1e4)), "anio_cada": int(rng.integers(1, 7))}
+            if rng.random() < 0.7:
+                gasto["desde"] = int(rng.integers(0, 20))
+            if rng.random() < 0.7:
+                gasto["hasta"] = int(rng.integers(0, 80))
+            gastos.append(gasto)
+    for n_anios in (1, 3, 30, 45):
+        cronograma = compilar_gastos(gastos, n_anios)
+        for tasa in (0.0, 0.05, 0.12):
+            vector = cronograma.vector(tasa)
+            np.testing.assert_allclose(vector, _gastos_referencia(gastos, tasa, n_anios), rtol=1e-12)
+            assert not vector.flags.writeable
+        # Listas iguales (otro objeto, otro orden de claves) comparten el cronograma compilado
+        assert compilar_gastos([dict(reversed(list(g.items()))) for g in gastos], n_anios) is cronograma
+    assert np.array_equal(CronogramaGastos([], 5).vector(0.1), np.zeros(5))
+
+
+def test_incremental_agregar_quitar_y_nan():
+    soluciones, parametros = _caso_aleatorio(7)
+    sin_area = dict(soluciones[0], **{"Solución": "Sin área", "Área (ha)": 0.0})
+    estado, cache = EstadoIncremental(), CacheResultados()
+
+    #Def de Funcion auxiliar: totales incrementales comparados con el lote completo; devuelve las soluciones evaluadas
+    def evaluadas(filas):
+        antes = contadores_motor["soluciones_lote"]
+        salidas, sumas = calcular_vpn_lote_incremental(pd.DataFrame(filas), parametros, estado, cache)
+        n_evaluadas = contadores_motor["soluciones_lote"] - antes
+        referencia = calcular_vpn_lote(pd.DataFrame(filas), parametros)
+        np.testing.assert_array_equal(salidas[0], referencia[0])
+        for suma, matriz in zip(sumas, referencia[:6]):
+            np.testing.assert_allclose(suma, np.nansum(matriz, axis=0), rtol=1e-12)
+        assert np.isfinite(sumas[0])
+        return n_evaluadas
+
+    assert evaluadas(soluciones) == len(soluciones)
+    assert evaluadas(soluciones + [sin_area]) == 1  # solo la solución nueva (con VPN NaN)
+    assert evaluadas(soluciones[1:]) == 0  # quitar no evalúa nada
+    assert evaluadas([soluciones[0]] * 3) == 1  # ya no estaba guardada; las repetidas se evalúan una vez
+
+
+def test_incremental_no_retiene_vistas_del_cache_y_se_acota_por_memoria():
+    soluciones, parametros = _caso_aleatorio(11)
+    estado = EstadoIncremental(max_bytes=1)
+    for precio in (1.0, 2.0, 3.0):
+        salidas, _ = calcular_vpn_lote_incremental(
+            pd.DataFrame(soluciones), replace(parametros, precio_carbono=precio), estado, CacheResultados()
+        )
+        assert all(salida.base is None for salida in salidas[:6])
+        assert len(estado) == 1  # se conserva solo el agregado más reciente
+
+    estado = EstadoIncremental()
+    for precio in (1.0, 2.0, 3.0):
+        calcular_vpn_lote_incremental(pd.DataFrame(soluciones), replace(parametros, precio_carbono=precio), estado)
+    assert len(estado) == 3 and estado.nbytes <= estado.max_bytes
+
+
+#Def de Funcion auxiliar: calcular_vpn_solucion del app.py original (los multiplicadores eran globales del script)
+def _vpn_solucion_original(sol, parametros):
+    tasa_descuento = parametros.tasa_descuento
+    n_anios_default = parametros.n_anios
+    gastos_adicionales_comunes = parametros.gastos_adicionales_comunes
+    precio_carbono = parametros.precio_carbono
+    multiplicador_precio_carbono = parametros.multiplicador_precio_carbono
+    crecimiento_precio_carbono = parametros.crecimiento_precio_carbono
+    crecimiento_ingreso_encadenado = parametros.crecimiento_ingreso_encadenado
+    multiplicador_area = parametros.multiplicador_area
+    multiplicador_tasa_descuento = parametros.multiplicador_tasa_descuento
+
+    dur = int(sol["Duración (años)"])
+    area_total = sol["Área (ha)"] * multiplicador_area
+    tipo_captura = sol.get("Tipo Captura", "constante")
+    tipo_sn = sol.get("Tipo SNC", "restauracion")
+    anos_area_escalonada = sol.get("Años Escalonamiento", 1)
+
+    if anos_area_escalonada == 1:
+        area_por_anio = np.full(dur, area_total)
+    else:
+        area_por_anio = np.concatenate([
+            np.linspace(area_total / anos_area_escalonada, area_total, anos_area_escalonada),
+            np.full(dur - anos_area_escalonada, area_total)
+        ])
+    area_por_anio = np.pad(area_por_anio, (0, n_anios_default - len(area_por_anio)), constant_values=area_total)
+
+    if tipo_captura == "lineal":
+        cap_ha = np.linspace(sol["Captura Inicial"], sol["Captura Final"], dur)
+    elif tipo_captura == "sigmoidal":
+        cap_ha = sol["Captura Máxima"] / (1 + np.exp(-sol["Velocidad"] * (np.arange(dur) - sol["Punto Medio"])))
+    else:
+        cap_ha = np.full(dur, sol["Captura por ha (tCO2e)"])
+    cap_ha = np.pad(cap_ha, (0, n_anios_default - len(cap_ha)), constant_values=0)
+
+    salv = 1 - sol["Salvaguardas (%)"] / 100
+    if tipo_sn == "degradacion":
+        area_efectiva = area_por_anio * (sol.get("% Pérdida Evitada", 0.0) / 100)
+    else:
+        area_efectiva = area_por_anio
+    captura_anual = cap_ha * area_efectiva * salv
+
+    costo_base = sol["Costo anual por ha (USD)"]
+    with np.errstate(divide="ignore", invalid="ignore"):  # área 0: el original también daba NaN
+        costo_anual = np.array([
+            costo_base * ((area_por_anio[i] / 100) ** -0.2) * area_por_anio[i]
+            for i in range(n_anios_default)
+        ])
+    capex = sol["CAPEX Total (USD)"]
+    ingreso_base = sol["Ingreso Encadenado (USD/año)"]
+    gastos_adicionales = _gastos_referencia(gastos_adicionales_comunes, tasa_descuento, n_anios_default)
+    monitoreo_en_campo = np.array([
+        9.2 * area_por_anio[i] if i < dur else 0 for i in range(n_anios_default)
+    ])
+
+    flujo_proyecto = np.zeros(n_anios_default)
+    flujo_proyecto[0] = -capex
+    precio_base = precio_carbono * multiplicador_precio_carbono
+    for anio in range(1, dur):
+        ingreso = (
+            captura_anual[anio] * precio_base * ((1 + crecimiento_precio_carbono) ** anio)
+            + ingreso_base * ((1 + crecimiento_ingreso_encadenado) ** anio)
+        )
+        flujo_neto = ingreso - costo_anual[anio] - (gastos_adicionales[anio] + monitoreo_en_campo[anio])
+        if flujo_neto > 0:
+            flujo_neto *= (1 - 0.15)
+        flujo_proyecto[anio] = flujo_neto
+
+    tasa_desc = tasa_descuento * multiplicador_tasa_descuento
+    vpn = sum([flujo_proyecto[i] / ((1 + tasa_desc) ** (i + 1)) for i in range(n_anios_default)])
+    return vpn, flujo_proyecto, captura_anual, area_por_anio, costo_anual, monitoreo_en_campo, gastos_adicionales
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_motor_coincide_con_las_formulas_del_app_original(semilla):
+    # Solo casos que el app.py original aceptaba: horizonte de 30 años, duración dentro del
+    # horizonte y escalonamiento dentro de la duración
+    soluciones, parametros = _caso_aleatorio(semilla)
+    parametros = replace(parametros, n_anios=30)
+    for sol in soluciones:
+        sol["Duración (años)"] = int(np.clip(sol["Duración (años)"], 2, 30))
+        sol["Años Escalonamiento"] = min(sol["Años Escalonamiento"], sol["Duración (años)"])
+    df_soluciones = pd.DataFrame(soluciones)
+    lote = calcular_vpn_lote(df_soluciones, parametros)
+    grilla = calcular_vpn_grilla(df_soluciones, parametros, TASAS, PRECIOS)
+
+    for k, sol in enumerate(soluciones):
+        original = _vpn_solucion_original(sol, parametros)
+        np.testing.assert_allclose(lote[0][k], original[0], rtol=1e-9, atol=1e-6)
+        for matriz_lote, vector_original in zip(lote[1:6], original[1:6]):
+            np.testing.assert_allclose(matriz_lote[k], vector_original, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(lote[6], original[6], rtol=1e-12)
+        for ip, precio in enumerate(PRECIOS):
+            for it, tasa in enumerate(TASAS):
+                celda = replace(parametros, precio_carbono=float(precio), tasa_descuento=float(tasa))
+                np.testing.assert_allclose(grilla[it, ip, k], _vpn_solucion_original(sol, celda)[0], rtol=1e-9, atol=1e-6)
@@ -0,0 +1,44 @@
+# Archivo: tests/test_montecarlo.py
+# Pruebas del análisis de incertidumbre de montecarlo.py.
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import ParametrosModelo  # noqa: E402
+from montecarlo import MUESTRAS_POR_SEMILLA, ConfiguracionMonteCarlo, simular_montecarlo  # noqa: E402
+
+SOLUCIONES = [
+    {"Solución": f"S{k}", "Área (ha)": 100.0 * (k + 1), "Costo anual por ha (USD)": 50.0, "CAPEX Total (USD)": 500.0,
+     "Duración (años)": 20, "Salvaguardas (%)": 5.0, "Ingreso Encadenado (USD/año)": 0.0,
+     "Captura por ha (tCO2e)": 5.0}
+    for k in range(3)
+]
+CONFIGURACION = ConfiguracionMonteCarlo(
+    defecto={"factor_captura": {"dist": "normal", "media": 1.0, "desv": 0.1},
+             "factor_opex": {"dist": "triangular", "min": 0.8, "moda": 1.0, "max": 1.3}},
+    globales={"crecimiento_precio_carbono": {"dist": "uniforme", "min": 0.0, "max": 0.1}}
+)
+
+
+def test_muestras_no_dependen_del_tamano_de_bloque():
+    n_muestras = 2 * MUESTRAS_POR_SEMILLA + 17
+    base = simular_montecarlo(SOLUCIONES, ParametrosModelo(), CONFIGURACION, n_muestras=n_muestras, semilla=3)
+    for opciones in ({"tamano_bloque": 7}, {"max_bytes_bloque": 1}, {"tamano_bloque": 10 * MUESTRAS_POR_SEMILLA}):
+        otra = simular_montecarlo(SOLUCIONES, ParametrosModelo(), CONFIGURACION, n_muestras=n_muestras, semilla=3, **opciones)
+        np.testing.assert_allclose(otra.vpn_muestras, base.vpn_muestras, rtol=1e-12)
+
+
+def test_muestras_son_prefijo_al_pedir_menos():
+    muchas = simular_montecarlo(SOLUCIONES, ParametrosModelo(), CONFIGURACION, n_muestras=600, semilla=5)
+    pocas = simular_montecarlo(SOLUCIONES, ParametrosModelo(), CONFIGURACION, n_muestras=300, semilla=5)
+    np.testing.assert_allclose(pocas.vpn_muestras, muchas.vpn_muestras[:300], rtol=1e-12)
+
+
+def test_semilla_distinta_cambia_las_muestras():
+    a = simular_montecarlo(SOLUCIONES, ParametrosModelo(), CONFIGURACION, n_muestras=50, semilla=1)
+    b = simular_montecarlo(SOLUCIONES, ParametrosModelo(), CONFIGURACION, n_muestras=50, semilla=2)
+    assert not np.allclose(a.vpn_muestras, b.vpn_muestras)
@@ -0,0 +1,68 @@
+# Archivo: tests/test_optimizador.py
+# Pruebas del optimizador de portafolio de optimizador.py.
+
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import ParametrosModelo, soluciones_predeterminadas  # noqa: E402
+from optimizador import (  # noqa: E402
+    ProblemaPortafolio,
+    RestriccionesPortafolio,
+    _mochila,
+    candidatos_desde_catalogo,
+    optimizar_portafolio,
+)
+
+
+#Def de Funcion auxiliar: mejor valor de la mochila por enumeración de todas las combinaciones de niveles
+def _fuerza_bruta(valores, peso_capex, peso_area, n_capex, n_area):
+    n_cand, n_niveles = valores.shape
+    mejor = 0.0
+    for niveles in itertools.product(range(n_niveles), repeat=n_cand):
+        elegidos = [(i, nivel) for i, nivel in enumerate(niveles) if nivel]
+        if sum(peso_capex[i] for i, _ in elegidos) > n_capex or sum(peso_area[i, nivel] for i, nivel in elegidos) > n_area:
+            continue
+        mejor = max(mejor, sum(valores[i, nivel] for i, nivel in elegidos))
+    return mejor
+
+
+@pytest.mark.parametrize("semilla", range(30))
+def test_mochila_coincide_con_fuerza_bruta(semilla):
+    rng = np.random.default_rng(semilla)
+    n_cand, n_niveles, n_capex, n_area = int(rng.integers(1, 6)), int(rng.integers(2, 5)), 12, 10
+    valores = rng.normal(0, 1, (n_cand, n_niveles))
+    valores[:, 0] = 0.0
+    valores[rng.random(valores.shape) < 0.1] = -np.inf  # niveles no evaluables
+    peso_capex = rng.integers(0, 8, n_cand)
+    peso_area = np.sort(rng.integers(0, 7, (n_cand, n_niveles)), axis=1)
+    peso_area[:, 0] = 0
+
+    niveles = _mochila(valores, peso_capex, peso_area, n_capex, n_area)
+    elegidos = np.flatnonzero(niveles)
+    assert peso_capex[elegidos].sum() <= n_capex
+    assert peso_area[elegidos, niveles[elegidos]].sum() <= n_area
+    obtenido = valores[elegidos, niveles[elegidos]].sum()
+    assert obtenido == pytest.approx(_fuerza_bruta(valores, peso_capex, peso_area, n_capex, n_area), abs=1e-12)
+
+
+def test_optimizador_respeta_restricciones_y_usa_los_coeficientes():
+    candidatos = candidatos_desde_catalogo(dict(list(soluciones_predeterminadas.items())[:6]), area_maxima_por_solucion=500.0)
+    parametros = ParametrosModelo(precio_carbono=60.0)
+    restricciones = RestriccionesPortafolio(presupuesto_capex=2000.0, area_maxima=800.0, niveles_area=4, resolucion=40)
+    for objetivo in ("vpn", "carbono"):
+        resultado = optimizar_portafolio(candidatos, parametros, restricciones, objetivo)
+        assert resultado.capex_total <= restricciones.presupuesto_capex
+        assert resultado.area_total <= restricciones.area_maxima + 1e-9
+        assert resultado.vpn_total == pytest.approx(resultado.asignacion["VPN (USD)"].sum())
+
+    # El óptimo de VPN no es peor que ninguna selección de un solo candidato factible
+    problema = ProblemaPortafolio(candidatos, parametros, restricciones)
+    mejor = problema.resolver(1.0).vpn_total
+    factibles = (problema.peso_capex[:, None] <= problema.n_capex) & (problema.peso_area <= problema.n_area)
+    assert mejor >= np.where(factibles, problema.vpn, -np.inf).max() - 1e-6
@@ -0,0 +1,74 @@
+# Archivo: tests/test_registros.py
+# Pruebas del portafolio columnar de registros.py.
+
+import os
+import sys
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingesta import COLUMNAS_ESPERADAS  # noqa: E402
+from registros import Portafolio, TipoCaptura, TipoSNC, como_portafolio  # noqa: E402
+
+REGISTROS = [
+    {"Solución": "Constante", "Área (ha)": 100.0, "Costo anual por ha (USD)": 50.0, "CAPEX Total (USD)": 500.0,
+     "Duración (años)": 30, "Salvaguardas (%)": 5.0, "Ingreso Encadenado (USD/año)": 1e4,
+     "Tipo Captura": "constante", "Tipo SNC": "restauracion", "% Pérdida Evitada": 0.0,
+     "Escalonada": False, "Años Escalonamiento": 1, "Captura por ha (tCO2e)": 7.5},
+    {"Solución": "Lineal", "Área (ha)": 250.0, "Costo anual por ha (USD)": 40.0, "CAPEX Total (USD)": 300.0,
+     "Duración (años)": 20, "Salvaguardas (%)": 0.0, "Ingreso Encadenado (USD/año)": 0.0,
+     "Tipo Captura": "lineal", "Tipo SNC": "degradacion", "% Pérdida Evitada": 3.5,
+     "Escalonada": True, "Años Escalonamiento": 4, "Captura Inicial": 2.0, "Captura Final": 6.0},
+    {"Solución": "Sigmoidal", "Área (ha)": 900.0, "Costo anual por ha (USD)": 80.0, "CAPEX Total (USD)": 900.0,
+     "Duración (años)": 30, "Salvaguardas (%)": 0.0, "Ingreso Encadenado (USD/año)": 0.0,
+     "Tipo Captura": "sigmoidal", "Tipo SNC": "restauracion", "% Pérdida Evitada": 0.0,
+     "Escalonada": False, "Años Escalonamiento": 1, "Captura Máxima": 8.0, "Velocidad": 0.3, "Punto Medio": 15},
+]
+
+
+#Def de Funcion auxiliar: dos portafolios son iguales campo a campo
+def _iguales(a, b):
+    for campo in fields(Portafolio):
+        np.testing.assert_array_equal(getattr(a, campo.name), getattr(b, campo.name), err_msg=campo.name)
+
+
+def test_ida_y_vuelta_por_dataframe_y_registros():
+    portafolio = Portafolio.desde_registros(REGISTROS)
+    assert portafolio.tipo_captura.tolist() == [TipoCaptura.CONSTANTE, TipoCaptura.LINEAL, TipoCaptura.SIGMOIDAL]
+    assert portafolio.tipo_snc.tolist() == [TipoSNC.RESTAURACION, TipoSNC.DEGRADACION, TipoSNC.RESTAURACION]
+
+    df = portafolio.a_dataframe()
+    assert df.columns.tolist() == COLUMNAS_ESPERADAS
+    assert np.isnan(df.loc[0, "Captura Inicial"]) and np.isnan(df.loc[1, "Captura por ha (tCO2e)"])
+    _iguales(Portafolio.desde_dataframe(df), portafolio)
+
+    # a_registros omite los parámetros de curva que no aplican al tipo
+    assert portafolio.a_registros() == REGISTROS
+    _iguales(como_portafolio(portafolio.a_registros()), portafolio)
+    assert como_portafolio(portafolio) is portafolio
+
+
+def test_tomar_y_concatenar():
+    portafolio = Portafolio.desde_registros(REGISTROS)
+    _iguales(Portafolio.concatenar([portafolio.tomar([0]), portafolio.tomar(slice(1, None))]), portafolio)
+    _iguales(portafolio.tomar(portafolio.tipo_captura == TipoCaptura.LINEAL), Portafolio.desde_registros(REGISTROS[1:2]))
+    assert len(Portafolio.concatenar([])) == 0 and len(Portafolio.vacio()) == 0
+    assert portafolio.nbytes > 0
+
+
+def test_valores_de_texto_defectos_y_alias():
+    df = pd.DataFrame([{
+        "Solución": "Texto", "Área (ha)": "12,5", "Costo anual por ha (USD)": "50", "CAPEX Total (USD)": None,
+        "Duración (años)": "20", "Tipo Captura": " LINEAL ", "Tipo SNC": "otro", "Escalonada": "Sí",
+        "Años para 100% área": 3, "Captura Inicial": "1,5", "Captura Final": "4"
+    }])
+    portafolio = Portafolio.desde_dataframe(df)
+    assert portafolio.area.tolist() == [12.5] and portafolio.captura_inicial.tolist() == [1.5]
+    assert portafolio.capex.tolist() == [0.0] and portafolio.salvaguardas.tolist() == [0.0]
+    assert portafolio.tipo_captura.tolist() == [TipoCaptura.LINEAL]
+    assert portafolio.tipo_snc.tolist() == [TipoSNC.RESTAURACION]  # valor desconocido -> por defecto
+    assert portafolio.escalonada.tolist() == [True] and portafolio.anos_escalonamiento.tolist() == [3]
+    assert portafolio.duracion.dtype == np.int32
@@ -0,0 +1,80 @@
+# Archivo: tests/test_sensibilidad.py
+# Pruebas del análisis tornado de sensibilidad.py.
+
+import os
+import sys
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import ParametrosModelo, calcular_vpn_lote  # noqa: E402
+from registros import como_portafolio  # noqa: E402
+from sensibilidad import VARIABLES_TORNADO, VARIACIONES_PREDETERMINADAS, calcular_tornado  # noqa: E402
+
+SOLUCIONES = pd.DataFrame([
+    {"Solución": "Constante", "Área (ha)": 800.0, "Costo anual por ha (USD)": 40.0, "CAPEX Total (USD)": 900.0,
+     "Duración (años)": 25, "Salvaguardas (%)": 10.0, "Ingreso Encadenado (USD/año)": 2e4,
+     "Tipo Captura": "constante", "Tipo SNC": "restauracion", "Captura por ha (tCO2e)": 9.0},
+    {"Solución": "Lineal", "Área (ha)": 300.0, "Costo anual por ha (USD)": 60.0, "CAPEX Total (USD)": 300.0,
+     "Duración (años)": 30, "Salvaguardas (%)": 3.0, "Ingreso Encadenado (USD/año)": 0.0,
+     "Tipo Captura": "lineal", "Tipo SNC": "degradacion", "% Pérdida Evitada": 20.0,
+     "Captura Inicial": 2.0, "Captura Final": 6.0, "Escalonada": True, "Años Escalonamiento": 4},
+    {"Solución": "Sigmoidal", "Área (ha)": 1500.0, "Costo anual por ha (USD)": 80.0, "CAPEX Total (USD)": 1200.0,
+     "Duración (años)": 30, "Salvaguardas (%)": 0.0, "Ingreso Encadenado (USD/año)": 5e3,
+     "Tipo Captura": "sigmoidal", "Tipo SNC": "restauracion",
+     "Captura Máxima": 8.0, "Velocidad": 0.3, "Punto Medio": 12},
+])
+
+
+#Def de Funcion auxiliar: VPN por solución con una variable movida a mano (uno a la vez, motor en lote)
+def _vpn_perturbado(parametros, variable, signo, variacion):
+    portafolio = como_portafolio(SOLUCIONES)
+    factor = 1 + signo * variacion / 100
+    if variable == "area":
+        portafolio = replace(portafolio, area=portafolio.area * factor)
+    elif variable == "captura":
+        portafolio = replace(portafolio, captura=portafolio.captura * factor, captura_inicial=portafolio.captura_inicial * factor,
+                             captura_final=portafolio.captura_final * factor, captura_maxima=portafolio.captura_maxima * factor)
+    elif variable == "opex":
+        portafolio = replace(portafolio, costo_anual_ha=portafolio.costo_anual_ha * factor)
+    elif variable == "capex":
+        portafolio = replace(portafolio, capex=portafolio.capex * factor)
+    elif variable == "salvaguardas":
+        portafolio = replace(portafolio, salvaguardas=np.clip(portafolio.salvaguardas + signo * variacion, 0, 100))
+    elif variable == "perdida_evitada":
+        portafolio = replace(portafolio, perdida_evitada=np.clip(portafolio.perdida_evitada + signo * variacion, 0, 100))
+    else:
+        parametros = replace(parametros, **{variable: getattr(parametros, variable) + signo * variacion / 100})
+    return calcular_vpn_lote(portafolio, parametros)[0]
+
+
+@pytest.mark.parametrize("precio", [5.0, 14.75, 80.0])
+def test_tornado_coincide_con_uno_a_la_vez(precio):
+    parametros = ParametrosModelo(precio_carbono=precio)
+    tabla = calcular_tornado(SOLUCIONES, parametros)
+    base = calcular_vpn_lote(SOLUCIONES, parametros)[0]
+    nombres = SOLUCIONES["Solución"].tolist()
+
+    assert len(tabla) == len(VARIABLES_TORNADO) * (len(nombres) + 1)
+    for variable, (descripcion, _) in VARIABLES_TORNADO.items():
+        variacion = VARIACIONES_PREDETERMINADAS[variable]
+        bajo = _vpn_perturbado(parametros, variable, -1, variacion)
+        alto = _vpn_perturbado(parametros, variable, 1, variacion)
+        filas = tabla[tabla["Variable"] == descripcion].set_index("Solución")
+        for k, nombre in enumerate(nombres):
+            assert filas.loc[nombre, "VPN Base (USD)"] == pytest.approx(base[k], rel=1e-10)
+            assert filas.loc[nombre, "VPN Bajo (USD)"] == pytest.approx(bajo[k], rel=1e-10), (variable, nombre)
+            assert filas.loc[nombre, "VPN Alto (USD)"] == pytest.approx(alto[k], rel=1e-10), (variable, nombre)
+        assert filas.loc["Total Portafolio", "VPN Bajo (USD)"] == pytest.approx(bajo.sum(), rel=1e-10)
+        assert filas.loc["Total Portafolio", "VPN Alto (USD)"] == pytest.approx(alto.sum(), rel=1e-10)
+
+
+def test_tornado_ordena_por_rango_y_omite_variables_en_cero():
+    tabla = calcular_tornado(SOLUCIONES, ParametrosModelo(), {"area": 10.0, "capex": 0.0, "tasa_descuento": 1.0})
+    assert set(tabla["Variable"]) == {VARIABLES_TORNADO["area"][0], VARIABLES_TORNADO["tasa_descuento"][0]}
+    for _, grupo in tabla.groupby("Solución", sort=False):
+        assert grupo["Rango (USD)"].is_monotonic_decreasing